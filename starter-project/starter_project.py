@@ -8,47 +8,47 @@ Add up the total energy deposit and PMT hits for each slab, and analyze the resu
 
 TODO: Tone down the maximum length of these lines of code.
 """
-import ROOT
+import os
+import sys
+
 import numpy as np
 import pandas as pd
 import seaborn as sns
 from scipy.stats import linregress
 
-# Load shared libraries (both are necessary)
-ROOT.gInterpreter.ProcessLine('#include "/homes/anson/milliQanSim/include/mqROOTEvent.hh"')
-ROOT.gSystem.Load('/homes/anson/milliQanSim/build/libMilliQanCore.so')
-
-# These do not work:
-# ROOT.gInterpreter.ProcessLine('#include "/net/cms17/cms17r0/schmitz/milliQanSim/include/mqROOTEvent.hh"')
-# ROOT.gInterpreter.AddIncludePath('/net/cms17/cms17r0/schmitz/milliQanSim/include')
-# ROOT.gInterpreter.AddIncludePath('/homes/anson/milliQanSim/include')
-#
-# Only the new version of the headers (e.g. mqROOTEvent.hh), i.e. the ones on GitHub and in
-# /homes/anson/milliQanSim, work correctly. The old ones in /net/cms17/cms17r0/schmitz/milliQanSim
-# do not. Also, I'm not able to get `AddIncludePath` to work, but `ProcessLine` works.
+# The event sources (which also load the milliQanSim library for ROOT) are in
+# step-3/events.py.
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'step-3'))
+from events import RootEventSource
 
-file = ROOT.TFile('/net/cms17/cms17r0/schmitz/slabSimMuon/withPhotons/48slab/cosmicdir1/MilliQan.root')
-tree = file.Get('Events')
+root_path = '/net/cms17/cms17r0/schmitz/slabSimMuon/withPhotons/48slab/cosmicdir1/MilliQan.root'
 
 
-def read_root(save_csv=True):
+def read_root(save_csv=True, source=None):
     """Read data in from ROOT and save what we want to a Pandas `DataFrame`.
+
+    The events are read in large batches straight into arrays (see
+    step-3/events.py), instead of one event (and one `dict` per hit) at a
+    time.
     
-    :save: If `True`, save the `DataFrame`s to CSV files."""
+    :save: If `True`, save the `DataFrame`s to CSV files.
+    :source: Where to read the events from. The ROOT file at `root_path` by
+    default. (E.g. `events.SyntheticEventSource` works without ROOT.)"""
+    if source is None:
+        source = RootEventSource(root_path)
+
     energy_df = []
     PMT_df = []
 
-    for i, event in enumerate(tree):
-        print(f"Reading event {i + 1} from the ROOT file.")
+    for i, batch in enumerate(source.iter_batches()):
+        print(f"Read batch {i + 1} from the ROOT file.")
 
-        for hit in event.ScintRHits:
-            energy_df.append({'slab_number': hit.GetCopyNo(), 'energy': hit.GetEDep()})
+        energy_df.append(pd.DataFrame({'slab_number': batch['ScintRHits'].copyNo,
+                                       'energy': batch['ScintRHits'].EDep_MeV}))
+        PMT_df.append(pd.DataFrame({'PMT_number': batch['PMTHits'].PMT_number}))
 
-        for hit in event.PMTHits:
-            PMT_df.append({'PMT_number': hit.GetPMTNumber()})
-    
-    energy_df = pd.DataFrame(energy_df)
-    PMT_df = pd.DataFrame(PMT_df)
+    energy_df = pd.concat(energy_df, ignore_index=True)
+    PMT_df = pd.concat(PMT_df, ignore_index=True)
     
     if save_csv:
         energy_df.to_csv('energy.csv', index=False)
@@ -122,11 +122,12 @@ def analyze(energy_df, PMT_df):
     fig.savefig('energy_vs_NPE.png')
 
 
-# Uncomment to read the ROOT file and create CSV files.
-# energy_df, PMT_df = read_root(save_csv=True)
+if __name__ == '__main__':
+    # Uncomment to read the ROOT file and create CSV files.
+    # energy_df, PMT_df = read_root(save_csv=True)
 
-# Uncomment to read in CSV files that were saved.
-energy_df, PMT_df = read_csvs()
+    # Uncomment to read in CSV files that were saved.
+    energy_df, PMT_df = read_csvs()
 
-# Analyze the data.
-analyze(energy_df, PMT_df)
+    # Analyze the data.
+    analyze(energy_df, PMT_df)
@@ -7,6 +7,9 @@ import matplotlib.pyplot as plt
 import pandas as pd
 import seaborn as sns
 
+# The NPE calibration (energy deposit per PE) from step-3/calibration.json.
+from calibration import MEV_PER_PE
+
 print("Finished imports.")
 
 # plt.style.use('ggplot')
@@ -14,8 +17,8 @@ print("Finished imports.")
 df = pd.read_csv('cut_ScintRHits.csv')
 print("Read CSV.")
 
-# Uses our tentative relationship for energy deposit/NPE.
-df['EquivalentNPE'] = df.EDep_MeV / 1.24e-3
+# Uses the current calibration for energy deposit/NPE.
+df['EquivalentNPE'] = df.EDep_MeV / MEV_PER_PE
 
 # Only plot slab hits with NPE or energy deposit not zero or negative.
 positive_NPE = df.EquivalentNPE[df.EquivalentNPE > 0]
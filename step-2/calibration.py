@@ -0,0 +1,29 @@
+"""The energy deposit to NPE calibration (MeV per photoelectron) for the step-2
+scripts: the current version in step-3/calibration.json (see
+step-3/calibration.py, which fits and publishes it).
+
+Only the JSON file is read, so the step-2 scripts don't need step-3 on the
+path (or its modules).
+
+Created 18 October 2026.
+"""
+import json
+import os
+
+CALIBRATION_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..', 'step-3', 'calibration.json')
+
+
+def load_calibration(path=CALIBRATION_PATH):
+    """Return the current calibration (`dict` with `version`, `MeV_per_PE`,
+    ...) saved in `path`."""
+    with open(path) as f:
+        calibrations = json.load(f)
+    for calibration in calibrations['versions']:
+        if calibration['version'] == calibrations['current']:
+            return calibration
+    raise ValueError(f"Sorry, but the current calibration isn't in {path}.")
+
+
+# Energy deposit per photoelectron (MeV) of the current calibration.
+MEV_PER_PE = load_calibration()['MeV_per_PE']
@@ -18,6 +18,9 @@ import multiprocessing
 
 import pandas as pd
 
+# The NPE calibration (energy deposit per PE) from step-3/calibration.json.
+from calibration import MEV_PER_PE
+
 
 def make_cuts(s):
     """Make cuts to keep only signa-like events.
@@ -26,8 +29,8 @@ def make_cuts(s):
     (output of use_rootaway.py).
     """
     # Maximum of 50 NPE for every slab in an event.
-    # Uses our new, tentative, relationship for energy deposit/NPE.
-    s = make_a_cut(s, s.groupby('eventID').EDep_MeV.max() < 50 * 1.24e-3)
+    # Uses the current calibration for energy deposit/NPE.
+    s = make_a_cut(s, s.groupby('eventID').EDep_MeV.max() < 50 * MEV_PER_PE)
 
     # Exactly four hits total.
     s = make_a_cut(s, s.groupby('eventID').size() == 4)
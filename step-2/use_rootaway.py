@@ -4,52 +4,237 @@ to CSV files.
 
 The `output_folder` must exist.
 
+Each file is converted into a temporary folder (in the hidden staging folder
+.rootaway-tmp in the `output_folder`, so that step-3 never mistakes it for a
+cosmicdir), which is only renamed to <subfolder> once rootaway has finished
+successfully, and then recorded in the manifest (conversion_manifest.jsonl in the `output_folder`).
+So it is safe to stop the script while it is running and start it up again:
+finished subfolders (the ones in the manifest) are skipped, and anything that
+was only partly converted is converted again. The manifest also has the size
+and modification time of each ROOT file, so a subfolder is converted again if
+its ROOT file has changed since.
+
+Existing subfolders in the `output_folder` that are NOT in the manifest (e.g.
+from before there was a manifest) are adopted if they look complete (see
+`is_complete`): they are recorded in the manifest, with the current size and
+modification time of their ROOT files, and not converted again. The rest are
+converted again and replaced.
+
 Caution:
-Any existing subfolders in the `output_folder` will be skipped and not
-modified.
-(This is useful for starting the script up again after it was stopped in the
-middle of running.)
+    python use_rootaway.py --reconvert
+doesn't adopt anything, so every existing subfolder that is NOT in the
+manifest is converted again and replaced (its old contents are deleted).
 
-TODO: Sort the order of input/output directories (to make it even easier to
-stop while the script is running and pick it up later.)
+The biggest ROOT files are converted first (so that the run doesn't end with
+one big file converting on its own), and the progress (per file, in total,
+and the estimated time left) is printed as each file finishes.
 
 TODO: Sign off on multiprocessing!
 
 Created 7ish July 2023.
-Last modified 7 July 2023.
+Last modified 18 October 2026.
 """
+from datetime import datetime, timedelta
+import json
 import os
 import multiprocessing
+import shutil
 import subprocess
+import sys
+import time
 import warnings
 
 input_folder = '/net/cms17/cms17r0/schmitz/slabSimMuon/noPhotons/48slab/'
 output_folder = '/net/cms26/cms26r0/anson/noPhotons/'
+manifest_path = os.path.join(output_folder, 'conversion_manifest.jsonl')
+# Where the files are converted to, before they are renamed into place.
+staging_folder = os.path.join(output_folder, '.rootaway-tmp')
+
+
+def input_file(subfolder):
+    return os.path.join(input_folder, subfolder, 'MilliQan.root')
+
+
+def input_identity(subfolder):
+    """Return the size (bytes) and modification time (ns) of the ROOT file of
+    `subfolder`, to tell whether it has changed since it was converted."""
+    stat = os.stat(input_file(subfolder))
+    return {'input_bytes': stat.st_size, 'input_mtime_ns': stat.st_mtime_ns}
 
 
 def convert_file(subfolder):
-    """TODO"""
-    this_input_file = os.path.join(input_folder, subfolder, 'MilliQan.root')
+    """Convert one file with rootaway, into a temporary folder that is renamed
+    when it is done. This function is given to `multiprocessing`.
+
+    :return: `subfolder`, whether it worked, and how long it took (seconds).
+    """
+    this_input_file = input_file(subfolder)
     this_output_folder = os.path.join(output_folder, subfolder)
+    temp_output_folder = os.path.join(staging_folder, subfolder)
+    old_output_folder = os.path.join(staging_folder, subfolder + '.old')
 
-    if os.path.exists(this_output_folder):
-        warnings.warn(f"\n@@@@@ Not writing to the existing directory @@@@@\n{this_output_folder}\n")
-        return
+    # Left over from a run that was stopped.
+    for folder in (temp_output_folder, old_output_folder):
+        if os.path.exists(folder):
+            shutil.rmtree(folder)
+    os.makedirs(staging_folder, exist_ok=True)
 
     print(f"Converting {this_input_file} to {this_output_folder}")
-    print(subprocess.run(f"""root -q '/homes/anson/rootaway/rootaway.C("{this_input_file}", "{this_output_folder}")'""", shell=True))
+    start = time.perf_counter()
+    result = subprocess.run(f"""root -q '/homes/anson/rootaway/rootaway.C("{this_input_file}", "{temp_output_folder}")'""", shell=True)
+    seconds = time.perf_counter() - start
+
+    if result.returncode != 0 or not os.path.exists(temp_output_folder):
+        warnings.warn(f"\n@@@@@ rootaway failed for {this_input_file} @@@@@\n{result}\n")
+        if os.path.exists(temp_output_folder):
+            shutil.rmtree(temp_output_folder)
+        return subfolder, False, seconds
+
+    # Replace anything that is already there (it is not in the manifest, so it
+    # might be incomplete).
+    if os.path.exists(this_output_folder):
+        os.rename(this_output_folder, old_output_folder)
+        os.rename(temp_output_folder, this_output_folder)
+        shutil.rmtree(old_output_folder)
+    else:
+        os.rename(temp_output_folder, this_output_folder)
+
+    return subfolder, True, seconds
+
+
+def read_manifest():
+    """Return the `set` of subfolders that have been converted (according to
+    the manifest, and that still exist), from ROOT files that haven't changed
+    since."""
+    if not os.path.exists(manifest_path):
+        return set()
+
+    # (The last entry of each subfolder counts.)
+    with open(manifest_path) as f:
+        entries = {entry['subfolder']: entry for entry in map(json.loads, filter(str.strip, f))}
+
+    done = set()
+    for subfolder, entry in entries.items():
+        if (not os.path.exists(os.path.join(output_folder, subfolder))
+                or not os.path.exists(input_file(subfolder))):
+            continue
+        identity = input_identity(subfolder)
+        # (Entries from before the modification time was recorded only have
+        # the size.)
+        if all(entry[key] == value for key, value in identity.items() if key in entry):
+            done.add(subfolder)
+    return done
+
+
+def add_to_manifest(subfolder, seconds=None, adopted=False):
+    """Record that `subfolder` has been converted (or adopted: see
+    `adopt_existing`)."""
+    entry = {'subfolder': subfolder, **input_identity(subfolder)}
+    if adopted:
+        entry['adopted'] = True
+    else:
+        entry['seconds'] = round(seconds, 1)
+    entry['finished'] = datetime.now().isoformat(timespec='seconds')
+    with open(manifest_path, 'a') as f:
+        f.write(json.dumps(entry) + '\n')
+
+
+def is_complete(subfolder):
+    """Whether the existing output of `subfolder` looks like a complete
+    rootaway conversion: its ScintRHits.csv is there, isn't empty, ends with
+    a whole line, and is newer than the ROOT file."""
+    hits_path = os.path.join(output_folder, subfolder, 'ScintRHits.csv')
+    if not os.path.exists(hits_path) or os.path.getsize(hits_path) == 0:
+        return False
+    if os.path.getmtime(hits_path) < os.path.getmtime(input_file(subfolder)):
+        return False
+    with open(hits_path, 'rb') as f:
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) == b'\n'
+
+
+def adopt_existing(subfolders):
+    """Record the existing outputs of the `subfolders` that are complete (see
+    `is_complete`) but not in the manifest (e.g. from before there was a
+    manifest) in the manifest, so that they are not converted again.
+
+    :return: The adopted subfolders.
+    """
+    done = read_manifest()
+    adopted = [subfolder for subfolder in subfolders
+               if subfolder not in done
+               and os.path.exists(os.path.join(output_folder, subfolder))
+               and is_complete(subfolder)]
+    for subfolder in adopted:
+        add_to_manifest(subfolder, adopted=True)
+
+    print(f"Adopted {len(adopted)} existing subfolder(s) into the manifest.")
+    return adopted
+
+
+def schedule(subfolders):
+    """Return the `subfolders` that still need to be converted, biggest ROOT
+    file first, and their sizes in bytes."""
+    done = read_manifest()
+    todo = [subfolder for subfolder in subfolders if subfolder not in done]
+
+    for subfolder in todo:
+        if os.path.exists(os.path.join(output_folder, subfolder)):
+            warnings.warn(f"\n@@@@@ Converting again (not in the manifest, or its ROOT file has changed) @@@@@\n{os.path.join(output_folder, subfolder)}\n")
+
+    sizes = {subfolder: os.path.getsize(input_file(subfolder)) for subfolder in todo}
+    todo.sort(key=lambda subfolder: sizes[subfolder], reverse=True)
+
+    print(f"{len(done)} of {len(subfolders)} files already converted; "
+          f"{len(todo)} to go ({sum(sizes.values()) / 1e9:.1f} GB).")
+    return todo, sizes
+
+
+def print_progress(subfolder, ok, seconds, sizes, done_bytes, total_bytes, start):
+    """Print the throughput of one file, and the total throughput and the
+    estimated time left."""
+    elapsed = time.perf_counter() - start
+    file_MB = sizes[subfolder] / 1e6
+    rate = done_bytes / elapsed if elapsed else 0
+    eta = timedelta(seconds=round((total_bytes - done_bytes) / rate)) if rate else '?'
+
+    status = 'done' if ok else 'FAILED'
+    print(f"[{status}] {subfolder}: {file_MB:.0f} MB in {seconds:.0f} s "
+          f"({file_MB / max(seconds, 1e-9):.1f} MB/s) | "
+          f"total {done_bytes / 1e9:.1f} of {total_bytes / 1e9:.1f} GB "
+          f"({rate / 1e6:.1f} MB/s) | ETA {eta}")
+
+
+if __name__ == '__main__':
+    if not os.path.exists(output_folder):
+        raise ValueError(f"Sorry, but this script requires the output folder to exist. The output folder given was: {output_folder}")
 
+    # Ensure that we are using ROOT (this is Ryan's ROOT installation).
+    # TODO: try removing brackets
+    subprocess.run(['source /net/cms17/cms17r0/schmitz/root6/install/bin/thisroot.sh'], shell=True)
 
-if not os.path.exists(output_folder):
-    raise ValueError(f"Sorry, but this script requires the output folder to exist. The output folder given was: {output_folder}")
+    print(f"Starting at: {datetime.now()}")
 
-# Ensure that we are using ROOT (this is Ryan's ROOT installation).
-# TODO: try removing brackets
-subprocess.run(['source /net/cms17/cms17r0/schmitz/root6/install/bin/thisroot.sh'], shell=True)
+    subfolders = next(os.walk(input_folder))[1]
+    if '--reconvert' not in sys.argv[1:]:
+        adopt_existing(subfolders)
+    todo, sizes = schedule(subfolders)
+    total_bytes = sum(sizes.values())
+    num_available_cores = len(os.sched_getaffinity(0))
 
-subfolders = next(os.walk(input_folder))[1]
-num_available_cores = len(os.sched_getaffinity(0))
+    done_bytes = 0
+    failed = []
+    start = time.perf_counter()
+    with multiprocessing.Pool(num_available_cores) as pool:
+        # `chunksize=1` keeps the biggest-first order.
+        for subfolder, ok, seconds in pool.imap_unordered(convert_file, todo, chunksize=1):
+            done_bytes += sizes[subfolder]
+            if ok:
+                add_to_manifest(subfolder, seconds)
+            else:
+                failed.append(subfolder)
+            print_progress(subfolder, ok, seconds, sizes, done_bytes, total_bytes, start)
 
-with multiprocessing.Pool(num_available_cores) as pool:
-    pool.map(convert_file, subfolders)
- 
\ No newline at end of file
+    if failed:
+        print(f"{len(failed)} file(s) failed (run the script again to retry): {failed}")
+    print(f"Ending at: {datetime.now()}")
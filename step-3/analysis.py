@@ -7,8 +7,13 @@ Caution:
  - Check all plot and text contents before uncommenting and using
  alternative plot styles.
 
-Comment out the call to `make_plot_data` to speed things up (useful for making
-small changes to the plot style, etc. and seeing the results fast.)
+The plots are made from histograms (see histograms.py), not from the cut
+hits: cuts.process_folder fills them and saves them in plot_histograms.json,
+so nothing else needs to be loaded. (If there is no plot_histograms.json
+here, they are filled from cut_ScintRHits_v2.csv, and memoized in
+.analysis_cache: see memo.py. So there's no need to comment anything out to
+change the plots quickly. The CSV file is only read again if it changes, or
+if the code that makes the histograms changes.)
 
 TODO: ARK about 4 themes (maybe experiment by giving Ryan transparent version,
  and also ask him)
@@ -22,10 +27,25 @@ TODO: Possible things to update:
  - Different plot colors
 
 Created 8 July 2023."""
-import matplotlib.pyplot as plt
+import os
+
 import numpy as np
 import pandas as pd
-import seaborn as sns
+
+from calibration import CALIBRATION_PATH
+from features import PLOT_BINS, event_features, fill_plot_histograms
+from histograms import Histogram, read_histograms
+from hits import read_cut_hits
+from instrument import stage, set_report, finish_report
+from memo import AnalysisCache
+import features
+import histograms as histograms_module
+import hits
+import timing
+
+# (matplotlib and seaborn are only imported when something is plotted (see
+# `histogram_with_error_bars`), so the rest of this file can be used without
+# them, and render.py's workers are the only processes that import them.)
 
 print("Finished imports.")
 
@@ -33,71 +53,52 @@ print("Finished imports.")
 
 
 def make_plot_data(s):
-    """Do the analysis and make the data for the plots.
-
-    This only takes 10 seconds or so, but it's nice to not have to wait that
-    long every time a change to a plot is made.
+    """Do the analysis and make the data for the plots (see
+    `features.event_features`).
 
     :param s: `DataFrame` in the format of cut_ScintRHits.csv.
+    :return: `NPE_ratio` and `delta_t_max` (`Series` indexed by
+    `uniqueEventID`).
     """
 
     # Only one module (all slabs in a row).
     # This really cuts down the number of events, so that the "statistics are poor."
-    # s['moduleNo'] = (s.copyNo - 18) // 4
-    # s = make_a_cut(s, s.groupby('uniqueEventID').moduleNo.nunique() == 1)
-
-    # Calibrate the hit times
-    # (relative to a particle at light speed coming from the IP).
-    # The measured distance of the length of the detector (from Ryan) is
-    # 3.4 meters, or 11.3 light-nanoseconds.
-    s['relativeHitTime_ns'] = s.hitTime_ns - s.layerNo * (11.3 / 3)
-
-    event = s.groupby('uniqueEventID')
+    # (See `cutflow.ONE_MODULE` and cut_flow.json.)
 
-    NPE_ratio = event.EDep_MeV.max() / event.EDep_MeV.min()
+    features = event_features(s, key='uniqueEventID')
 
-    # Calculate delta_t_max as described in the TDR.
-    max_time_hit = s.iloc[event.relativeHitTime_ns.idxmax()].set_index('uniqueEventID')
-    min_time_hit = s.iloc[event.relativeHitTime_ns.idxmin()].set_index('uniqueEventID')
-    delta_t_max = (
-        max_time_hit.relativeHitTime_ns - min_time_hit.relativeHitTime_ns
-    ) * np.sign(max_time_hit.layerNo - min_time_hit.layerNo)
+    return features.NPE_ratio, features.delta_t_max
 
-    # An alternative method for calculating time differences between hits.
-    # layers = [s[s.layerNo == i].set_index('uniqueEventID') for i in (0, 1, 2, 3)]
-    # t0, t1, t2, t3 = (layer.relativeHitTime_ns for layer in layers)
 
-    # # Make the NPE/energy deposit ratio cut.
-    # # NPE_ratio_per_event = g.EDep_MeV.max() / g.EDep_MeV.min()  TODO
-    # s_without_timing_cut = make_a_cut(s, NPE_ratio < 10)
-    #
-    # # Make the timing cut.
-    # # delta_t_max = g.relativeHitTime_ns.max() - g.relativeHitTime_ns.min()  TODO
-    # s_without_ratio_cut = make_a_cut(s, (-15 < delta_t_max) & (delta_t_max < 45))
+def plot_data_from_file(path):
+    """Read the cut hits at `path` and make the plot data (see
+    `make_plot_data`). For memoizing (see memo.py)."""
+    return make_plot_data(read_cut_hits(path))
 
-    # TODO: save CSVs
 
-    return NPE_ratio, delta_t_max
+def plot_histograms_from_file(path):
+    """Read the cut hits at `path` and fill the plot histograms (see
+    `features.fill_plot_histograms`). For memoizing (see memo.py)."""
+    return fill_plot_histograms(read_cut_hits(path), key='uniqueEventID')
 
 
-def plot_NPE(s):
+def plot_NPE(histogram, bin_size=PLOT_BINS['NPE'][2], color='tab:red', error_bar_type='notCRC',
+             path='scratch-NPE.png'):
     """Plot the distribution of NPE in individual slabs, as in step 2, but with
-    the new, less restrictive cut."""
-    # Uses our tentative relationship for energy deposit/NPE.
-    s['equivalentNPE'] = s.EDep_MeV / 1.24e-3
+    the new, less restrictive cut.
 
-    # Mini-cut for plot slab hits with NPE or energy deposit not zero or negative.
-    s = s[s.equivalentNPE > 0]
-
-    print(f"{s.uniqueEventID.nunique()} events and {len(s)} hits in the nonzero NPE plot.")
+    :param histogram: `histograms.Histogram` of the nonzero NPE of each hit
+    (see `features.fill_plot_histograms`).
+    :param bin_size, color, error_bar_type: See `histogram_with_error_bars`.
+    :param path: Where to save the plot.
+    :return: The `matplotlib` figure.
+    """
+    print(f"{histogram.total:.0f} hits in the nonzero NPE plot.")
 
     # Make the plot.
 
-    fig, ax = histogram_with_error_bars(s.equivalentNPE,
-                                        bin_size=1/2,
-                                        min=0,
-                                        max=50,
-                                        color='tab:red')
+    fig, ax = histogram_with_error_bars(histogram, bin_size, color=color,
+                                        error_bar_type=error_bar_type)
 
     ax.set_title("Nonzero $N_{PE}$ equivalent in individual slabs\nin non-muon-like, 1-per-layer events", fontsize=10.5)
     ax.set_xlabel('$N_{PE}$ equivalent')
@@ -134,23 +135,26 @@ def plot_NPE(s):
 
     fig = ax.get_figure()
     fig.tight_layout()
-    fig.savefig('scratch-NPE.png')
+    fig.savefig(path)
+    return fig
 
 
-def plot_delta_t_max(NPE_ratio, delta_t_max):
+def plot_delta_t_max(histogram, bin_size=PLOT_BINS['delta_t_max'][2], color='tab:orange',
+                     error_bar_type='notCRC', path='scratch-delta.png'):
     """Make a histogram of delta_t_max after all other cuts (except 4-in-a-row
-    and veto cuts.)"""
-    # Cut for NPE (or energy deposit) max/min < 10.
-    good_NPE_ratio_eventIDs = NPE_ratio.index[NPE_ratio < 10]
-    cut_delta_t_max = delta_t_max[good_NPE_ratio_eventIDs]
-
-    print(f"{len(cut_delta_t_max)} events in the delta_t_max plot.")
+    and veto cuts.)
+
+    :param histogram: `histograms.Histogram` of delta_t_max for events with
+    NPE (or energy deposit) max/min < 10 (see
+    `features.fill_plot_histograms`).
+    :param bin_size, color, error_bar_type: See `histogram_with_error_bars`.
+    :param path: Where to save the plot.
+    :return: The `matplotlib` figure.
+    """
+    print(f"{histogram.total:.0f} events in the delta_t_max plot.")
 
-    fig, ax = histogram_with_error_bars(cut_delta_t_max,
-                                        bin_size=2,
-                                        min=-50,
-                                        max=50,
-                                        color='tab:orange')
+    fig, ax = histogram_with_error_bars(histogram, bin_size, color=color,
+                                        error_bar_type=error_bar_type)
 
     ax.set_title(r"$\Delta t_{max}$ of signal-like cosmic muon events", fontsize=11)
     ax.set_xlabel(r"$\Delta t_{max}$ (ns)")
@@ -187,23 +191,25 @@ def plot_delta_t_max(NPE_ratio, delta_t_max):
     ax.legend(loc=(0.765, 0.45), fontsize=9)
 
     fig.tight_layout()
-    fig.savefig('scratch-delta.png')
+    fig.savefig(path)
+    return fig
 
 
-def plot_NPE_ratio(NPE_ratio, delta_t_max):
+def plot_NPE_ratio(histogram, bin_size=PLOT_BINS['NPE_ratio'][2], color='tab:green',
+                   error_bar_type='notCRC', path='scratch-ratio.png'):
     """Make a histogram of the NPE_ratio after all other cuts (except
-    4-in-a-row and veto cuts)."""
-    # Cut for -15 ns < delta_t_max < 45 ns.
-    good_delta_t_max_eventIDs = delta_t_max.index[(-15 < delta_t_max) & (delta_t_max < 45)]
-    cut_NPE_ratio = NPE_ratio[good_delta_t_max_eventIDs]
+    4-in-a-row and veto cuts).
 
-    print(f"{len(cut_NPE_ratio)} events in the NPE ratio plot.")
+    :param histogram: `histograms.Histogram` of the NPE ratio for events with
+    -15 ns < delta_t_max < 45 ns (see `features.fill_plot_histograms`).
+    :param bin_size, color, error_bar_type: See `histogram_with_error_bars`.
+    :param path: Where to save the plot.
+    :return: The `matplotlib` figure.
+    """
+    print(f"{histogram.total:.0f} events in the NPE ratio plot.")
 
-    fig, ax = histogram_with_error_bars(cut_NPE_ratio,
-                                        bin_size=1/2,
-                                        min=0,
-                                        max=45,
-                                        color='tab:green')  # TODO: Decide whether to show negative values.
+    fig, ax = histogram_with_error_bars(histogram, bin_size, color=color,  # TODO: Decide whether to show negative values.
+                                        error_bar_type=error_bar_type)
 
     ax.set_title("$N_{PE}$ max/min of signal-like cosmic muon events", fontsize=10.4)
     ax.set_xlabel(r"$N_{PE}$ equivalent max/min")
@@ -245,22 +251,40 @@ def plot_NPE_ratio(NPE_ratio, delta_t_max):
 
 
     fig.tight_layout()
-    fig.savefig('scratch-ratio.png')
+    fig.savefig(path)
+    return fig
 
 
-def histogram_with_error_bars(x, bin_size, min, max, color='tab:purple'):
-    """TODO"""
-    bins = np.arange(min, max + bin_size, bin_size)
+def histogram_with_error_bars(x, bin_size=None, min=None, max=None, color='tab:purple',
+                              error_bar_type='notCRC'):
+    """Plot a histogram with (2 sigma) error bars.
+
+    :param x: A `histograms.Histogram`, or the values to histogram (then
+    `bin_size`, `min` and `max` are needed). Only values between `min` and
+    `max` are shown.
+    :param bin_size: For a `histograms.Histogram`, the bins are merged into
+    bins of this size (if given; see `histograms.Histogram.rebin_to`).
+    :param error_bar_type: 'CRC' for error bar lines, or anything else for
+    hatched bands.
+    """
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
+    if isinstance(x, Histogram):
+        histogram = x if bin_size is None else x.rebin_to(bin_size)
+    else:
+        histogram = Histogram(min, max, bin_size).fill(x)
+    bins = histogram.edges
+    min, max = histogram.min, histogram.max
 
     fig, ax = plt.subplots(figsize=(4, 3), dpi=200)
 
-    x = x[(min < x) & (x < max)]
-    sns.histplot(x=x, bins=bins, ax=ax, edgecolor=None, color=color)
+    sns.histplot(x=histogram.midpoints, weights=histogram.counts, bins=bins.tolist(), ax=ax,
+                 edgecolor=None, color=color)
     print("Made histogram.")
 
-    error_bar_type = 'notCRC'
-    histogram_counts, _ = np.histogram(x, bins)
-    histogram_error = 2*np.sqrt(histogram_counts)  # x2 sigma; TODO decide on this permanently
+    histogram_counts = histogram.counts
+    histogram_error = 2*histogram.errors  # x2 sigma; TODO decide on this permanently
 
     # Add error bars (lines) on top of the seaborn histogram.
     if error_bar_type == 'CRC':
@@ -297,30 +321,27 @@ def histogram_with_error_bars(x, bin_size, min, max, color='tab:purple'):
     return fig, ax
 
 
-def read_csv_series(*args, **kwargs):
-    """Utility for reading `pandas.DataFrame.Series` that were saved to CSV
-    files via `to_csv` (without any other arguments).
-
-    The standard `pandas.read_csv` returns a `DataFrame` instead of a
-    `Series`. This function also works for turning any CSV files with two
-    columns into a `Series`."""
-    df = pd.read_csv(*args, **kwargs)
-    series = df.set_index(df.columns[0])[df.columns[1]]
-    return series
+if __name__ == '__main__':
+    # Time each step (see instrument.py).
+    if os.path.exists('analysis_report.jsonl'):
+        os.remove('analysis_report.jsonl')
+    set_report('analysis_report.jsonl')
 
-
-s = pd.read_csv('cut_ScintRHits_v2.csv')
-
-# Uncomment to write plot data to files.
-NPE_ratio, delta_t_max = make_plot_data(s)
-pd.DataFrame({'NPE_ratio': NPE_ratio}).to_csv('NPE_ratio.csv')
-pd.DataFrame({'delta_t_max': delta_t_max}).to_csv('delta_t_max.csv')
-print(f"Wrote plot data to files.")
-
-# Load plot data from files.
-NPE_ratio = read_csv_series('NPE_ratio.csv')
-delta_t_max = read_csv_series('delta_t_max.csv')
-
-plot_NPE(s)
-plot_delta_t_max(NPE_ratio, delta_t_max)
-plot_NPE_ratio(NPE_ratio, delta_t_max)
+    if os.path.exists('plot_histograms.json'):
+        # Saved by cuts.process_folder.
+        with stage('read_histograms'):
+            histograms = read_histograms('plot_histograms.json')
+    else:
+        # (Only filled from the CSV file the first time.)
+        with stage('fill_histograms'):
+            histograms = AnalysisCache().call(plot_histograms_from_file, 'cut_ScintRHits_v2.csv',
+                                              modules=(features, histograms_module, hits, timing),
+                                              files=(CALIBRATION_PATH,))
+
+    for name, plot in (('NPE', plot_NPE), ('delta_t_max', plot_delta_t_max),
+                       ('NPE_ratio', plot_NPE_ratio)):
+        with stage('plot', plot=name):
+            plot(histograms[name])
+
+    set_report(None)
+    finish_report('analysis_report.jsonl')
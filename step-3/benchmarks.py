@@ -0,0 +1,463 @@
+"""Timing comparisons on fake data (see synthetic.py), so they can be run
+anywhere, without the simulation files on the server.
+
+Run this file to run all of the benchmarks.
+
+Created 18 October 2026.
+"""
+import multiprocessing
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from cutflow import (Events, all_layers_hit, one_module, num_unique_equal, SIGNAL_LIKE,
+                     SIGNAL_LIKE_PMT)
+from events import SyntheticEventSource
+from cuts import (process_file, process_folder, make_cuts, make_cuts_and_count,
+                  make_cuts_groupby, cut_by_event, cut_by_event_isin, aggregate_slab_hits,
+                  load_cut_order)
+from geometry import LAYOUT
+from hit_random import HitRandom
+from hits import COLUMNS, read_hits, read_cut_hits, write_hits
+from instrument import reset_peak_rss, peak_rss_MB
+from pmt import slab_NPE, find_slab_NPE_file, SlabNPEWriter
+from synthetic import make_hits, write_hits_file, write_dataset
+from timing import layer_matrix
+
+
+def timed(function, *args, **kwargs):
+    """Call `function` and return its result and how long it took in
+    seconds."""
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def compare_formats(num_events=200_000, seed=0):
+    """Compare the rootaway path (ScintRHits.csv) with the convert.py path
+    (ScintRHits.parquet) on one fake cosmicdir with `num_events` events.
+
+    Times writing each file (the conversion step), reading it back with
+    `hits.read_hits`, and all of `cuts.process_file`.
+    """
+    hits = make_hits(num_events, seed=seed)
+    num_hits = len(hits)
+    print(f"compare_formats: {num_events} events, {num_hits} hits")
+
+    with tempfile.TemporaryDirectory() as folder:
+        csv_path = os.path.join(folder, 'ScintRHits.csv')
+        parquet_path = os.path.join(folder, 'ScintRHits.parquet')
+
+        # rootaway writes every column as text; convert.py writes only the
+        # columns that the cuts need.
+        _, csv_write = timed(hits.to_csv, csv_path, index=False)
+        _, parquet_write = timed(write_hits, hits, parquet_path)
+
+        for name, path, write_time in (('CSV', csv_path, csv_write),
+                                       ('Parquet', parquet_path, parquet_write)):
+            size_MB = os.path.getsize(path) / 1e6
+            _, read_time = timed(read_hits, path)
+            _, process_time = timed(process_file, path)
+
+            print(f"  {name:>7}: {size_MB:8.1f} MB on disk | "
+                  f"write {write_time:6.2f} s | "
+                  f"read {read_time:6.2f} s ({num_hits / read_time / 1e6:6.2f} M hits/s, "
+                  f"{size_MB / read_time:7.1f} MB/s) | "
+                  f"process_file {process_time:6.2f} s")
+
+
+def compare_cut_engines(num_events=(100_000, 1_000_000), seed=0):
+    """Compare `cuts.make_cuts` (sort once + segment reductions) with
+    `cuts.make_cuts_groupby` (`groupby` + `isin` for every cut), and
+    `cuts.cut_by_event` with `cuts.cut_by_event_isin`, and check that they give
+    the same results.
+
+    (`cuts.make_cuts` also evaluates the extra cuts in `cutflow.SIGNAL_LIKE`
+    for the cut flow counts.)"""
+    print("compare_cut_engines:")
+
+    for n in num_events:
+        hits = read_hits_like(make_hits(n, seed=seed))
+
+        # (With the old, in order, random NPE thresholds, so the results are
+        # the same.)
+        groupby_result, groupby_time = timed(make_cuts_groupby, hits)
+        segment_result, segment_time = timed(make_cuts, hits, np.random.RandomState(0))
+        # (`make_cuts` stores the NPE and layer number in compact dtypes.)
+        assert segment_result.equals(groupby_result.astype(segment_result.dtypes))
+
+        eventID_bool = hits.groupby('eventID').EDep_MeV.max() < 1
+        isin_result, isin_time = timed(cut_by_event_isin, hits, eventID_bool)
+        mask_result, mask_time = timed(cut_by_event, hits, eventID_bool)
+        assert mask_result.equals(isin_result)
+
+        print(f"  {n:>9} events, {len(hits):>9} hits: "
+              f"make_cuts {segment_time:6.2f} s vs. {groupby_time:6.2f} s "
+              f"({groupby_time / segment_time:4.1f}x) | "
+              f"cut_by_event {mask_time:6.3f} s vs. {isin_time:6.3f} s "
+              f"({isin_time / mask_time:4.1f}x)")
+
+
+def compare_event_sources(num_events=2_000, events_per_batch=500, seed=0):
+    """Compare reading events one at a time, with one `dict` per hit (the old
+    `starter_project.read_root`), with reading them in batches of arrays
+    (`events.SyntheticEventSource.iter_batches`, like `RootEventSource`).
+
+    The events are made before timing the one-at-a-time loop, so only the
+    loop itself is timed.
+    """
+    source = SyntheticEventSource(num_events, events_per_batch=events_per_batch, seed=seed)
+    one_at_a_time = list(source)
+
+    def read_one_at_a_time():
+        energy_df = []
+        PMT_df = []
+        for event in one_at_a_time:
+            for hit in event.ScintRHits:
+                energy_df.append({'slab_number': hit.GetCopyNo(), 'energy': hit.GetEDep()})
+            for hit in event.PMTHits:
+                PMT_df.append({'PMT_number': hit.GetPMTNumber()})
+        return pd.DataFrame(energy_df), pd.DataFrame(PMT_df)
+
+    def read_batches():
+        batches = list(source.iter_batches())
+        return (pd.concat([b['ScintRHits'] for b in batches], ignore_index=True),
+                pd.concat([b['PMTHits'] for b in batches], ignore_index=True))
+
+    (old_energy, old_PMT), old_time = timed(read_one_at_a_time)
+    (new_energy, new_PMT), new_time = timed(read_batches)
+    assert (old_energy.energy.to_numpy() == new_energy.EDep_MeV.to_numpy()).all()
+    assert (old_PMT.PMT_number.to_numpy() == new_PMT.PMT_number.to_numpy()).all()
+
+    num_hits = len(new_energy) + len(new_PMT)
+    print(f"compare_event_sources: {num_events} events, {num_hits} hits")
+    print(f"  one at a time: {old_time:6.2f} s ({num_hits / old_time / 1e6:6.2f} M hits/s)")
+    print(f"  batches:       {new_time:6.2f} s ({num_hits / new_time / 1e6:6.2f} M hits/s, "
+          f"including making the fake events)")
+
+
+def compare_timing(num_events=(250_000, 1_000_000, 4_000_000), seed=0):
+    """Compare calculating delta_t_max and the NPE ratio with `groupby`,
+    `idxmax`/`idxmin` and `iloc` (the old `analysis.make_plot_data`) with
+    `timing.layer_matrix`, on the aggregated slab hits (before the event cuts,
+    so there are lots of events), and check that they agree for events with
+    one hit per layer.
+
+    The time per hit of `layer_matrix` should stay about the same as the
+    number of hits grows.
+    """
+    print("compare_timing:")
+
+    for n in num_events:
+        s = aggregate_slab_hits(make_hits(n, seed=seed))
+        s['layerNo'] = (s.copyNo - 18) % 4
+
+        def old_way():
+            s['relativeHitTime_ns'] = s.hitTime_ns - s.layerNo * (11.3 / 3)
+            event = s.groupby('eventID')
+            NPE_ratio = event.EDep_MeV.max() / event.EDep_MeV.min()
+            max_time_hit = s.iloc[event.relativeHitTime_ns.idxmax()].set_index('eventID')
+            min_time_hit = s.iloc[event.relativeHitTime_ns.idxmin()].set_index('eventID')
+            delta_t_max = (
+                max_time_hit.relativeHitTime_ns - min_time_hit.relativeHitTime_ns
+            ) * np.sign(max_time_hit.layerNo - min_time_hit.layerNo)
+            return NPE_ratio, delta_t_max
+
+        def new_way():
+            matrix = layer_matrix(s)
+            return matrix.NPE_ratio(), matrix.delta_t_max()
+
+        (old_ratio, old_delta_t_max), old_time = timed(old_way)
+        (new_ratio, new_delta_t_max), new_time = timed(new_way)
+
+        g = s.groupby('eventID').layerNo
+        one_per_layer = (g.size() == g.nunique()).to_numpy()
+        assert np.array_equal(old_delta_t_max.to_numpy()[one_per_layer],
+                              new_delta_t_max[one_per_layer], equal_nan=True)
+        assert np.array_equal(old_ratio.to_numpy()[one_per_layer],
+                              new_ratio[one_per_layer], equal_nan=True)
+
+        print(f"  {len(s):>9} slab hits: layer_matrix {new_time:6.2f} s "
+              f"({new_time / len(s) * 1e9:5.1f} ns/hit) vs. {old_time:6.2f} s "
+              f"({old_time / new_time:4.1f}x)")
+
+
+def compare_prefilters(num_events=(250_000, 1_000_000), seed=0):
+    """Compare `cuts.make_cuts_and_count` without the prefilters (aggregate
+    every event, evaluate every cut on every event, and count) with it
+    prefiltering the raw hits first (`prefilter_hits=True`), and with
+    `cuts.make_cuts` (prefilter the raw hits, then make each event cut on
+    what's left), in the order of the cut flow and in the order learned from
+    a run report (see `cutflow.order_by_selectivity`), and check that they
+    agree."""
+    print("compare_prefilters:")
+
+    with tempfile.TemporaryDirectory() as folder:
+        write_dataset(folder, 2, 50_000, seed=seed)
+        process_folder(folder, cache=False)
+        order = load_cut_order(folder)
+    print(f"  Learned order: {order}")
+
+    for n in num_events:
+        hits = read_hits_like(make_hits(n, seed=seed))
+        random_state = HitRandom(seed)
+
+        (counted, counts), counted_time = timed(make_cuts_and_count, hits, random_state)
+        (prefiltered, prefiltered_counts), prefiltered_time = timed(
+            make_cuts_and_count, hits, random_state, prefilter_hits=True)
+        default, default_time = timed(make_cuts, hits, random_state)
+        learned, learned_time = timed(make_cuts, hits, random_state, **order)
+        for result in (prefiltered, default, learned):
+            assert result.reset_index(drop=True).equals(counted.reset_index(drop=True))
+        # (The same events before and after all of the cuts. In between, the
+        # prefiltered counts don't have the events that the prefilters
+        # dropped.)
+        rows = ['All events', counts.applied_cuts[-1]]
+        assert prefiltered_counts.table().loc[rows, ['events', 'hits']].equals(
+            counts.table().loc[rows, ['events', 'hits']])
+
+        print(f"  {n:>9} events: prefiltered {learned_time:6.3f} s (learned order) | "
+              f"{default_time:6.3f} s (cut flow order) | "
+              f"make_cuts_and_count {prefiltered_time:6.3f} s (prefiltered) | "
+              f"make_cuts_and_count {counted_time:6.3f} s ({counted_time / learned_time:4.1f}x)")
+
+
+def compare_topology_cuts(num_events=(250_000, 1_000_000), seed=0):
+    """Compare the "All 4 layers" and "Only one module" cuts made with
+    `groupby().nunique()` (the old way), with `segments.segment_nunique`, and
+    with bit tests on the per-event hit pattern (see geometry.py), and check
+    that they agree."""
+    print("compare_topology_cuts:")
+
+    for n in num_events:
+        s = aggregate_slab_hits(make_hits(n, seed=seed))
+
+        def old_way():
+            s['layerNo'] = (s.copyNo - 18) % 4
+            s['moduleNo'] = (s.copyNo - 18) // 4
+            event = s.groupby('eventID')
+            return ((event.layerNo.nunique() == 4).to_numpy(),
+                    (event.moduleNo.nunique() == 1).to_numpy())
+
+        def nunique_way():
+            events = Events(s)
+            return (num_unique_equal(events, 'layerNo', 4),
+                    num_unique_equal(events, 'moduleNo', 1))
+
+        def bitmask_way():
+            events = Events(s)
+            return all_layers_hit(events), one_module(events)
+
+        old, old_time = timed(old_way)
+        by_nunique, nunique_time = timed(nunique_way)
+        by_bitmask, bitmask_time = timed(bitmask_way)
+
+        for cuts in (by_nunique, by_bitmask):
+            assert all(np.array_equal(a, b) for a, b in zip(old, cuts))
+
+        print(f"  {len(s):>9} slab hits: bitmask {bitmask_time:6.3f} s | "
+              f"segment_nunique {nunique_time:6.3f} s ({nunique_time / bitmask_time:4.1f}x) | "
+              f"groupby {old_time:6.3f} s ({old_time / bitmask_time:4.1f}x)")
+
+
+def compare_PMT_NPE(num_events=3_000, seed=0):
+    """Compare the measured NPE of the slab hits (from the fake PMT hits:
+    `pmt.slab_NPE`, one sort and run lengths) with `groupby().size()`, check
+    that they agree, and compare the time of `process_file` cutting on the
+    energy-based NPE (`cutflow.SIGNAL_LIKE`) and on the measured NPE
+    (`cutflow.SIGNAL_LIKE_PMT`, which also reads and joins PMTNPE.parquet).
+
+    (About 1600 PMT hits per slab hit, so only a few thousand events.)"""
+    print("compare_PMT_NPE:")
+
+    batch = next(SyntheticEventSource(num_events, seed=seed).iter_batches())
+    PMT_hits = batch['PMTHits']
+
+    def groupby_way():
+        copyNo = PMT_hits.PMT_number // 2 + LAYOUT.first_copyNo
+        return PMT_hits.groupby([PMT_hits.eventID, copyNo.rename('copyNo')]).size()
+
+    ours, our_time = timed(slab_NPE, PMT_hits)
+    old, old_time = timed(groupby_way)
+    assert np.array_equal(ours.NPE.to_numpy(), old.to_numpy())
+    print(f"  {len(PMT_hits):>9} PMT hits: slab_NPE {our_time:6.3f} s | "
+          f"groupby {old_time:6.3f} s ({old_time / our_time:4.1f}x)")
+
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, 'ScintRHits.parquet')
+        write_hits(batch['ScintRHits'], path)
+        with SlabNPEWriter(find_slab_NPE_file(path)) as writer:
+            writer.write(ours)
+
+        _, energy_time = timed(process_file, path, cut_flow=SIGNAL_LIKE)
+        _, PMT_time = timed(process_file, path, cut_flow=SIGNAL_LIKE_PMT)
+    print(f"  process_file: energy-based NPE {energy_time:6.3f} s | "
+          f"measured NPE {PMT_time:6.3f} s")
+
+
+def read_hits_like(df):
+    """Return the columns of the fake hits `df` that `hits.read_hits` would
+    read, with the same dtypes."""
+    return df[list(COLUMNS)].astype(COLUMNS)
+
+
+def _peak_memory_of_process_file(path, chunksize, queue):
+    """Run `process_file` and put the peak RSS (in MB) on the `queue`. Runs in
+    its own process, so the peak RSS belongs to `process_file` alone."""
+    reset_peak_rss()
+    process_file(path, chunksize=chunksize)
+    queue.put(peak_rss_MB())
+
+
+def compare_streaming(num_events=(100_000, 400_000), chunksize=200_000, seed=0):
+    """Compare the peak memory and time of `process_file` reading whole files
+    and reading them in chunks of `chunksize` hits, for files with each of
+    the numbers of events in `num_events`.
+
+    With chunks, the peak memory should stay about the same as the files get
+    bigger.
+    """
+    context = multiprocessing.get_context('fork')
+    print(f"compare_streaming: chunksize = {chunksize} hits")
+
+    with tempfile.TemporaryDirectory() as folder:
+        for n in num_events:
+            path = os.path.join(folder, f'ScintRHits_{n}.parquet')
+            write_hits(make_hits(n, seed=seed), path)
+
+            for this_chunksize in (None, chunksize):
+                queue = context.Queue()
+                process = context.Process(target=_peak_memory_of_process_file,
+                                          args=(path, this_chunksize, queue))
+                start = time.perf_counter()
+                process.start()
+                peak_MB = queue.get()
+                process.join()
+                seconds = time.perf_counter() - start
+
+                mode = 'whole file' if this_chunksize is None else 'chunks'
+                print(f"  {n:>9} events, {mode:>10}: peak RSS {peak_MB:7.1f} MB | "
+                      f"{seconds:6.2f} s")
+
+
+# The dtypes that `pandas.read_csv` gives the columns of a ScintRHits file by
+# default (what every stage used before `hits.COLUMNS`).
+DEFAULT_COLUMNS = {
+    'eventID': 'int64',
+    'copyNo': 'int64',
+    'EDep_MeV': 'float64',
+    'hitTime_ns': 'float64',
+}
+
+
+def _footprint_of_process_file(path, columns, queue):
+    """Run `process_file` with the hit `columns` (dtypes) and put the peak
+    RSS (in MB), the time it took, and the bytes per hit of the hits that
+    were read and of the cut hits on the `queue`. Runs in its own process,
+    like a worker of `cuts.process_folder`."""
+    reset_peak_rss()
+    start = time.perf_counter()
+    cut_file = process_file(path, columns=columns)[0]
+    seconds = time.perf_counter() - start
+    peak_MB = peak_rss_MB()
+
+    hits = read_hits(path, columns)
+    if columns is DEFAULT_COLUMNS:
+        # (What the cut hits used to look like: all `int64` and `float64`.)
+        cut_file = cut_file.astype({'copyNo': 'int64', 'equivalentNPE': 'float64',
+                                    'layerNo': 'int64'})
+    queue.put((peak_MB, seconds,
+               hits.memory_usage(index=False).sum() / len(hits),
+               cut_file.memory_usage(index=False).sum() / max(len(cut_file), 1)))
+
+
+def compare_hit_dtypes(num_hits=10**7, seed=0):
+    """Compare the memory footprint and the time of a `cuts.process_file`
+    worker on a fake file with about `num_hits` hits, reading the hits with
+    `pandas`' default dtypes (`DEFAULT_COLUMNS`) and with the compact ones
+    (`hits.COLUMNS`, and `hits.CUT_COLUMNS` for the cut hits).
+    """
+    context = multiprocessing.get_context('fork')
+
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, 'ScintRHits.parquet')
+        hits_per_event = len(make_hits(10_000, seed=seed)) / 10_000
+        num_hits = write_hits_file(path, round(num_hits / hits_per_event), seed=seed)
+        print(f"compare_hit_dtypes: {num_hits} hits")
+
+        for name, columns in (('default', DEFAULT_COLUMNS), ('compact', COLUMNS)):
+            queue = context.Queue()
+            process = context.Process(target=_footprint_of_process_file,
+                                      args=(path, columns, queue))
+            process.start()
+            peak_MB, seconds, hit_bytes, cut_hit_bytes = queue.get()
+            process.join()
+
+            print(f"  {name:>7} dtypes: peak RSS {peak_MB:7.1f} MB | "
+                  f"{hit_bytes:4.1f} bytes/hit read, {cut_hit_bytes:4.1f} bytes/cut hit | "
+                  f"process_file {seconds:6.2f} s ({num_hits / seconds / 1e6:5.2f} M hits/s)")
+
+
+def benchmark_pipeline(num_events=(40_000, 400_000, 2_000_000), num_files=4, seed=0):
+    """Time each stage of the pipeline on fake datasets (see synthetic.py)
+    with each of the total numbers of events in `num_events`, split into
+    `num_files` cosmicdirs of ScintRHits.parquet files:
+     - `cuts.make_cuts` on the hits of one file,
+     - all of `cuts.process_folder` (without the cache),
+     - `analysis.make_plot_data` on the cut hits (cut_ScintRHits.csv), and
+     - `analysis.histogram_with_error_bars` on the NPE ratios, from the values
+     and from a `histograms.Histogram`.
+
+    (See golden.py for checking the outputs, instead of timing them.)
+    """
+    # (analysis.py only imports matplotlib and seaborn to plot.)
+    import matplotlib.pyplot as plt
+    import analysis
+    from features import PLOT_BINS
+    from histograms import Histogram
+
+    print(f"benchmark_pipeline: {num_files} files")
+
+    for n in num_events:
+        with tempfile.TemporaryDirectory() as folder:
+            cosmicdirs = write_dataset(folder, num_files, n // num_files, seed=seed,
+                                       formats=('parquet',))
+            hits = read_hits(os.path.join(cosmicdirs[0], 'ScintRHits.parquet'))
+            num_hits = len(hits) * num_files
+
+            _, cut_time = timed(make_cuts, hits)
+            _, folder_time = timed(process_folder, folder, cache=False)
+
+            s = read_cut_hits(os.path.join(folder, 'cut_ScintRHits.csv'))
+            (NPE_ratio, _), plot_data_time = timed(analysis.make_plot_data, s)
+
+            bins = PLOT_BINS['NPE_ratio']
+            (fig, _), values_plot_time = timed(analysis.histogram_with_error_bars,
+                                               NPE_ratio, bins[2], bins[0], bins[1])
+            plt.close(fig)
+            histogram = Histogram(*bins).fill(NPE_ratio)
+            (fig, _), histogram_plot_time = timed(analysis.histogram_with_error_bars, histogram)
+            plt.close(fig)
+
+        print(f"  {n:>9} events, ~{num_hits:>9} hits, {len(s):>7} cut hits: "
+              f"make_cuts (1 file) {cut_time:6.2f} s | "
+              f"process_folder {folder_time:6.2f} s ({num_hits / folder_time / 1e6:5.2f} M hits/s) | "
+              f"make_plot_data {plot_data_time:6.3f} s | "
+              f"histogram_with_error_bars {values_plot_time:6.3f} s (values), "
+              f"{histogram_plot_time:6.3f} s (histogram)")
+
+
+if __name__ == '__main__':
+    compare_formats()
+    compare_streaming()
+    compare_cut_engines()
+    compare_event_sources()
+    compare_timing()
+    compare_topology_cuts()
+    compare_prefilters()
+    compare_PMT_NPE()
+    compare_hit_dtypes()
+    benchmark_pipeline()
@@ -0,0 +1,172 @@
+"""Cache of the cut results of each file, so that `cuts.process_folder` only
+has to cut the files that are new or have changed since the last run.
+
+Each entry is keyed by:
+ - the identity of the input file: its path, size and modification time (or,
+ optionally, a hash of its contents), and
+ - the cut configuration: the `cutflow.CutFlow` (names, functions and
+ parameters of the cuts), the seed of the random cuts, the source code of
+ the modules that do the cutting (so e.g. changing a cut in cutflow.py also
+ makes a new key), and the NPE calibration (calibration.json).
+If anything in the key changes, the old entry is simply not found any more,
+and `ResultCache.prune` (called at the end of `cuts.process_folder`) deletes
+it.
+
+Each entry is a Parquet file with the cut hits of one file (with `eventID`,
+not `uniqueEventID`), a Parquet file with its event summary (see summary.py),
+and a JSON file with the number of events before the cuts, the
+`cutflow.CutFlowCounts`, and the plot histograms (see
+`features.fill_plot_histograms`).
+
+Created 18 October 2026.
+"""
+import hashlib
+import inspect
+import json
+import os
+import uuid
+
+import pandas as pd
+
+from cutflow import counts_from_dict
+from histograms import histogram_from_dict
+
+
+def cut_config_hash(cut_flow, modules, seed=0, files=()):
+    """Return a hash of the cut configuration: `cut_flow`, the `seed` of the
+    random cuts, the source code of the `modules` that make the cuts, and the
+    contents of any other `files` that they use (e.g. calibration.json)."""
+    h = hashlib.sha256(f"{cut_flow!r}|seed={seed!r}".encode())
+    for module in modules:
+        h.update(inspect.getsource(module).encode())
+    for path in files:
+        with open(path, 'rb') as f:
+            h.update(f.read())
+    return h.hexdigest()
+
+
+def file_identity(path, content_hash=False):
+    """Return a `str` that changes whenever the file at `path` changes: its
+    path, size and modification time, or (if `content_hash`) a hash of its
+    contents (slow for big files, but survives copying and `touch`)."""
+    if content_hash:
+        h = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(2**24), b''):
+                h.update(block)
+        return f"sha256:{h.hexdigest()}"
+
+    stat = os.stat(path)
+    return f"{os.path.realpath(path)}:{stat.st_size}:{stat.st_mtime_ns}"
+
+
+class ResultCache:
+    """Cut results of individual files, saved in `folder`."""
+
+    def __init__(self, folder, config_hash, content_hash=False):
+        """
+        :param config_hash: From `cut_config_hash`.
+        :param content_hash: Identify files by a hash of their contents (see
+        `file_identity`).
+        """
+        self.folder = folder
+        self.config_hash = config_hash
+        self.content_hash = content_hash
+        os.makedirs(folder, exist_ok=True)
+
+        # Input paths that were found in the cache, and that were not.
+        self.reused = []
+        self.missed = []
+        # The entries (keys) that were looked up or saved (see `prune`).
+        self._used = set()
+
+    def _entry_path(self, path):
+        identity = file_identity(path, self.content_hash)
+        key = hashlib.sha256(f"{identity}|{self.config_hash}".encode()).hexdigest()
+        self._used.add(key)
+        return os.path.join(self.folder, key)
+
+    def get(self, path, hits=True):
+        """Return the cached result (like `cuts.process_file`) for the input
+        file at `path`, or `None` if there isn't one.
+
+        :param hits: Whether to read the cut hits (if not, they are `None`).
+        """
+        entry = self._entry_path(path)
+        if not all(os.path.exists(entry + ending)
+                   for ending in ('.json', '.parquet', '.summary.parquet')):
+            self.missed.append(path)
+            return None
+
+        with open(entry + '.json') as f:
+            saved = json.load(f)
+        cut_file = pd.read_parquet(entry + '.parquet') if hits else None
+        plot_histograms = {name: histogram_from_dict(h) for name, h in saved['histograms'].items()}
+        event_summary = pd.read_parquet(entry + '.summary.parquet')
+
+        self.reused.append(path)
+        return (cut_file, saved['num_events_before_cuts'], counts_from_dict(saved['counts']),
+                plot_histograms, event_summary)
+
+    def put(self, path, result):
+        """Save the `result` of `cuts.process_file` for the input file at
+        `path`.
+
+        The JSON file is written last (and renamed into place), so an entry is
+        only ever found if it is complete. Each writer has its own temporary
+        files, so two workers can save the same file's result at once (e.g.
+        both copies of a file in distributed.py): the result is the same, so
+        it doesn't matter which one is renamed into place last."""
+        entry = self._entry_path(path)
+        cut_file, num_events_before_cuts, counts, plot_histograms, event_summary = result
+        temp = f'.{os.getpid()}-{uuid.uuid4().hex}.tmp'
+
+        cut_file.to_parquet(entry + '.parquet' + temp)
+        os.replace(entry + '.parquet' + temp, entry + '.parquet')
+        event_summary.to_parquet(entry + '.summary.parquet' + temp)
+        os.replace(entry + '.summary.parquet' + temp, entry + '.summary.parquet')
+        with open(entry + '.json' + temp, 'w') as f:
+            json.dump({
+                'input': path,
+                'num_events_before_cuts': int(num_events_before_cuts),
+                'counts': counts.to_dict(),
+                'histograms': {name: h.to_dict() for name, h in plot_histograms.items()},
+            }, f)
+        os.replace(entry + '.json' + temp, entry + '.json')
+
+    def prune(self):
+        """Delete every entry that wasn't looked up or saved (`get` or `put`)
+        since this cache was made: the entries of other cut configurations
+        (see `cut_config_hash`), and of input files that have changed or
+        gone. So it should only be called once every input file has been
+        looked up. (Temporary files are left alone: another writer might
+        still be using them.)
+
+        :return: The number of entries deleted.
+        """
+        stale = {}
+        for name in os.listdir(self.folder):
+            for ending in ('.summary.parquet', '.parquet', '.json'):
+                if name.endswith(ending):
+                    key = name[:-len(ending)]
+                    if key not in self._used:
+                        stale.setdefault(key, []).append(name)
+                    break
+
+        num_bytes = 0
+        for names in stale.values():
+            for name in names:
+                path = os.path.join(self.folder, name)
+                num_bytes += os.path.getsize(path)
+                os.remove(path)
+        if stale:
+            print(f"Cache ({self.folder}): deleted {len(stale)} stale entries "
+                  f"({num_bytes / 1e6:.1f} MB).")
+        return len(stale)
+
+    def report(self):
+        """Print which inputs were reused from the cache, and which were not."""
+        print(f"Cache ({self.folder}): reused {len(self.reused)} file(s), "
+              f"processing {len(self.missed)} new or changed file(s).")
+        for path in self.missed:
+            print(f"  Not cached: {path}")
@@ -0,0 +1,255 @@
+"""The energy deposit to NPE calibration (MeV per photoelectron): fit from the
+total energy deposit and the number of PMT hits (photoelectrons) in each slab,
+over any number of files, and saved with every earlier version in
+calibration.json.
+
+The cuts and the plots (cuts.py, cutflow.py, features.py, summary.py, and the
+step-2 scripts, through step-2/calibration.py, which only reads
+calibration.json) use `MEV_PER_PE` from the current version, instead of the
+1.24e-3 MeV per PE from one file in starter_project.py (which is version 1).
+The cut cache (cache.py) and the analysis cache (memo.py) are keyed by
+calibration.json too, so publishing a new version makes new results. (Already
+running scripts keep the version that they started with.)
+
+The fit is the same as in `starter_project.analyze` (a line of best fit of
+energy deposit vs. NPE, with `scipy.stats.linregress`), but with a point for
+each slab in each file, and it never keeps the points:
+ - the energy deposits and PMT hits of each slab are added up a batch of
+ events at a time (`np.bincount`, see `SlabTotals`), and
+ - each file's points are added to the sums that the fit needs (the number of
+ points, their means, and their (co)variances: see `LinearFit`),
+so it takes the same memory for one file as for thousands.
+
+Example:
+    sources = [RootEventSource(path) for path in paths]
+    fit = fit_calibration(sources)
+    publish_calibration(fit, source='withPhotons/48slab/cosmicdir*')
+
+Created 18 October 2026.
+"""
+from datetime import datetime
+import glob
+import json
+import multiprocessing
+import os
+
+import numpy as np
+
+from events import RootEventSource
+from geometry import LAYOUT
+from instrument import stage
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+CALIBRATION_PATH = os.path.join(HERE, 'calibration.json')
+
+
+class LinearFit:
+    """A line of best fit (least squares, like `scipy.stats.linregress`) from
+    the sufficient statistics of the points (their number, means, and sums of
+    squared deviations), which can be added to a batch of points at a time,
+    or added together."""
+
+    def __init__(self):
+        self.n = 0
+        self.mean_x = 0.
+        self.mean_y = 0.
+        # Sums of (x - mean_x)**2, (y - mean_y)**2 and (x - mean_x)*(y - mean_y).
+        self.Sxx = 0.
+        self.Syy = 0.
+        self.Sxy = 0.
+
+    def add(self, x, y):
+        """Add the points (`x`, `y`) (arrays)."""
+        x = np.asarray(x, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        batch = LinearFit()
+        batch.n = len(x)
+        if batch.n:
+            batch.mean_x = x.mean()
+            batch.mean_y = y.mean()
+            batch.Sxx = ((x - batch.mean_x)**2).sum()
+            batch.Syy = ((y - batch.mean_y)**2).sum()
+            batch.Sxy = ((x - batch.mean_x) * (y - batch.mean_y)).sum()
+        self += batch
+        return self
+
+    def __iadd__(self, other):
+        # (Combined like in Chan et al.'s parallel variance, which doesn't lose
+        # precision like adding up x**2 would.)
+        n = self.n + other.n
+        if not other.n:
+            return self
+        dx = other.mean_x - self.mean_x
+        dy = other.mean_y - self.mean_y
+        weight = self.n * other.n / n
+
+        self.Sxx += other.Sxx + dx*dx*weight
+        self.Syy += other.Syy + dy*dy*weight
+        self.Sxy += other.Sxy + dx*dy*weight
+        self.mean_x += dx * other.n / n
+        self.mean_y += dy * other.n / n
+        self.n = n
+        return self
+
+    def result(self):
+        """Return the `slope`, `intercept`, their standard errors
+        (`slope_stderr` and `intercept_stderr`), and the correlation
+        coefficient `r`, like `scipy.stats.linregress`."""
+        if self.n < 3:
+            raise ValueError(f"Sorry, but at least 3 points are needed for the fit (not {self.n}).")
+
+        slope = self.Sxy / self.Sxx
+        r = self.Sxy / np.sqrt(self.Sxx * self.Syy)
+        slope_stderr = np.sqrt(max(1 - r*r, 0) * self.Syy / self.Sxx / (self.n - 2))
+        return {
+            'slope': slope,
+            'intercept': self.mean_y - slope*self.mean_x,
+            'slope_stderr': slope_stderr,
+            'intercept_stderr': slope_stderr * np.sqrt(self.Sxx/self.n + self.mean_x**2),
+            'r': r,
+            'num_points': self.n,
+        }
+
+
+class SlabTotals:
+    """The total energy deposit and number of PMT hits of each slab, added up
+    a batch of hits at a time."""
+
+    def __init__(self):
+        self.EDep_MeV = np.zeros(LAYOUT.num_slabs)
+        self.NPE = np.zeros(LAYOUT.num_slabs, dtype=np.int64)
+
+    def add(self, scint_hits, PMT_hits):
+        """Add a batch (`DataFrame`s of ScintRHits and PMTHits, like from
+        `events.RootEventSource.iter_batches`)."""
+        self.EDep_MeV += np.bincount(LAYOUT.slab[scint_hits.copyNo.to_numpy()],
+                                     weights=scint_hits.EDep_MeV.to_numpy(),
+                                     minlength=LAYOUT.num_slabs)
+        # Each slab has two PMTs: PMT_number 2*slab and 2*slab + 1. (Both of
+        # them, whether or not either one has no hits.)
+        self.NPE += np.bincount(PMT_hits.PMT_number.to_numpy() // 2,
+                                minlength=LAYOUT.num_slabs)
+        return self
+
+    def points(self):
+        """Return the (NPE, energy deposit) of the slabs with any hits."""
+        hit = (self.NPE > 0) | (self.EDep_MeV != 0)
+        return self.NPE[hit], self.EDep_MeV[hit]
+
+
+def source_slab_totals(source):
+    """Return the `SlabTotals` of all of the events of `source` (e.g. an
+    `events.RootEventSource` with both kinds of hits).
+    This function is given to `multiprocessing`."""
+    totals = SlabTotals()
+    with stage('calibrate', file=getattr(source, 'path', None)) as this_stage:
+        num_hits = 0
+        for batch in source.iter_batches():
+            totals.add(batch['ScintRHits'], batch['PMTHits'])
+            num_hits += len(batch['ScintRHits'])
+        this_stage.rows_in = num_hits
+    return totals
+
+
+def fit_calibration(sources, processes=None):
+    """Fit the calibration (energy deposit = slope * NPE + intercept, so the
+    slope is in MeV per PE) from the slabs of every file in `sources` (each
+    file's slabs are separate points), reading the files in a pool of
+    `processes` processes (by default, one per available core).
+
+    :return: `LinearFit`.
+    """
+    if processes is None:
+        processes = len(os.sched_getaffinity(0))
+
+    fit = LinearFit()
+    num_files = 0
+    with multiprocessing.Pool(processes) as pool:
+        for totals in pool.imap_unordered(source_slab_totals, sources):
+            fit.add(*totals.points())
+            num_files += 1
+    print(f"Fit the calibration from {fit.n} slabs in {num_files} file(s).")
+    fit.num_files = num_files
+    return fit
+
+
+def load_calibrations(path=CALIBRATION_PATH):
+    """Return every version of the calibration saved in `path` (`dict` with
+    the `current` version number and the `list` of `versions`)."""
+    with open(path) as f:
+        return json.load(f)
+
+
+def load_calibration(path=CALIBRATION_PATH, version=None):
+    """Return the calibration (`dict` with `version`, `MeV_per_PE`, ...)
+    saved in `path`: the current version, or `version`."""
+    calibrations = load_calibrations(path)
+    if version is None:
+        version = calibrations['current']
+    for calibration in calibrations['versions']:
+        if calibration['version'] == version:
+            return calibration
+    raise ValueError(f"Sorry, but there is no calibration version {version} in {path}.")
+
+
+def publish_calibration(fit, path=CALIBRATION_PATH, **info):
+    """Save the `fit` (`LinearFit`) in `path` as a new version of the
+    calibration, and make it the current version.
+
+    :param info: Anything else to save with it (e.g. `source`, the files
+    that it's from).
+    :return: The new version number.
+    """
+    calibrations = load_calibrations(path)
+    result = fit.result()
+    version = max(calibration['version'] for calibration in calibrations['versions']) + 1
+    calibrations['versions'].append({
+        'version': version,
+        'MeV_per_PE': result['slope'],
+        'MeV_per_PE_stderr': result['slope_stderr'],
+        'intercept_MeV': result['intercept'],
+        'intercept_MeV_stderr': result['intercept_stderr'],
+        'r': result['r'],
+        'num_points': result['num_points'],
+        'num_files': getattr(fit, 'num_files', None),
+        'created': str(datetime.now()),
+        **info,
+    })
+    calibrations['current'] = version
+    _write_calibrations(calibrations, path)
+    print(f"Published calibration version {version}: {result['slope']:.6g} MeV per PE.")
+    return version
+
+
+def set_current_calibration(version, path=CALIBRATION_PATH):
+    """Make `version` the current calibration (e.g. to go back to an earlier
+    one)."""
+    calibrations = load_calibrations(path)
+    load_calibration(path, version)
+    calibrations['current'] = version
+    _write_calibrations(calibrations, path)
+
+
+def _write_calibrations(calibrations, path):
+    with open(path + '.tmp', 'w') as f:
+        json.dump(calibrations, f, indent=2)
+        f.write('\n')
+    os.replace(path + '.tmp', path)
+
+
+# Energy deposit per photoelectron (MeV) of the current calibration.
+MEV_PER_PE = load_calibration()['MeV_per_PE']
+
+
+if __name__ == '__main__':
+    print(f"Starting at: {datetime.now()}")
+
+    # The withPhotons samples have the PMT hits.
+    root_folder = '/net/cms17/cms17r0/schmitz/slabSimMuon/withPhotons/48slab/'
+    paths = sorted(glob.glob(os.path.join(root_folder, 'cosmicdir*', 'MilliQan.root')))
+
+    fit = fit_calibration(RootEventSource(path) for path in paths)
+    print(fit.result())
+    publish_calibration(fit, source=os.path.join(root_folder, 'cosmicdir*'))
+
+    print(f"Ending at: {datetime.now()}")
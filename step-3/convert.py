@@ -0,0 +1,171 @@
+"""Convert MilliQan.root files straight to ScintRHits.parquet files.
+
+This replaces the rootaway step (step-2/use_rootaway.py) for the cuts. Instead
+of writing every column of every hit to a text CSV file (and then parsing all
+of that text again in cuts.py), the hits are read from the ROOT file in large
+batches of events (see `events.RootEventSource`) and written once to a compressed Parquet file, with only the
+columns and dtypes in `hits.COLUMNS`.
+
+The output folder layout is the same as for rootaway:
+`output_folder`/cosmicdir<i>/ScintRHits.parquet, so cuts.py can read either.
+With `PMT_NPE=True` (for the withPhotons samples), the measured NPE of each
+slab hit is saved next to it in PMTNPE.parquet (see pmt.py).
+
+Caution:
+Any existing ScintRHits.parquet files are skipped and not modified. (Files are
+only ever renamed into place once they are complete, so it is safe to stop
+this script and start it up again.)
+
+See `benchmarks.compare_formats` for the CSV vs. Parquet comparison. The time
+and memory of each file are saved in conversion_report.jsonl in
+`output_folder` (see instrument.py).
+
+Created 18 October 2026.
+"""
+from contextlib import ExitStack
+from datetime import datetime
+import os
+import multiprocessing
+
+import pandas as pd
+
+from events import RootEventSource
+from hits import COLUMNS, CHUNKSIZE, write_hit_batches
+from instrument import stage, timed_iter, set_report, finish_report
+import pmt
+
+input_folder = '/net/cms17/cms17r0/schmitz/slabSimMuon/noPhotons/48slab/'
+output_folder = '/net/cms26/cms26r0/anson/noPhotons/'
+
+
+def convert_file(subfolder, input_folder=input_folder, output_folder=output_folder,
+                 PMT_NPE=False):
+    """Convert `input_folder`/`subfolder`/MilliQan.root to
+    `output_folder`/`subfolder`/ScintRHits.parquet.
+
+    This function is given to `multiprocessing`.
+
+    :param PMT_NPE: Also save the measured NPE of each slab hit (from the PMT
+    hits of a withPhotons sample) in `output_folder`/`subfolder`/PMTNPE.parquet
+    (see pmt.py), in the same pass over the ROOT file. (Fewer events are read
+    at a time then: see `pmt.EVENTS_PER_BATCH`.)
+    :return: The path of the ScintRHits.parquet file.
+    """
+    this_input_file = os.path.join(input_folder, subfolder, 'MilliQan.root')
+    this_output_folder = os.path.join(output_folder, subfolder)
+    this_output_file = os.path.join(this_output_folder, 'ScintRHits.parquet')
+    NPE_output_file = os.path.join(this_output_folder, pmt.FILENAME)
+
+    # (Only the files that don't exist yet are written.)
+    kinds = ()
+    if not os.path.exists(this_output_file):
+        kinds += ('ScintRHits',)
+    if PMT_NPE and not os.path.exists(NPE_output_file):
+        kinds += ('PMTHits',)
+    if not kinds:
+        print(f"Skipping existing file {this_output_file}")
+        return this_output_file
+
+    print(f"Converting {this_input_file} to {this_output_file}"
+          + (f" and {NPE_output_file}" if 'PMTHits' in kinds else ""))
+    os.makedirs(this_output_folder, exist_ok=True)
+
+    # (Timed, with the time to read each batch from the ROOT file: see
+    # instrument.py.)
+    with stage('convert', file=this_input_file) as this_stage, ExitStack() as stack:
+        if 'PMTHits' in kinds:
+            source = RootEventSource(this_input_file, kinds=kinds,
+                                     events_per_batch=pmt.EVENTS_PER_BATCH)
+            NPE_writer = stack.enter_context(pmt.SlabNPEWriter(NPE_output_file))
+        else:
+            source = RootEventSource(this_input_file, kinds=kinds)
+        batches = timed_iter('read_root', source.iter_batches(),
+                             count=lambda batch: sum(map(len, batch.values())))
+        num_hits = 0
+
+        def scint_hits(batches):
+            nonlocal num_hits
+            for batch in batches:
+                if 'PMTHits' in batch:
+                    with stage('PMT_NPE') as NPE_stage:
+                        NPE_stage.rows_in = len(batch['PMTHits'])
+                        slab_NPE = pmt.slab_NPE(batch['PMTHits'])
+                        NPE_writer.write(slab_NPE)
+                        NPE_stage.rows_out = len(slab_NPE)
+                if 'ScintRHits' in batch:
+                    num_hits += len(batch['ScintRHits'])
+                    yield batch['ScintRHits']
+
+        if 'ScintRHits' in kinds:
+            write_hit_batches(scint_hits(batches), this_output_file)
+        else:
+            for _ in scint_hits(batches):
+                pass
+        this_stage.rows_out = num_hits
+
+    return this_output_file
+
+
+def convert_csv_file(subfolder, input_folder=input_folder, output_folder=output_folder):
+    """Like `convert_file`, but for a ScintRHits.csv file that rootaway has
+    already made (`input_folder`/`subfolder`/ScintRHits.csv), read
+    `hits.CHUNKSIZE` hits at a time.
+
+    This function is given to `multiprocessing`.
+
+    :return: The path of the ScintRHits.parquet file.
+    """
+    this_input_file = os.path.join(input_folder, subfolder, 'ScintRHits.csv')
+    this_output_folder = os.path.join(output_folder, subfolder)
+    this_output_file = os.path.join(this_output_folder, 'ScintRHits.parquet')
+
+    if os.path.exists(this_output_file):
+        print(f"Skipping existing file {this_output_file}")
+        return this_output_file
+
+    print(f"Converting {this_input_file} to {this_output_file}")
+    os.makedirs(this_output_folder, exist_ok=True)
+
+    with stage('convert', file=this_input_file) as this_stage:
+        batches = timed_iter('read_csv', pd.read_csv(this_input_file, usecols=list(COLUMNS),
+                                                       dtype=COLUMNS, chunksize=CHUNKSIZE))
+        num_hits = 0
+
+        def count(batches):
+            nonlocal num_hits
+            for batch in batches:
+                num_hits += len(batch)
+                yield batch
+
+        write_hit_batches(count(batches), this_output_file)
+        this_stage.rows_out = num_hits
+
+    return this_output_file
+
+
+if __name__ == '__main__':
+    if not os.path.exists(output_folder):
+        raise ValueError(f"Sorry, but this script requires the output folder to exist. The output folder given was: {output_folder}")
+
+    print(f"Starting at: {datetime.now()}")
+
+    # Biggest files first, so that the run doesn't end with one big file
+    # converting on its own (like step-2/use_rootaway.py).
+    subfolders = sorted(next(os.walk(input_folder))[1],
+                        key=lambda subfolder: os.path.getsize(
+                            os.path.join(input_folder, subfolder, 'MilliQan.root')),
+                        reverse=True)
+    num_available_cores = len(os.sched_getaffinity(0))
+
+    report_path = os.path.join(output_folder, 'conversion_report.jsonl')
+    if os.path.exists(report_path):
+        os.remove(report_path)
+
+    with multiprocessing.Pool(num_available_cores, initializer=set_report,
+                              initargs=(report_path,)) as pool:
+        pool.map(convert_file, subfolders, chunksize=1)
+
+    if os.path.exists(report_path):
+        finish_report(report_path, file_stage='convert')
+
+    print(f"Ending at: {datetime.now()}")
@@ -0,0 +1,709 @@
+"""Cuts as named, reusable pieces, and cut flow tables (how many events and
+hits are left after each cut).
+
+A `CutFlow` is made of `HitCut`s (keep or drop individual slab hits) followed
+by `EventCut`s (keep or drop whole events). All of the event cuts are
+evaluated for every event in one go, and the number of events (and hits) that
+pass each combination of event cuts is kept in a `CutFlowCounts`. So the cut
+flow table for any order of the event cuts (or for any of the `extra_cuts`,
+which are counted but not applied, like the module, NPE ratio and timing cuts
+from analysis.py) can be made from the counts, without cutting the files
+again. Counts from different files can be added together.
+
+When only the cut hits are needed (no counts), `CutFlow.prefilter` drops the
+events that can't pass from the raw hits first, and `CutFlow.select` makes
+each event cut only on the events left by the ones before it, in the order
+learned from an earlier run's report (`order_by_selectivity`). The cut hits
+are the same (see `cuts.make_cuts`). (The prefilter can be counted too, as
+the `PREFILTER_STAGE`, but then the counts after it are only for the events
+that are left: see `cuts.make_cuts_and_count`.)
+
+Example:
+    cut_hits, counts = SIGNAL_LIKE.apply(hits)
+    print(counts.table())
+    print(counts.table(order=['Only one module', 'NPE < 50 for all hits']))
+
+Created 18 October 2026.
+"""
+import json
+
+import numpy as np
+import pandas as pd
+
+from calibration import MEV_PER_PE
+from geometry import LAYOUT
+from hit_random import HitRandom, REPLICA_SHIFT
+from instrument import stage
+from segments import (is_sorted, segment_starts, segment_reduce, segment_sizes,
+                      segment_nunique, segment_argmax, segment_argmin,
+                      expand_segments, count_bits)
+
+# Measured distance of the length of the detector (from Ryan): 3.4 meters, or
+# 11.3 light-nanoseconds, over 3 gaps between layers.
+NS_PER_LAYER = 11.3 / 3
+
+
+class Events:
+    """Slab hits (one row per slab per event, in order of `eventID`), with
+    per-hit variables and per-event reductions for the cuts to use."""
+
+    # Variables that can be made from the columns of the hits. (The layer and
+    # module numbers are looked up in `geometry.LAYOUT`, as `int8`, like in
+    # `hits.CUT_COLUMNS`. The NPE is `float64` here, since the cuts are made
+    # on it.)
+    DERIVED = {
+        'equivalentNPE': lambda hits: hits.EDep_MeV.to_numpy() / MEV_PER_PE,
+        'layerNo': lambda hits: LAYOUT.layer[hits.copyNo.to_numpy()],
+        'moduleNo': lambda hits: LAYOUT.module[hits.copyNo.to_numpy()],
+        # Hit times relative to a particle at light speed coming from the IP.
+        'relativeHitTime_ns': lambda hits: (hits.hitTime_ns.to_numpy()
+                                            - LAYOUT.layer[hits.copyNo.to_numpy()] * NS_PER_LAYER),
+    }
+
+    def __init__(self, hits, random_state=None):
+        """
+        :param hits: `DataFrame` with one row per slab per event (e.g. from
+        `cuts.aggregate_slab_hits`), in order of `eventID`.
+        :param random_state: `hit_random.HitRandom` (or, for the old
+        behavior, `numpy.random.RandomState`) for random cuts.
+        """
+        self.hits = hits
+        self.random_state = random_state
+        self.starts = segment_starts(hits.eventID.to_numpy())
+        self._columns = {}
+        self._hit_pattern = None
+
+    def __len__(self):
+        """Number of events."""
+        return len(self.starts)
+
+    def __getitem__(self, name):
+        """Per-hit values of the column or derived variable `name`."""
+        if name not in self._columns:
+            if name in self.hits:
+                self._columns[name] = self.hits[name].to_numpy()
+            else:
+                self._columns[name] = self.DERIVED[name](self.hits)
+        return self._columns[name]
+
+    def num_hits(self):
+        """Number of (slab) hits in each event."""
+        return segment_sizes(self.starts, len(self.hits))
+
+    def max(self, name):
+        return segment_reduce(np.maximum, self[name], self.starts)
+
+    def min(self, name):
+        return segment_reduce(np.minimum, self[name], self.starts)
+
+    def nunique(self, name):
+        return segment_nunique(self[name], self.starts)
+
+    def hit_pattern(self):
+        """The slabs hit in each event, as a bitmask (see
+        `geometry.Layout.hit_pattern`)."""
+        if self._hit_pattern is None:
+            self._hit_pattern = LAYOUT.hit_pattern(self['copyNo'], self.starts)
+        return self._hit_pattern
+
+    def delta_t_max(self):
+        """Time between the latest and earliest hits (relative hit times),
+        positive if the latest hit is in a higher layer, as in the TDR. (NaN
+        for events without any hit times.)"""
+        t = self['relativeHitTime_ns']
+        layerNo = self['layerNo']
+        latest = segment_argmax(t, self.starts)
+        earliest = segment_argmin(t, self.starts)
+        delta_t_max = (t[latest] - t[earliest]) * np.sign(layerNo[latest] - layerNo[earliest])
+        # (-1 for the events without any hit times: see `segment_argmax`.)
+        delta_t_max[latest < 0] = np.nan
+        return delta_t_max
+
+    def select(self, hit_mask):
+        """Return `Events` with only the hits where `hit_mask` is `True`."""
+        return Events(self.hits[hit_mask], self.random_state)
+
+
+class Cut:
+    """A named cut: `function(events, **params)` returns `True` for the hits
+    (`HitCut`) or events (`EventCut`) to keep.
+
+    `function` should be a module-level function (not a `lambda`), so that
+    cuts can be given to `multiprocessing`."""
+
+    def __init__(self, name, function, **params):
+        self.name = name
+        self.function = function
+        self.params = params
+
+    def __call__(self, events):
+        return np.asarray(self.function(events, **self.params), dtype=bool)
+
+    def __repr__(self):
+        params = ', '.join(f'{key}={value!r}' for key, value in self.params.items())
+        return f"{type(self).__name__}({self.name!r}, {self.function.__name__}, {params})"
+
+
+class HitCut(Cut):
+    pass
+
+
+class EventCut(Cut):
+    pass
+
+
+class CutFlow:
+    """A sequence of cuts: `HitCut`s first, then `EventCut`s."""
+
+    def __init__(self, cuts, extra_cuts=()):
+        """
+        :param cuts: `HitCut`s and then `EventCut`s, to apply in order.
+        :param extra_cuts: `EventCut`s to count (see `CutFlowCounts`), but not
+        apply.
+        """
+        self.hit_cuts = [cut for cut in cuts if isinstance(cut, HitCut)]
+        self.event_cuts = [cut for cut in cuts if isinstance(cut, EventCut)]
+        self.extra_cuts = list(extra_cuts)
+
+        if list(cuts) != self.hit_cuts + self.event_cuts:
+            raise ValueError("All `HitCut`s have to come before all `EventCut`s.")
+        if not all(isinstance(cut, EventCut) for cut in self.extra_cuts):
+            raise ValueError("Extra cuts have to be `EventCut`s.")
+
+        names = [cut.name for cut in self.hit_cuts + self.event_cuts + self.extra_cuts]
+        if len(set(names)) != len(names):
+            raise ValueError(f"Cut names have to be different: {names}")
+
+        # The orders to make the event cuts and their prefilters in (see
+        # `ordered`).
+        self.order = None
+        self.prefilter_order = None
+
+    def ordered(self, order=None, prefilter_order=None):
+        """Return a copy of these cuts that makes the event cuts (in `select`)
+        and their prefilters in these orders (names, e.g. from
+        `order_by_selectivity`). The results are the same in any order, so
+        the order isn't part of the `repr` (or of the cache key: see
+        `cache.cut_config_hash`)."""
+        copy = CutFlow(self.hit_cuts + self.event_cuts, self.extra_cuts)
+        copy.order = order
+        copy.prefilter_order = prefilter_order
+        return copy
+
+    def __repr__(self):
+        return (f"CutFlow({self.hit_cuts + self.event_cuts!r}, "
+                f"extra_cuts={self.extra_cuts!r})")
+
+    def columns(self):
+        """Return the set of columns (the `column` params) that the cuts (and
+        the extra cuts) use."""
+        return {cut.params['column']
+                for cut in self.hit_cuts + self.event_cuts + self.extra_cuts
+                if 'column' in cut.params}
+
+    def prefilters(self):
+        """Return the raw-hit prefilters (see `PREFILTERS`) of the applied
+        event cuts, as `EventCut`s (with the names of their cuts), for the
+        cuts where they are safe with these hit cuts."""
+        # The NPE prefilter assumes that a slab with an NPE of at least 1 is
+        # never cut by the hit cuts, which is true of the random NPE
+        # threshold (on the energy-based NPE).
+        keeps_slabs_above_1_NPE = all(
+            cut.function is NPE_above_random_threshold
+            and cut.params.get('column', 'equivalentNPE') == 'equivalentNPE'
+            for cut in self.hit_cuts)
+
+        prefilters = []
+        for cut in self.event_cuts:
+            if cut.function not in PREFILTERS:
+                continue
+            if cut.function is max_below:
+                if cut.params['column'] == 'equivalentNPE':
+                    limit_NPE = cut.params['limit']
+                elif cut.params['column'] == 'EDep_MeV':
+                    limit_NPE = cut.params['limit'] / MEV_PER_PE
+                else:
+                    continue
+                if not (keeps_slabs_above_1_NPE and limit_NPE >= 1):
+                    continue
+            prefilters.append(EventCut(cut.name, PREFILTERS[cut.function], **cut.params))
+        return prefilters
+
+    def prefilter(self, hits, order=None):
+        """Return the raw (not aggregated) `hits` of the events that might
+        pass the applied event cuts (see `prefilters`): the events that are
+        dropped can't pass them, whatever the hit cuts do, so the cut hits
+        are the same either way (with a `hit_random.HitRandom`). Also return
+        the number of events and of slab hits (as in `CutFlowCounts.stages`)
+        before the prefilters, or `None` if none were made.
+
+        :param hits: Raw hits, with the hits of each event next to each other
+        in order of `eventID` (if not, they are all returned).
+        :param order: Names of the cuts, in the order to apply their
+        prefilters (by default, `self.prefilter_order`: see `ordered`).
+        """
+        prefilters = self.prefilters()
+        eventID = hits.eventID.to_numpy()
+        if not prefilters or not is_sorted(eventID):
+            return hits, None
+
+        events = Events(hits)
+        before = (len(events), int(num_slabs(events).sum()))
+        for cut in sort_cuts(prefilters, self.prefilter_order if order is None else order):
+            with stage('prefilter_cut', cut=cut.name, unit='events') as this_stage:
+                this_stage.rows_in = len(events)
+                might_pass = cut(events)
+                events = events.select(expand_segments(might_pass, events.starts,
+                                                       len(events.hits)))
+                this_stage.rows_out = len(events)
+        return events.hits, before
+
+    def select(self, hits, random_state=None, order=None):
+        """Apply the cuts to `hits`, like `apply`, but only return the hits
+        that pass (no counts, so the extra cuts aren't evaluated at all).
+
+        Each applied event cut is only evaluated on the events that passed
+        the ones before it, in `order`. The cuts are all per event, so the
+        result is the same in any order, but it's fastest with the cuts that
+        drop the most events for the least time first (see
+        `order_by_selectivity`).
+
+        :param order: Names of the event cuts, in the order to apply them
+        (the others come after them, in the order of the cut flow). By
+        default, `self.order` (see `ordered`).
+        """
+        if order is None:
+            order = self.order
+        events = Events(hits, random_state)
+        for cut in self.hit_cuts:
+            with stage('cut', cut=cut.name, unit='hits') as this_stage:
+                this_stage.rows_in = len(events.hits)
+                events = events.select(cut(events))
+                this_stage.rows_out = len(events.hits)
+
+        for cut in sort_cuts(self.event_cuts, order):
+            with stage('cut', cut=cut.name, unit='events') as this_stage:
+                this_stage.rows_in = len(events)
+                passed = cut(events)
+                events = events.select(expand_segments(passed, events.starts, len(events.hits)))
+                this_stage.rows_out = len(events)
+        return events.hits
+
+    def apply(self, hits, random_state=None, passed=False):
+        """Apply the cuts to `hits`.
+
+        :param hits: `DataFrame` with one row per slab per event, in order of
+        `eventID` (see `Events`).
+        :param passed: Also return the hits of every event after the hit cuts
+        (all of the events that the event cuts were made on), and which of
+        the event cuts each of those events passed (bit i is set if it
+        passed `(event_cuts + extra_cuts)[i]`, like in `CutFlowCounts`).
+        :return: The hits that pass all of the cuts, and a `CutFlowCounts`.
+        """
+        cut_hits, counts, events, pattern = self._apply(Events(hits, random_state),
+                                                        num_replicas=1)
+        if passed:
+            return cut_hits, counts[0], events.hits, pattern
+        return cut_hits, counts[0]
+
+    def apply_ensemble(self, hits, seeds, file_key=0):
+        """Apply the cuts to `hits` once for each of the `seeds` of the random
+        cuts (see `hit_random.HitRandom`), all in one go.
+
+        The hits are repeated for each seed, with the index of the seed in the
+        upper bits of the `eventID` (see `hit_random.REPLICA_SHIFT`), so the
+        memory used grows with the number of seeds.
+
+        :return: The hits that pass all of the cuts for each seed (`list` of
+        `DataFrame`s) and the `CutFlowCounts` for each seed (`list`). The
+        result for each seed is the same as from `apply` with
+        `HitRandom(seed, file_key)`.
+        """
+        num_replicas = len(seeds)
+        eventID = hits.eventID.to_numpy().astype(np.int64)
+        replica = np.repeat(np.arange(num_replicas, dtype=np.int64), len(hits))
+
+        replicas = hits.iloc[np.tile(np.arange(len(hits)), num_replicas)].reset_index(drop=True)
+        replicas['eventID'] = (replica << REPLICA_SHIFT) | np.tile(eventID, num_replicas)
+
+        cut_hits, counts, _, _ = self._apply(Events(replicas, HitRandom(list(seeds), file_key)),
+                                             num_replicas)
+
+        # Split the cut hits up by seed (they are in order of seed already).
+        cut_replica = cut_hits.eventID.to_numpy() >> REPLICA_SHIFT
+        bounds = np.searchsorted(cut_replica, np.arange(num_replicas + 1))
+        split = []
+        for i in range(num_replicas):
+            piece = cut_hits.iloc[bounds[i]:bounds[i + 1]].copy()
+            piece['eventID'] = (piece.eventID.to_numpy() & (2**REPLICA_SHIFT - 1)).astype(
+                hits.eventID.dtype)
+            split.append(piece)
+
+        return split, counts
+
+    def _apply(self, events, num_replicas):
+        """Apply the cuts to `events`, and count separately for each replica
+        (see `apply_ensemble`). Also return the events after the hit cuts, and
+        the pattern of event cuts that each one passed (see `apply`)."""
+        def replica_of(eventID):
+            if num_replicas == 1:
+                return np.zeros(len(eventID), dtype=np.int64)
+            return eventID.astype(np.int64) >> REPLICA_SHIFT
+
+        counts = [CutFlowCounts(
+            [cut.name for cut in self.hit_cuts],
+            [cut.name for cut in self.event_cuts + self.extra_cuts],
+            [cut.name for cut in self.event_cuts]) for _ in range(num_replicas)]
+
+        def count_stage(stage):
+            event_replica = replica_of(events['eventID'][events.starts])
+            num_events = np.bincount(event_replica, minlength=num_replicas)
+            num_hits = np.bincount(replica_of(events['eventID']), minlength=num_replicas)
+            for i in range(num_replicas):
+                counts[i].stages[stage] = (int(num_events[i]), int(num_hits[i]))
+
+        count_stage('All events')
+
+        # Hit cuts. (Each cut is timed: see instrument.py.)
+        for cut in self.hit_cuts:
+            with stage('cut', cut=cut.name, unit='hits') as this_stage:
+                this_stage.rows_in = len(events.hits)
+                events = events.select(cut(events))
+                this_stage.rows_out = len(events.hits)
+            count_stage(cut.name)
+
+        # Event cuts: which of the cuts each event passes, as the bits of one
+        # integer.
+        pattern = np.zeros(len(events), dtype=np.int64)
+        for bit, cut in enumerate(self.event_cuts + self.extra_cuts):
+            with stage('cut', cut=cut.name, unit='events') as this_stage:
+                passed = cut(events)
+                this_stage.rows_in = len(events)
+                this_stage.rows_out = int(passed.sum())
+            pattern |= passed.astype(np.int64) << bit
+
+        num_patterns = 2**len(self.event_cuts + self.extra_cuts)
+        key = replica_of(events['eventID'][events.starts]) * num_patterns + pattern
+        num_events = np.bincount(key, minlength=num_replicas * num_patterns)
+        num_hits = np.bincount(key, weights=events.num_hits(),
+                               minlength=num_replicas * num_patterns).astype(np.int64)
+        for i in range(num_replicas):
+            counts[i].events = num_events[i * num_patterns:(i + 1) * num_patterns]
+            counts[i].hits = num_hits[i * num_patterns:(i + 1) * num_patterns]
+
+        applied = 2**len(self.event_cuts) - 1
+        good_events = (pattern & applied) == applied
+        cut_hits = events.hits[expand_segments(good_events, events.starts, len(events.hits))]
+
+        return cut_hits, counts, events, pattern
+
+
+class CutFlowCounts:
+    """The number of events and hits after each hit cut, and the number of
+    events and hits that pass each combination of event cuts.
+
+    Counts from different files can be added with `+` (or `sum`).
+    """
+
+    def __init__(self, hit_cuts, event_cuts, applied_cuts):
+        """
+        :param hit_cuts: Names of the hit cuts, in order.
+        :param event_cuts: Names of all of the event cuts (applied and extra).
+        :param applied_cuts: Names of the event cuts that were applied, in
+        order.
+        """
+        self.hit_cuts = list(hit_cuts)
+        self.event_cuts = list(event_cuts)
+        self.applied_cuts = list(applied_cuts)
+
+        # `dict` of stage (before cuts and after each hit cut) to (number of
+        # events, number of hits).
+        self.stages = {}
+
+        # Number of events and hits for each pattern of passed event cuts
+        # (bit i is set if the event passes `event_cuts[i]`).
+        self.events = np.zeros(2**len(self.event_cuts), dtype=np.int64)
+        self.hits = np.zeros(2**len(self.event_cuts), dtype=np.int64)
+
+    def __add__(self, other):
+        if other == 0:
+            return self
+        if (self.hit_cuts, self.event_cuts) != (other.hit_cuts, other.event_cuts):
+            raise ValueError("Can only add counts for the same cuts.")
+
+        total = CutFlowCounts(self.hit_cuts, self.event_cuts, self.applied_cuts)
+        total.stages = {stage: tuple(np.add(self.stages[stage], other.stages[stage]))
+                        for stage in self.stages}
+        total.events = self.events + other.events
+        total.hits = self.hits + other.hits
+        return total
+
+    __radd__ = __add__
+
+    def add_prefilter_stage(self, before):
+        """Add the `PREFILTER_STAGE` (the events left by `CutFlow.prefilter`,
+        which are the events that the cuts were made on) after the
+        'All events' stage, which becomes `before` (the number of events and
+        slab hits before the prefilters).
+
+        (The events dropped by the prefilters can't pass the applied cuts, so
+        they are only missing from the counts of the combinations of event
+        cuts without all of the applied cuts.)"""
+        after = self.stages['All events']
+        stages = {'All events': after if before is None else tuple(before),
+                  PREFILTER_STAGE: after}
+        stages.update((name, value) for name, value in self.stages.items()
+                      if name != 'All events')
+        self.stages = stages
+
+    def passing(self, cuts):
+        """Return the number of events and hits that pass all of the event
+        `cuts` (names)."""
+        required = sum(2**self.event_cuts.index(name) for name in cuts)
+        passes = (np.arange(len(self.events)) & required) == required
+        return int(self.events[passes].sum()), int(self.hits[passes].sum())
+
+    def table(self, order=None):
+        """Return the cut flow table: the number of events and hits left
+        after each cut, and the fraction of events kept by each cut
+        (efficiency) and by all of the cuts so far (cumulative efficiency).
+
+        :param order: Names of the event cuts to use, in order. By default,
+        the event cuts that were applied.
+        """
+        if order is None:
+            order = self.applied_cuts
+
+        rows = dict(self.stages)
+        for i in range(len(order)):
+            rows[order[i]] = self.passing(order[:i + 1])
+
+        table = pd.DataFrame.from_dict(rows, orient='index', columns=['events', 'hits'])
+        table.index.name = 'cut'
+        table['efficiency'] = table.events / table.events.shift(1, fill_value=table.events.iloc[0])
+        table['cumulative efficiency'] = table.events / table.events.iloc[0]
+        return table
+
+    def to_dict(self):
+        """Return the counts as a `dict` of plain `list`s and numbers (e.g. for
+        JSON; see `counts_from_dict`)."""
+        return {
+            'hit_cuts': self.hit_cuts,
+            'event_cuts': self.event_cuts,
+            'applied_cuts': self.applied_cuts,
+            'stages': {stage: [int(n) for n in value] for stage, value in self.stages.items()},
+            'events': self.events.tolist(),
+            'hits': self.hits.tolist(),
+        }
+
+    def to_json(self, path):
+        """Save the counts to a JSON file (see `read_cut_flow_counts`)."""
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=1)
+
+
+def counts_from_dict(saved):
+    """Make `CutFlowCounts` from the output of `CutFlowCounts.to_dict`."""
+    counts = CutFlowCounts(saved['hit_cuts'], saved['event_cuts'], saved['applied_cuts'])
+    counts.stages = {stage: tuple(value) for stage, value in saved['stages'].items()}
+    counts.events = np.array(saved['events'], dtype=np.int64)
+    counts.hits = np.array(saved['hits'], dtype=np.int64)
+    return counts
+
+
+def read_cut_flow_counts(path):
+    """Read `CutFlowCounts` saved with `CutFlowCounts.to_json`."""
+    with open(path) as f:
+        return counts_from_dict(json.load(f))
+
+
+def sort_cuts(cuts, order=None):
+    """Return the `cuts` in `order` (names), and then the rest of them in
+    their order."""
+    if order is None:
+        return list(cuts)
+    rank = {name: i for i, name in enumerate(order)}
+    return sorted(cuts, key=lambda cut: rank.get(cut.name, len(rank)))
+
+
+def order_by_selectivity(report, cut_flow, cost=True):
+    """Return the names of the applied event cuts of `cut_flow`, in the order
+    that drops events the fastest, from the cut records of an earlier run's
+    report (from `instrument.read_report`, e.g. of run_report.jsonl from
+    `cuts.process_folder`).
+
+    (Every event cut is evaluated on every event there, so each cut's time
+    per event and fraction of events dropped are measured on their own. The
+    cuts are sorted by time per event over fraction dropped: the best order
+    for independent cuts. Cuts that aren't in the report go last.)
+
+    :param cost: If `False`, sort by the fraction dropped only (e.g. for the
+    prefilters, which all take about the same time, but not the same time as
+    their cuts).
+    """
+    names = [cut.name for cut in cut_flow.event_cuts]
+    if len(report) == 0 or 'cut' not in report:
+        return names
+
+    cuts = report[(report.stage == 'cut') & (report.unit == 'events')]
+    totals = cuts.groupby('cut')[['wall_s', 'rows_in', 'rows_out']].sum()
+
+    def rank(name):
+        if name not in totals.index or not totals.rows_in[name]:
+            return np.inf
+        dropped = 1 - totals.rows_out[name] / totals.rows_in[name]
+        seconds_per_event = totals.wall_s[name] / totals.rows_in[name]
+        if dropped <= 0:
+            return np.inf
+        return seconds_per_event / dropped if cost else -dropped
+
+    return sorted(names, key=rank)
+
+
+# Functions for the cuts (see `Cut`).
+
+def NPE_above_random_threshold(events, column='equivalentNPE'):
+    """Random cut for ignoring hits with NPE ~ 0: keep hits with more NPE (in
+    `column`: e.g. `NPE`, measured from the PMT hits, see pmt.py) than a
+    random number between 0 and 1.
+
+    The random number of each hit comes from `events.random_state`: a
+    `hit_random.HitRandom` (by default, with seed 0), which gives each hit
+    its own number, or a `numpy.random.RandomState` (the old way), which
+    draws one for every hit, in order."""
+    random_state = events.random_state
+    if random_state is None:
+        random_state = HitRandom()
+    if isinstance(random_state, np.random.RandomState):
+        return events[column] > random_state.rand(len(events.hits))
+    return events[column] > random_state.uniform(events['eventID'], events['copyNo'])
+
+
+def max_below(events, column, limit):
+    """Every hit in the event has `column` < `limit`."""
+    return events.max(column) < limit
+
+
+def num_hits_equal(events, num):
+    """Exactly `num` (slab) hits in the event."""
+    return events.num_hits() == num
+
+
+def num_unique_equal(events, column, num):
+    """Exactly `num` different values of `column` in the event."""
+    return events.nunique(column) == num
+
+
+def all_layers_hit(events):
+    """Every layer has a hit in the event (a bit test on the hit pattern)."""
+    return LAYOUT.layer_pattern(events.hit_pattern()) == LAYOUT.all_layers
+
+
+def one_module(events):
+    """All of the hits in the event are in one module (a bit test on the hit
+    pattern)."""
+    return LAYOUT.one_module(events.hit_pattern())
+
+
+def ratio_below(events, column, limit):
+    """The maximum of `column` over the minimum of `column` in the event is
+    < `limit`."""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return events.max(column) / events.min(column) < limit
+
+
+def delta_t_max_between(events, low, high):
+    """`low` < delta_t_max < `high` (see `Events.delta_t_max`)."""
+    delta_t_max = events.delta_t_max()
+    return (low < delta_t_max) & (delta_t_max < high)
+
+
+# The stage of the cut flow counts with the events left by the prefilters.
+PREFILTER_STAGE = "Prefilter (raw hits)"
+
+
+def num_slabs(events):
+    """The number of different slabs hit in each event of the raw hits
+    `events`."""
+    # (The bits of the hit pattern, if every hit is in a slab of the layout.
+    # Much faster than `nunique` on the raw hits.)
+    if (LAYOUT.slab[events['copyNo']] >= 0).all():
+        return count_bits(events.hit_pattern())
+    return events.nunique('copyNo')
+
+
+# Prefilters: for some of the event cuts, a function of the raw hits (not
+# aggregated per slab, and before the hit cuts) of each event that is `True`
+# for every event that can still pass the cut (see `CutFlow.prefilter`).
+# The hit cuts only drop slabs, and aggregating the hits of each slab only
+# adds up their energy deposits, so:
+
+def might_have_num_hits(events, num):
+    """(Prefilter for `num_hits_equal`.) At least `num` different slabs in the
+    event.
+
+    (Events with more than `num` slabs can't be dropped: the random NPE
+    threshold can drop slabs until there are exactly `num` left.)"""
+    return num_slabs(events) >= num
+
+
+def might_hit_all_layers(events):
+    """(Prefilter for `all_layers_hit`.) Every layer has a hit in the
+    event."""
+    return all_layers_hit(events)
+
+
+def might_be_below(events, column, limit):
+    """(Prefilter for `max_below` on `equivalentNPE` or `EDep_MeV`.) No hit
+    in the event has an energy deposit that, with all of the negative energy
+    deposits in the event, is already at least `limit`.
+
+    (The slab of such a hit has at least that energy deposit, so it's above
+    the random NPE threshold (for a `limit` of at least 1 NPE) and fails the
+    cut.)"""
+    EDep_MeV = events['EDep_MeV']
+    limit_MeV = limit * MEV_PER_PE if column == 'equivalentNPE' else limit
+    negative_sum = segment_reduce(np.add, np.minimum(EDep_MeV, 0), events.starts)
+
+    # (With a little room for the rounding of the sums.)
+    rounding = 1e-9 * (segment_reduce(np.add, np.abs(EDep_MeV), events.starts) + limit_MeV)
+    return events.max('EDep_MeV') + negative_sum < limit_MeV + rounding
+
+
+PREFILTERS = {
+    num_hits_equal: might_have_num_hits,
+    all_layers_hit: might_hit_all_layers,
+    max_below: might_be_below,
+}
+
+
+# The cuts that we use.
+
+IGNORE_ZERO_NPE = HitCut("Ignore hits with NPE ~ 0", NPE_above_random_threshold)
+MAX_NPE_BELOW_50 = EventCut("NPE < 50 for all hits", max_below,
+                            column='equivalentNPE', limit=50)
+FOUR_SLABS = EventCut("Exactly 4 slabs hit", num_hits_equal, num=4)
+ALL_FOUR_LAYERS = EventCut("All 4 layers", all_layers_hit)
+ONE_MODULE = EventCut("Only one module", one_module)
+NPE_RATIO_BELOW_10 = EventCut("NPE max/min < 10", ratio_below, column='EDep_MeV', limit=10)
+DELTA_T_MAX_WINDOW = EventCut("-15 ns < delta_t_max < 45 ns", delta_t_max_between,
+                              low=-15, high=45)
+
+# Signal-like: exactly 1 hit per layer and all hits < 50 NPE (see cuts.py).
+# The other cuts (from analysis.py) are only counted.
+SIGNAL_LIKE = CutFlow(
+    [IGNORE_ZERO_NPE, MAX_NPE_BELOW_50, FOUR_SLABS, ALL_FOUR_LAYERS],
+    extra_cuts=[ONE_MODULE, NPE_RATIO_BELOW_10, DELTA_T_MAX_WINDOW],
+)
+
+# The same, but with the NPE measured from the PMT hits (the `NPE` column: see
+# pmt.py) instead of from the energy deposits. (Same names, so that the counts
+# can be compared.)
+IGNORE_ZERO_PMT_NPE = HitCut("Ignore hits with NPE ~ 0", NPE_above_random_threshold,
+                             column='NPE')
+MAX_PMT_NPE_BELOW_50 = EventCut("NPE < 50 for all hits", max_below, column='NPE', limit=50)
+PMT_NPE_RATIO_BELOW_10 = EventCut("NPE max/min < 10", ratio_below, column='NPE', limit=10)
+SIGNAL_LIKE_PMT = CutFlow(
+    [IGNORE_ZERO_PMT_NPE, MAX_PMT_NPE_BELOW_50, FOUR_SLABS, ALL_FOUR_LAYERS],
+    extra_cuts=[ONE_MODULE, PMT_NPE_RATIO_BELOW_10, DELTA_T_MAX_WINDOW],
+)
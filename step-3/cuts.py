@@ -1,4 +1,4 @@
-"""Get signal-like events from the CSV files.
+"""Get signal-like events from the ScintRHits (CSV or Parquet) files.
 
 This is version 2 (used for the updated plots). It aggregates energy deposits
 (EDep_MeV) and hit times (hitTime_ns) per slab per event by summing the energy
@@ -16,71 +16,385 @@ Created 10 July 2023.
 from datetime import datetime
 import os
 import multiprocessing
+import sys
+import traceback
 
 import numpy as np
 import pandas as pd
 
-
-def make_cuts(s):
+from hits import (COLUMNS, CUT_COLUMNS, read_hits, iter_event_chunks, find_cosmicdirs,
+                  find_hits_file, unique_eventID)
+from cache import ResultCache, cut_config_hash
+from calibration import MEV_PER_PE, CALIBRATION_PATH
+from hit_random import HitRandom, file_key
+from cutflow import SIGNAL_LIKE, order_by_selectivity
+from features import fill_plot_histograms
+from geometry import LAYOUT
+from histograms import add_histograms, write_histograms
+from instrument import stage, timed_iter, set_report, finish_report, read_report
+from pmt import find_slab_NPE_file, read_slab_NPE, join_slab_NPE
+import calibration
+import cutflow
+import features
+import geometry
+import hits
+import hit_random
+import histograms
+import pmt
+import segments
+import summary
+import timing
+from summary import summarize_events, write_event_summary
+from segments import (sort_key, is_sorted, segment_starts, segment_reduce,
+                      segment_sum, expand_segments)
+
+
+def make_cuts(s, random_state=None, cut_flow=SIGNAL_LIKE, order=None, prefilter_order=None):
     """Make cuts to keep only signa-like events.
 
+    Sorts the hits by `eventID` (and `copyNo`) once, instead of grouping them
+    by `eventID` for every cut (like `make_cuts_groupby`), and then makes all
+    of the cuts at once.
+
+    Before that, the events that can't pass the cuts are dropped from the
+    raw hits (see `cutflow.CutFlow.prefilter`: e.g. fewer than 4 slabs, or a
+    hit that is already above 50 NPE), so that only the rest are aggregated.
+    Then each event cut is only made on the events that passed the ones
+    before it (no counts: see `make_cuts_and_count` for those). The result is
+    the same as with `make_cuts_and_count`.
+
     :param s: `pandas.DataFrame` in the format of a ScintRHits.csv
     (output of use_rootaway.py).
+    :param random_state: `hit_random.HitRandom` for the random NPE threshold
+    (if `None`, `HitRandom(seed=0)`). The result doesn't depend on how the
+    hits are split up. (Pass a `numpy.random.RandomState(0)` instead to get
+    the same result as `make_cuts_groupby`, which draws the thresholds in
+    order of the hits. Then every hit has to be there for the draws, so the
+    raw hits aren't prefiltered.)
+    :param cut_flow: `cutflow.CutFlow` with the cuts to make.
+    :param order: Names of the event cuts, in the order to make them, e.g.
+    from `cutflow.order_by_selectivity` with the report of an earlier run
+    (see `load_cut_order`). By default, the order of `cut_flow` (see
+    `cutflow.CutFlow.ordered`).
+    :param prefilter_order: Like `order`, for the prefilters.
     """
-    # Aggregate slab hits per event!
-    # Sum up energy deposits and take the minimum hit time per slab per event.
-    # Also get rid of "track-specific" variables:
-    # `trackID`, `parentID`, `trackLength_cm`,
-    # and `exitTime_ns`. This leaves only the `eventID`, `copyNo`, (aggregated)
-    # `EDep_MeV`, and (aggregated) `hitTime_ns`.
-    g = s.groupby(['eventID', 'copyNo'])
-    s = pd.concat([g.EDep_MeV.sum(), g.hitTime_ns.min()], axis=1).reset_index()
-    # After this, proceed as before...
+    if isinstance(random_state, np.random.RandomState):
+        return make_cuts_and_count(s, random_state, cut_flow)[0]
 
-    s['equivalentNPE'] = s.EDep_MeV / 1.24e-3
+    s, _ = prefilter(s, cut_flow, prefilter_order)
 
-    # Ignore all hits with NPE ~ 0.
-    np.random.seed(0)
-    random_NPE_limit = np.random.rand(len(s))
-    s = s[s.equivalentNPE > random_NPE_limit]
+    with stage('aggregate') as this_stage:
+        this_stage.rows_in = len(s)
+        s = aggregate_slab_hits(s)
+        this_stage.rows_out = len(s)
 
-    # Maximum of 50 NPE for every slab in an event.
-    # Uses our new, tentative, relationship for energy deposit/NPE.
-    s = cut_by_event(s, s.groupby('eventID').equivalentNPE.max() < 50)
+    with stage('cuts') as this_stage:
+        this_stage.rows_in = len(s)
+        s = cut_flow.select(s, random_state, order)
+        this_stage.rows_out = len(s)
 
-    # Exactly four slabs in total hit per event.
-    s = cut_by_event(s, s.groupby('eventID').size() == 4)
+    return add_cut_columns(s)
 
-    # All four layers.
-    s['layerNo'] = (s.copyNo - 18) % 4
-    s = cut_by_event(s, s.groupby('eventID').layerNo.nunique() == 4)
 
-    return s
+def prefilter(s, cut_flow=SIGNAL_LIKE, order=None):
+    """Drop the events that can't pass the cuts of `cut_flow` from the raw
+    hits `s` (see `cutflow.CutFlow.prefilter`: e.g. fewer than 4 slabs, or a
+    hit that is already above 50 NPE).
 
+    :return: The hits that are left, and the number of events and slab hits
+    before the prefilters (or `None`: see
+    `cutflow.CutFlowCounts.add_prefilter_stage`).
+    """
+    with stage('prefilter') as this_stage:
+        this_stage.rows_in = len(s)
+        s, before = cut_flow.prefilter(s, order)
+        this_stage.rows_out = len(s)
+    return s, before
+
+
+def load_cut_order(folder, cut_flow=SIGNAL_LIKE, report='run_report.jsonl'):
+    """Return the orders to make the event cuts and their prefilters in
+    (`order` and `prefilter_order`, for `make_cuts` or
+    `cutflow.CutFlow.ordered`), learned from the run report of the last
+    `process_folder` run on `folder` (see `cutflow.order_by_selectivity`), or
+    the order of `cut_flow` if there isn't one.
+
+    Example:
+        cut_hits = make_cuts(hits, cut_flow=cut_flow, **load_cut_order(folder, cut_flow))
+    """
+    report_path = os.path.join(folder, report)
+    if not os.path.exists(report_path):
+        names = [cut.name for cut in cut_flow.event_cuts]
+        return {'order': names, 'prefilter_order': names}
+    report = read_report(report_path)
+    return {'order': order_by_selectivity(report, cut_flow),
+            'prefilter_order': order_by_selectivity(report, cut_flow, cost=False)}
+
+
+def make_cuts_and_count(s, random_state=None, cut_flow=SIGNAL_LIKE, slab_NPE=None,
+                        prefilter_hits=False, summarize=False):
+    """Like `make_cuts`, but also return the `cutflow.CutFlowCounts` (the
+    number of events and hits left after each cut).
+
+    :param slab_NPE: The measured NPE of each slab in each event (see
+    `pmt.slab_NPE`), to join onto the aggregated hits as the `NPE` column
+    (for cuts like `cutflow.SIGNAL_LIKE_PMT`).
+    :param prefilter_hits: Whether to drop the events that can't pass the
+    cuts from the raw hits first (see `prefilter`, in the order of
+    `cut_flow.prefilter_order`). They are counted in the
+    `cutflow.PREFILTER_STAGE` of the counts (see
+    `cutflow.CutFlowCounts.add_prefilter_stage`), and every count after it
+    (and the summary) is only for the events that are left, so the counts of
+    the cuts in any other order (`cutflow.CutFlowCounts.table(order)`) are
+    wrong. Only the cut hits and the counts of all of the applied cuts are
+    the same. Not with a `numpy.random.RandomState` (see `make_cuts`).
+    :param summarize: Also return the summary of every event that the event
+    cuts were made on, with the cuts that it passed (see
+    `summary.summarize_events`).
+    """
+    before = None
+    if prefilter_hits and not isinstance(random_state, np.random.RandomState):
+        s, before = prefilter(s, cut_flow)
 
-def process_file(path):
-    """Read and cut a file, and keep track of the total number of events.
-    This function is given to `multiprocessing`."""
-    print(f"Reading and cutting {path}")
+    with stage('aggregate') as this_stage:
+        this_stage.rows_in = len(s)
+        s = aggregate_slab_hits(s)
+        this_stage.rows_out = len(s)
+
+    if slab_NPE is not None:
+        with stage('join_PMT_NPE') as this_stage:
+            this_stage.rows_in = len(slab_NPE)
+            s = join_slab_NPE(s, slab_NPE)
+            this_stage.rows_out = len(s)
+
+    with stage('cuts') as this_stage:
+        this_stage.rows_in = len(s)
+        s, counts, event_hits, passed = cut_flow.apply(s, random_state, passed=True)
+        this_stage.rows_out = len(s)
+
+    if prefilter_hits:
+        counts.add_prefilter_stage(before)
+
+    if not summarize:
+        return add_cut_columns(s), counts
+
+    with stage('summary') as this_stage:
+        this_stage.rows_in = len(event_hits)
+        event_summary = summarize_events(event_hits, passed)
+        this_stage.rows_out = len(event_summary)
+
+    return add_cut_columns(s), counts, event_summary
+
+
+def make_cuts_ensemble(s, seeds, file_key=0, cut_flow=SIGNAL_LIKE):
+    """Like `make_cuts_and_count`, but for each of the `seeds` of the random
+    NPE threshold, all in one go (see `cutflow.CutFlow.apply_ensemble`).
+
+    :return: `list`s of the cut hits and of the `cutflow.CutFlowCounts`, one
+    for each seed.
+    """
+    cut_hits, counts = cut_flow.apply_ensemble(aggregate_slab_hits(s), seeds, file_key)
+
+    return [add_cut_columns(piece) for piece in cut_hits], counts
 
-    file = pd.read_csv(path)
-    num_events_before_cuts = file.eventID.nunique()
-    cut_file = make_cuts(file)
 
-    return cut_file, num_events_before_cuts
+def add_cut_columns(s):
+    """Add the `equivalentNPE` and `layerNo` columns to the cut hits `s`, with
+    the dtypes in `hits.CUT_COLUMNS`.
+
+    (The cuts themselves use the full precision NPE: see
+    `cutflow.Events.DERIVED`. It's only added here, after the cuts, so that
+    it isn't carried through the cuts for every hit.)"""
+    # (See calibration.py.)
+    s['equivalentNPE'] = (s.EDep_MeV / MEV_PER_PE).astype(CUT_COLUMNS['equivalentNPE'])
+    s['layerNo'] = LAYOUT.layer[s.copyNo.to_numpy()].astype(CUT_COLUMNS['layerNo'])
+
+    return s
+
+
+def aggregate_slab_hits(s):
+    """Aggregate slab hits per event: sum up the energy deposits and take the
+    minimum hit time per slab (`copyNo`) per event.
+
+    This also gets rid of "track-specific" variables (`trackID`, `parentID`,
+    `trackLength_cm`, and `exitTime_ns`), and leaves only the `eventID`,
+    `copyNo`, (aggregated) `EDep_MeV`, and (aggregated) `hitTime_ns`, in order
+    of `eventID` and then `copyNo` (like `groupby(['eventID', 'copyNo'])`).
+    """
+    eventID = s.eventID.to_numpy()
+    copyNo = s.copyNo.to_numpy()
+    EDep_MeV = s.EDep_MeV.to_numpy()
+    hitTime_ns = s.hitTime_ns.to_numpy()
+
+    # Sort, unless the hits are already sorted. (The sort is stable, so the
+    # energy deposits are summed in the same order as with `groupby`.)
+    if not is_sorted(eventID, copyNo):
+        order = np.argsort(sort_key(eventID, copyNo), kind='stable')
+        eventID, copyNo, EDep_MeV, hitTime_ns = (
+            eventID[order], copyNo[order], EDep_MeV[order], hitTime_ns[order])
+
+    starts = segment_starts(eventID, copyNo)
+
+    return pd.DataFrame({
+        'eventID': eventID[starts],
+        'copyNo': copyNo[starts],
+        'EDep_MeV': segment_sum(EDep_MeV, starts),
+        'hitTime_ns': segment_reduce(np.minimum, hitTime_ns, starts),
+    })
+
+
+def process_file(path, chunksize=None, cut_flow=SIGNAL_LIKE, seed=0, columns=COLUMNS):
+    """Read and cut a file, and keep track of the total number of events and
+    the cut flow (`cutflow.CutFlowCounts`), fill the histograms for the
+    plots (see `features.fill_plot_histograms`), and summarize every event
+    that the event cuts were made on (see `summary.summarize_events`).
+    This function is given to `multiprocessing`.
+
+    :param chunksize: If given, read and cut the file about this many hits at
+    a time (see `hits.iter_event_chunks`), so that the memory used depends on
+    `chunksize` and not on the size of the file. The result is the same
+    either way.
+    :param cut_flow: Passed to `make_cuts_and_count`. If it cuts on the measured NPE
+    (the `NPE` column, like `cutflow.SIGNAL_LIKE_PMT`), the NPE of the slab
+    hits are read from the PMTNPE.parquet file next to the hits file (see
+    pmt.py), only for the events of each chunk.
+    :param seed: Seed for the random NPE threshold. Each hit's threshold only
+    depends on the seed, the name of its cosmicdir, its `eventID` and its
+    `copyNo` (see `hit_random.HitRandom`).
+    :param columns: Passed to `hits.read_hits` (the dtypes to read the hits
+    with). Only for comparing with other dtypes (see
+    `benchmarks.compare_hit_dtypes`).
+    """
+    print(f"Reading and cutting {path}")
+    random_state = HitRandom(seed, file_key(path))
+
+    NPE_path = None
+    if 'NPE' in cut_flow.columns():
+        NPE_path = find_slab_NPE_file(path)
+        if not os.path.exists(NPE_path):
+            raise ValueError(f"Sorry, but the cuts use the measured NPE, and there is no "
+                             f"{NPE_path} (see `convert.convert_file(..., PMT_NPE=True)`).")
+
+    # (Every stage is timed: see instrument.py.)
+    with stage('process_file', file=path) as file_stage:
+        if chunksize is None:
+            # (One chunk: the whole file. `map` only reads it when the first
+            # chunk is asked for, so that the reading is timed.)
+            chunks = timed_iter('read', map(read_hits, [path], [columns]))
+        else:
+            # Events are never split between chunks and the chunks are in
+            # order of `eventID`, so the aggregated hits come out in the same
+            # order as if the whole file was cut at once.
+            chunks = timed_iter('read', iter_event_chunks(path, chunksize, columns))
+
+        num_hits = 0
+        num_events_before_cuts = 0
+        cut_chunks = []
+        summaries = []
+        counts = 0
+        plot_histograms = None
+        for chunk in chunks:
+            num_hits += len(chunk)
+            num_events_before_cuts += chunk.eventID.nunique()
+            slab_NPE = None
+            if NPE_path is not None and len(chunk):
+                with stage('read_PMT_NPE') as this_stage:
+                    slab_NPE = read_slab_NPE(NPE_path, chunk.eventID.min(), chunk.eventID.max())
+                    this_stage.rows_out = len(slab_NPE)
+            cut_chunk, chunk_counts, chunk_summary = make_cuts_and_count(
+                chunk, random_state, cut_flow, slab_NPE, summarize=True)
+            cut_chunks.append(cut_chunk)
+            summaries.append(chunk_summary)
+            counts += chunk_counts
+            with stage('plot_histograms') as this_stage:
+                this_stage.rows_in = len(cut_chunk)
+                plot_histograms = fill_plot_histograms(cut_chunk, histograms=plot_histograms)
+
+        cut_file = cut_chunks[0] if len(cut_chunks) == 1 else pd.concat(cut_chunks)
+        event_summary = (summaries[0] if len(summaries) == 1
+                         else pd.concat(summaries, ignore_index=True))
+
+        file_stage.rows_in = num_hits
+        file_stage.rows_out = len(cut_file)
+
+    return cut_file, num_events_before_cuts, counts, plot_histograms, event_summary
+
+
+def find_folder_hits_files(folder):
+    """Return the sorted paths of the hits files in the cosmicdirs in
+    `folder`. (Sorted, so that each file gets the same `uniqueEventID`s every
+    time.)"""
+    # Use the ScintRHits.parquet file from convert.py if there is one, and the
+    # ScintRHits.csv file from rootaway otherwise.
+    filepaths = [find_hits_file(os.path.join(folder, subfolder))
+                 for subfolder in find_cosmicdirs(folder)]
+    return sorted(path for path in filepaths if path is not None)
 
 
 def process_folder(
     folder='/net/cms26/cms26r0/anson/noPhotons',
-    save='cut_ScintRHits.csv'
+    save='cut_ScintRHits.csv',
+    chunksize=None,
+    cut_flow=SIGNAL_LIKE,
+    cache=True,
+    content_hash=False,
+    keep_results=False,
+    retries=1,
+    seed=0,
+    report='run_report.jsonl'
 ):
-    """Load all files in the `folder`, cut them, and combine them into one
-    `DataFrame`.
-    
-    If a file already exists at the save path (`folder` + `save`), it will be
-    overwritten, per the behavior of `pandas.DataFrame.to_csv`!
+    """Load all files in the `folder`, cut them, and write them all to one
+    CSV file. Also add up the histograms for the plots in analysis.py (see
+    `features.fill_plot_histograms`) and save them in plot_histograms.json in
+    `folder`, and save a summary of every event that the event cuts were made
+    on (with the cuts that it passed) in event_summary.parquet in `folder`
+    (see summary.py).
+
+    Reads cosmicdir*/ScintRHits.parquet (from convert.py) or
+    cosmicdir*/ScintRHits.csv (from rootaway).
+
+    The cut hits of each file are appended to the CSV file as soon as that
+    file is done, so the memory used here doesn't grow with the number of
+    files. (The hits of each file are together, but the files are in the order
+    that they finished in. Each file's `uniqueEventID`s only depend on its
+    place in the sorted list of files, though.)
+
+    The CSV file is written to `folder` + `save` + '.tmp' and only renamed to
+    `folder` + `save` at the end. If a file already exists at the save path,
+    it will be overwritten! The cut flow counts for all of the files are saved
+    next to it, in cut_flow.json (see `cutflow.read_cut_flow_counts`).
+
+    With `save=None` (and without `keep_results`), the cut hits never leave
+    the worker processes: only the counts and histograms are sent back.
+
+    Files that fail are tried again (`retries` times), and any that still
+    fail are left out, printed, and listed in failed_files.txt in `folder`.
 
     Uses `multiprocessing`.
+
+    The results for each file are cached in `folder`/.cut_cache (see
+    cache.py), so only new or changed files (or all of the files, if the cuts
+    have changed) are cut again. Stale entries are deleted.
+
+    :param chunksize: Passed to `process_file` (read each file in chunks).
+    :param cut_flow: `cutflow.CutFlow` with the cuts to make.
+    :param cache: Whether to use (and update) the cache. Entries of other cut
+    configurations or of changed files are deleted at the end (see
+    `cache.ResultCache.prune`).
+    :param content_hash: Identify files in the cache by a hash of their
+    contents, instead of their size and modification time.
+    :param keep_results: Also keep all of the cut hits in memory and return
+    them (in order of `uniqueEventID`).
+    :param retries: How many more times to try files that fail.
+    :param seed: Passed to `process_file` (seed for the random NPE threshold).
+    :param report: Save the time, rows, bytes read and peak memory of every
+    stage of every file (and every cut) in `folder`/`report` (see
+    instrument.py), and print a summary at the end. `None` for no report.
+    :return: The cut hits (or `None`, unless `keep_results`), the total
+    number of events before any cuts, the `cutflow.CutFlowCounts`, and the
+    plot histograms (`dict` of name to `histograms.Histogram`) for all of the
+    files. (The event summary is only saved, not returned: see
+    `summary.read_event_summary`.)
     """
     available_cores = os.sched_getaffinity(0)
     num_cores = len(available_cores)
@@ -88,33 +402,214 @@ def process_folder(
     print(f"Starting at: {datetime.now()}")
     print(f"{num_cores} available cores: {available_cores}")
 
-    filepaths = [os.path.join(folder, subfolder, 'ScintRHits.csv')
-                 for subfolder in next(os.walk(folder))[1]
-                 if subfolder.startswith('cosmicdir')]
-
-    with multiprocessing.Pool(num_cores) as pool:
-        results = pool.map(process_file, filepaths)
-
-    # Create a `uniqueEventID` to differentiate between equal `eventID`s from
-    # different files.
-    dfs = []
-    for i, r in enumerate(results):
-        df = r[0]
-        df.insert(0, 'uniqueEventID', int(1e9*i) + df.eventID)
-        df.drop(columns='eventID', inplace=True)
-        dfs.append(df)
-
-    full_df = pd.concat(dfs)
-    num_events_before_cuts = sum(r[1] for r in results)
-
-    if save:
-        savepath = os.path.join(folder, save)
-        full_df.to_csv(savepath, index=False)
-        print(f"Saved cut results to {savepath}")
-    
+    filepaths = find_folder_hits_files(folder)
+
+    report_path = os.path.join(folder, report) if report else None
+    if report_path and os.path.exists(report_path):
+        # (Learn the order to make the event cuts and their prefilters in
+        # from the last run's report, before it's replaced: see
+        # `make_cuts`.)
+        cut_flow = cut_flow.ordered(**load_cut_order(folder, cut_flow, report))
+        os.remove(report_path)
+    set_report(report_path)
+
+    collector = ResultCollector(os.path.join(folder, save) if save else None, keep_results)
+
+    # Only send the cut hits back from the workers if they are needed.
+    need_hits = bool(save or keep_results)
+
+    todo = list(range(len(filepaths)))
+    result_cache = None
+    if cache:
+        result_cache = ResultCache(os.path.join(folder, '.cut_cache'),
+                                   cut_config_hash(cut_flow, CUT_MODULES, seed, CUT_FILES),
+                                   content_hash)
+        todo = []
+        for i, path in enumerate(filepaths):
+            with stage('cache_get', file=path):
+                result = result_cache.get(path, hits=need_hits)
+            if result is None:
+                todo.append(i)
+            else:
+                collector.add(i, result)
+        result_cache.report()
+
+    errors = {}
+    with multiprocessing.Pool(num_cores, initializer=set_report, initargs=(report_path,)) as pool:
+        for attempt in range(1 + retries):
+            if not todo:
+                break
+            if attempt:
+                print(f"Trying {len(todo)} failed file(s) again (retry {attempt} of {retries})")
+
+            failed = []
+            tasks = [(i, filepaths[i], chunksize, cut_flow, seed, result_cache, need_hits)
+                     for i in todo]
+            # One file at a time, in any order, so that each result can be
+            # written (and forgotten) as soon as it is ready.
+            for i, result, error in pool.imap_unordered(_process_file_or_error, tasks, chunksize=1):
+                if error is not None:
+                    print(f"Failed to process {filepaths[i]}:\n{error}")
+                    errors[filepaths[i]] = error
+                    failed.append(i)
+                    continue
+
+                errors.pop(filepaths[i], None)
+                collector.add(i, result)
+            todo = sorted(failed)
+
+    full_df = write_folder_outputs(folder, collector, filepaths, errors)
+
+    # (Every file has been looked up, so the entries that weren't are stale.)
+    if result_cache is not None:
+        result_cache.prune()
+
+    if report_path:
+        set_report(None)
+        finish_report(report_path)
+
     print(f"Ending at: {datetime.now()}")
 
-    return full_df, num_events_before_cuts
+    return full_df, collector.num_events_before_cuts, collector.counts, collector.histograms
+
+
+def write_folder_outputs(folder, collector, filepaths, errors):
+    """Finish the `collector` (a `ResultCollector` with the results of all of
+    the `filepaths`), and save the outputs of `process_folder` in `folder`:
+    cut_flow.json (if the cut hits were saved), plot_histograms.json,
+    event_summary.parquet, and the files that failed (`errors`: `dict` of path
+    to traceback) in failed_files.txt.
+
+    :return: All of the cut hits (see `ResultCollector.finish`).
+    """
+    failures_path = os.path.join(folder, 'failed_files.txt')
+    if errors:
+        print(f"{len(errors)} file(s) failed and are NOT included (see {failures_path}):")
+        with open(failures_path, 'w') as f:
+            for path in sorted(errors):
+                print(f"  {path}")
+                f.write(f"{path}\n")
+    elif os.path.exists(failures_path):
+        os.remove(failures_path)
+
+    full_df = collector.finish()
+    if collector.savepath:
+        print(f"Saved cut results to {collector.savepath}")
+        collector.counts.to_json(os.path.join(folder, 'cut_flow.json'))
+    if collector.histograms:
+        write_histograms(collector.histograms, os.path.join(folder, 'plot_histograms.json'))
+    counts = collector.counts
+    write_event_summary(collector.summary(), os.path.join(folder, 'event_summary.parquet'),
+                        filepaths, counts.event_cuts if counts else (),
+                        counts.applied_cuts if counts else ())
+
+    return full_df
+
+
+def _process_file_or_error(task):
+    """Run `process_file` for one (index, path, chunksize, cut_flow, seed,
+    result_cache, need_hits) `task`, save the result in the `result_cache` (if
+    any), and return the index, the result (without the cut hits, unless
+    `need_hits`), and the error (a traceback `str`, if the file failed).
+    This function is given to `multiprocessing`."""
+    i, path, chunksize, cut_flow, seed, result_cache, need_hits = task
+    try:
+        result = process_file(path, chunksize=chunksize, cut_flow=cut_flow, seed=seed)
+        if result_cache is not None:
+            with stage('cache_put', file=path):
+                result_cache.put(path, result)
+    except Exception:
+        return i, None, traceback.format_exc()
+
+    if not need_hits:
+        result = (None,) + result[1:]
+    return i, result, None
+
+
+def add_unique_eventID(df, file_index):
+    """Replace the `eventID` column of `df` by a `uniqueEventID` column, to
+    differentiate between equal `eventID`s from different files."""
+    df.insert(0, 'uniqueEventID', unique_eventID(file_index, df.eventID.to_numpy()))
+    df.drop(columns='eventID', inplace=True)
+    return df
+
+
+class ResultCollector:
+    """Collect the results of `process_file` one file at a time, in any order:
+    append the cut hits to a CSV file, add up the counts and histograms, and
+    keep the (small) event summaries."""
+
+    def __init__(self, savepath=None, keep_results=False):
+        """
+        :param savepath: Where to save the cut hits (written to `savepath` +
+        '.tmp' and renamed by `finish`), or `None` to not save them.
+        :param keep_results: Also keep the cut hits in memory (see `finish`).
+        """
+        self.savepath = savepath
+        self.keep_results = keep_results
+        self.num_events_before_cuts = 0
+        self.counts = 0
+        self.histograms = 0
+        self._header = True
+        self._kept = {}
+        self._summaries = []
+
+        if savepath:
+            self._temp_path = savepath + '.tmp'
+            if os.path.exists(self._temp_path):
+                os.remove(self._temp_path)
+
+    def add(self, file_index, result):
+        """Add the `result` of `process_file` for the file with index
+        `file_index` (in the sorted list of files)."""
+        df, num_events_before_cuts, counts, plot_histograms, event_summary = result
+
+        # (Timed: see instrument.py.)
+        with stage('collect', file_index=file_index) as this_stage:
+            if df is not None:
+                this_stage.rows_in = len(df)
+                df = add_unique_eventID(df, file_index)
+                if self.savepath:
+                    df.to_csv(self._temp_path, mode='a', header=self._header, index=False)
+                    self._header = False
+                if self.keep_results:
+                    self._kept[file_index] = df
+
+            self.num_events_before_cuts += num_events_before_cuts
+            self.counts += counts
+            self.histograms = add_histograms(self.histograms, plot_histograms)
+
+            event_summary = add_unique_eventID(event_summary.copy(), file_index)
+            event_summary.insert(1, 'file', file_index)
+            self._summaries.append(event_summary)
+
+    def summary(self):
+        """Return the event summaries of all of the files so far, in one
+        `DataFrame`."""
+        if not self._summaries:
+            return pd.DataFrame({name: pd.Series(dtype=dtype)
+                                 for name, dtype in summary.COLUMNS.items()})
+        return pd.concat(self._summaries, ignore_index=True)
+
+    def finish(self):
+        """Rename the CSV file into place and return all of the cut hits, in
+        order of file (if `keep_results`, else `None`)."""
+        if self.savepath:
+            if self._header:
+                # No files at all: still write the header.
+                pd.DataFrame(columns=list(CUT_COLUMNS)).to_csv(self._temp_path, index=False)
+            os.replace(self._temp_path, self.savepath)
+
+        if self.keep_results:
+            return pd.concat([self._kept[i] for i in sorted(self._kept)])
+        return None
+
+
+# The modules whose code decides the cut results (see `cache.cut_config_hash`).
+CUT_MODULES = (sys.modules[__name__], calibration, cutflow, geometry, hits, segments,
+               features, histograms, summary, timing, hit_random, pmt)
+# The files whose contents decide the cut results (the NPE calibration).
+CUT_FILES = (CALIBRATION_PATH,)
 
 
 def cut_by_event(df, eventID_bool):
@@ -122,12 +617,69 @@ def cut_by_event(df, eventID_bool):
     
     I.e., return a `DataFrame` like `df`, but only with the entries with
     `eventID`s  that correspond to `True` in the `pandas.Series`
-    `eventID_bool`."""
+    `eventID_bool`.
+
+    Same as `cut_by_event_isin`, but looks up each event once instead of each
+    hit. (Fastest when the hits of each event are next to each other.)"""
+    eventID = df.eventID.to_numpy()
+    starts = segment_starts(eventID)
+    good_events = eventID_bool.reindex(eventID[starts], fill_value=False).to_numpy(dtype=bool)
+    return df[expand_segments(good_events, starts, len(df))]
+
+
+# The original versions of `make_cuts` and `cut_by_event`, using `groupby` and
+# `isin` for every cut. These are kept to check and time the versions above
+# against (see `benchmarks.compare_cut_engines`).
+
+def make_cuts_groupby(s, random_state=None):
+    """Make cuts to keep only signa-like events.
+
+    :param s: `pandas.DataFrame` in the format of a ScintRHits.csv
+    (output of use_rootaway.py).
+    :param random_state: `numpy.random.RandomState` for the random NPE
+    threshold. If `None`, a new one with seed 0 is used. (Pass the same one
+    for every chunk of a file to get the same result as cutting the whole
+    file at once.)
+    """
+    # Aggregate slab hits per event!
+    # Sum up energy deposits and take the minimum hit time per slab per event.
+    # Also get rid of "track-specific" variables:
+    # `trackID`, `parentID`, `trackLength_cm`,
+    # and `exitTime_ns`. This leaves only the `eventID`, `copyNo`, (aggregated)
+    # `EDep_MeV`, and (aggregated) `hitTime_ns`.
+    g = s.groupby(['eventID', 'copyNo'])
+    s = pd.concat([g.EDep_MeV.sum(), g.hitTime_ns.min()], axis=1).reset_index()
+    # After this, proceed as before...
+
+    s['equivalentNPE'] = s.EDep_MeV / MEV_PER_PE
+
+    # Ignore all hits with NPE ~ 0.
+    if random_state is None:
+        random_state = np.random.RandomState(0)
+    random_NPE_limit = random_state.rand(len(s))
+    s = s[s.equivalentNPE > random_NPE_limit]
+
+    # Maximum of 50 NPE for every slab in an event.
+    # Uses our new, tentative, relationship for energy deposit/NPE.
+    s = cut_by_event_isin(s, s.groupby('eventID').equivalentNPE.max() < 50)
+
+    # Exactly four slabs in total hit per event.
+    s = cut_by_event_isin(s, s.groupby('eventID').size() == 4)
+
+    # All four layers.
+    s['layerNo'] = (s.copyNo - 18) % 4
+    s = cut_by_event_isin(s, s.groupby('eventID').layerNo.nunique() == 4)
+
+    return s
+
+
+def cut_by_event_isin(df, eventID_bool):
+    """Make a single cut (see `cut_by_event`)."""
     eventID_list = eventID_bool.index[eventID_bool] 
     return df[df.eventID.isin(eventID_list)]
 
 
 if __name__ == '__main__':
-    df, num_events_before_cuts = process_folder()
-    print(df)
+    df, num_events_before_cuts, counts, plot_histograms = process_folder()
     print(f"{num_events_before_cuts} events in total before any cuts.")
+    print(counts.table())
@@ -0,0 +1,520 @@
+"""Cut the files in a folder on several hosts at once: a coordinator hands out
+one file (cosmicdir) at a time to workers on any host that can see the files
+(e.g. on /net/cms26), and collects the results like `cuts.process_folder`.
+
+The coordinator listens on a TCP socket (`multiprocessing.connection`, so the
+messages are pickled and every connection is checked with `authkey`). Each
+worker connects, and then:
+ - the coordinator sends ('task', task), with the same task as
+ `cuts._process_file_or_error` (the file index and path, the cuts, ...),
+ - the worker cuts the file and sends back ('result', index, result, error,
+ records), with the instrument.py records of the stages that it ran,
+and so on, until the coordinator sends ('done',). While a worker is cutting a
+file, it sends ('heartbeat',) every `HEARTBEAT_INTERVAL` seconds, and while it
+is waiting for a file, so does the coordinator. If either end hears nothing
+for `HEARTBEAT_TIMEOUT` seconds, it gives up on the connection (and the
+coordinator hands the worker's file out again).
+
+Workers only ask for a file when they are free, so faster workers (or hosts)
+just do more files. When there are no more files to hand out, free workers
+are given a second copy of a file that another worker is still cutting (work
+stealing), and the first result to come back is used, so one slow (or hung)
+host can't hold up the end of the run. Files that fail to be cut are tried
+again (`retries` times), like in `cuts.process_folder`, and so are the files
+of workers that die (or whose connection is lost, or that stop sending
+heartbeats).
+
+When every file is done, the coordinator keeps accepting workers until all of
+the workers that it knows of (the ones that connected, and the local ones)
+have been told that it's done, so no worker is left waiting to connect.
+
+Running everything on one machine (for testing): `process_folder_distributed(
+folder, local_workers=4)` starts the coordinator and 4 worker processes. On
+several hosts, run the coordinator on one (`python distributed.py`) and
+`python distributed.py worker` on each of the others, with the same
+CUTS_AUTHKEY environment variable (see `get_authkey`).
+
+Created 18 October 2026.
+"""
+from collections import Counter, deque
+from datetime import datetime
+import json
+import multiprocessing
+from multiprocessing.connection import (Listener, Client, Connection, answer_challenge,
+                                        deliver_challenge)
+import os
+import socket
+import sys
+import tempfile
+import threading
+import time
+
+from cache import ResultCache, cut_config_hash
+from cutflow import SIGNAL_LIKE
+from cuts import (CUT_MODULES, CUT_FILES, ResultCollector, find_folder_hits_files,
+                  write_folder_outputs, load_cut_order, _process_file_or_error)
+from instrument import set_report, write_record, finish_report
+
+# Where the coordinator listens (and the workers connect to).
+COORDINATOR_HOST = 'cms26.physics.ucsb.edu'
+PORT = 50_617
+
+# The most copies of one file that are cut at once (see `Coordinator`).
+MAX_COPIES = 2
+
+# Connections waiting to be accepted (e.g. many workers starting at once).
+BACKLOG = 128
+
+# Seconds between heartbeats, and without any message before a connection is
+# given up on (see above).
+HEARTBEAT_INTERVAL = 10
+HEARTBEAT_TIMEOUT = 60
+
+# (`Coordinator._next_task`: no task yet, send a heartbeat.)
+_WAIT = object()
+
+
+def get_authkey(authkey=None):
+    """Return `authkey` (`bytes` or `str`), or else the CUTS_AUTHKEY
+    environment variable, which has to be the same for the coordinator and
+    the workers."""
+    if authkey is None:
+        authkey = os.environ.get('CUTS_AUTHKEY')
+    if authkey is None:
+        raise ValueError("Sorry, but an authkey is needed: set the CUTS_AUTHKEY environment variable (to the same value on every host).")
+    return authkey.encode() if isinstance(authkey, str) else authkey
+
+
+class Coordinator:
+    """Hands out the `tasks` (see `cuts._process_file_or_error`) to the
+    workers that connect to it, and adds their results to `collector`.
+
+    Each worker connection is served by its own thread."""
+
+    def __init__(self, tasks, collector, address, authkey, retries=1, steal=True,
+                 task_timeout=None):
+        """
+        :param tasks: `dict` of file index to task.
+        :param collector: `cuts.ResultCollector`.
+        :param address: (host, port) to listen on. Port 0 for any free port
+        (see `self.address`).
+        :param steal: Whether to give free workers a second copy of a file
+        that is still being cut (see above).
+        :param task_timeout: If given, give up on a worker that takes longer
+        than this (in seconds) to cut a file, even if it's still sending
+        heartbeats (e.g. if it's stuck).
+        """
+        self.tasks = tasks
+        self.collector = collector
+        self.retries = retries
+        self.steal = steal
+        self.task_timeout = task_timeout
+
+        self.errors = {}
+        self._todo = deque(sorted(tasks))
+        # File index to the names of the workers cutting it, in the order that
+        # the files were handed out.
+        self._running = {}
+        self._finished = set()
+        self._failed_attempts = Counter()
+        self._condition = threading.Condition()
+        self._collect_lock = threading.Lock()
+        self._closing = False
+        # Workers being served, and workers that have been sent ('done',).
+        self._num_connected = 0
+        self._num_done = 0
+
+        self._listener = Listener(address, authkey=authkey, backlog=BACKLOG)
+        self._authkey = authkey
+        self.address = self._listener.address
+
+    def run(self, num_workers=0, timeout=HEARTBEAT_TIMEOUT):
+        """Serve the workers until every file is done (or has failed), and
+        then until every connected worker, and at least `num_workers` workers
+        (e.g. the local ones), have been sent ('done',), or for at most
+        `timeout` more seconds."""
+        accepter = threading.Thread(target=self._accept, daemon=True)
+        accepter.start()
+
+        with self._condition:
+            while len(self._finished) < len(self.tasks):
+                self._condition.wait()
+
+            deadline = time.monotonic() + timeout
+            while self._num_connected or self._num_done < num_workers:
+                if not self._condition.wait(max(deadline - time.monotonic(), 0)):
+                    print(f"Stopped waiting for workers ({self._num_connected} still "
+                          f"connected, {self._num_done} of {num_workers} done)")
+                    break
+
+        # Stop accepting workers (`accept` has to be woken up by one last
+        # connection).
+        self._closing = True
+        Client(self.address, authkey=self._authkey).close()
+        accepter.join()
+        self._listener.close()
+
+    def _accept(self):
+        while True:
+            try:
+                connection = self._listener.accept()
+            except (OSError, EOFError, multiprocessing.AuthenticationError) as error:
+                # (E.g. a connection that was dropped, or had the wrong
+                # authkey: keep accepting the others.)
+                if self._closing:
+                    return
+                print(f"Couldn't accept a worker: {error!r}")
+                continue
+            if self._closing:
+                connection.close()
+                return
+            threading.Thread(target=self._serve, args=(connection,), daemon=True).start()
+
+    def _next_task(self, worker, timeout=None):
+        """Return the index of the next file for `worker`, waiting for one if
+        needed (`_WAIT` after `timeout` seconds, so that the worker can be
+        sent a heartbeat), or `None` if everything is done."""
+        with self._condition:
+            while True:
+                if self._todo:
+                    i = self._todo.popleft()
+                    self._running[i] = [worker]
+                    return i
+                if len(self._finished) == len(self.tasks):
+                    return None
+                if self.steal:
+                    for i, workers in self._running.items():
+                        if (i not in self._finished and len(workers) < MAX_COPIES
+                                and worker not in workers):
+                            print(f"{worker} is also cutting {self.tasks[i][1]} "
+                                  f"(still being cut by {', '.join(workers)})")
+                            workers.append(worker)
+                            return i
+                if not self._condition.wait(timeout):
+                    return _WAIT
+
+    def _stop_copy(self, i, worker):
+        """Forget that `worker` is cutting file `i`, and return the number of
+        other copies still being cut."""
+        workers = self._running.get(i, [])
+        if worker in workers:
+            workers.remove(worker)
+        if not workers:
+            self._running.pop(i, None)
+        return len(workers)
+
+    def _serve(self, connection):
+        with connection:
+            if not connection.poll(HEARTBEAT_TIMEOUT):
+                return
+            try:
+                _, worker = connection.recv()
+            except (EOFError, OSError):
+                return
+            print(f"Worker {worker} connected")
+
+            with self._condition:
+                self._num_connected += 1
+            try:
+                self._serve_worker(connection, worker)
+            finally:
+                with self._condition:
+                    self._num_connected -= 1
+                    self._condition.notify_all()
+
+    def _serve_worker(self, connection, worker):
+        while True:
+            i = self._next_task(worker, HEARTBEAT_INTERVAL)
+            if i is _WAIT:
+                try:
+                    connection.send(('heartbeat',))
+                except OSError:
+                    return
+                continue
+            if i is None:
+                try:
+                    connection.send(('done',))
+                except OSError:
+                    return
+                with self._condition:
+                    self._num_done += 1
+                return
+
+            try:
+                connection.send(('task', self.tasks[i]))
+                _, i, result, error, records = self._receive_result(connection)
+            except (EOFError, OSError) as lost:
+                # (Counts as a failure, so a file that crashes every worker
+                # isn't handed out forever.)
+                self._add(i, worker, None, f"Lost the connection to worker {worker}: {lost!r}")
+                return
+
+            for record in records:
+                write_record(record)
+            self._add(i, worker, result, error)
+
+    def _receive_result(self, connection):
+        """Wait for the worker's result (skipping its heartbeats), and raise a
+        `TimeoutError` if it stops sending heartbeats (or takes longer than
+        `task_timeout`)."""
+        start = time.monotonic()
+        while True:
+            if not connection.poll(HEARTBEAT_TIMEOUT):
+                raise TimeoutError(f"No heartbeat for {HEARTBEAT_TIMEOUT} s")
+            message = connection.recv()
+            if message[0] == 'result':
+                return message
+            if self.task_timeout is not None and time.monotonic() - start > self.task_timeout:
+                raise TimeoutError(f"Took longer than {self.task_timeout} s")
+
+    def _add(self, i, worker, result, error):
+        path = self.tasks[i][1]
+        with self._condition:
+            others = self._stop_copy(i, worker)
+            if i in self._finished:
+                # (Another copy finished first.)
+                return
+
+            if error is not None:
+                if others:
+                    # (Wait for the other copy.)
+                    print(f"Failed to process {path} on {worker}:\n{error}")
+                elif self._failed_attempts[i] < self.retries:
+                    self._failed_attempts[i] += 1
+                    print(f"Failed to process {path} on {worker}, trying again "
+                          f"(retry {self._failed_attempts[i]} of {self.retries}):\n{error}")
+                    self._todo.append(i)
+                else:
+                    print(f"Failed to process {path} on {worker}:\n{error}")
+                    self.errors[path] = error
+                    self._finished.add(i)
+                self._condition.notify_all()
+                return
+
+            self.errors.pop(path, None)
+            # (Marked as finished before it is collected, so other copies are
+            # ignored.)
+            self._finished.add(i)
+            num_finished = len(self._finished)
+
+        with self._collect_lock:
+            self.collector.add(i, result)
+        print(f"Done with {path} on {worker} ({num_finished} of {len(self.tasks)})")
+
+        with self._condition:
+            self._condition.notify_all()
+
+
+def _take_records(path):
+    """Return (and delete) the instrument.py records saved in `path`."""
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    os.remove(path)
+    return records
+
+
+def connect(address, authkey, timeout=HEARTBEAT_TIMEOUT):
+    """Like `multiprocessing.connection.Client`, but raise a `TimeoutError` if
+    the coordinator doesn't start the handshake within `timeout` seconds
+    (e.g. if it has stopped accepting workers)."""
+    sock = socket.create_connection(address, timeout=timeout)
+    sock.setblocking(True)
+    connection = Connection(sock.detach())
+    if not connection.poll(timeout):
+        connection.close()
+        raise TimeoutError(f"The coordinator at {address} didn't answer in {timeout} s.")
+    # (The same handshake as `Client`.)
+    answer_challenge(connection, authkey)
+    deliver_challenge(connection, authkey)
+    return connection
+
+
+def _send_heartbeats(send, stop):
+    """Send heartbeats (with `send`) until `stop` (`threading.Event`) is set."""
+    while not stop.wait(HEARTBEAT_INTERVAL):
+        try:
+            send(('heartbeat',))
+        except OSError:
+            return
+
+
+def worker(address=(COORDINATOR_HOST, PORT), authkey=None, connect_timeout=60,
+           timeout=HEARTBEAT_TIMEOUT):
+    """Connect to the coordinator at `address`, and cut files until it says
+    that everything is done (or stops answering).
+
+    :param connect_timeout: How long to keep trying to connect (in seconds),
+    e.g. if the coordinator hasn't started yet.
+    :param timeout: How long to wait for any message (even a heartbeat) from
+    the coordinator before giving up (in seconds).
+    """
+    authkey = get_authkey(authkey)
+    name = f"{socket.gethostname()}:{os.getpid()}"
+
+    deadline = time.monotonic() + connect_timeout
+    while True:
+        try:
+            connection = connect(address, authkey, timeout)
+            break
+        except (ConnectionRefusedError, TimeoutError):
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(1)
+
+    # (The heartbeats are sent from another thread while a file is cut.)
+    send_lock = threading.Lock()
+
+    def send(message):
+        with send_lock:
+            connection.send(message)
+
+    # The records of the stages are saved here, and sent with each result
+    # (so only the coordinator writes to the run report).
+    with tempfile.TemporaryDirectory() as folder:
+        report_path = os.path.join(folder, 'records.jsonl')
+        set_report(report_path)
+
+        with connection:
+            try:
+                send(('ready', name))
+                while True:
+                    if not connection.poll(timeout):
+                        print(f"No word from the coordinator for {timeout} s, stopping")
+                        break
+                    message = connection.recv()
+                    if message[0] == 'heartbeat':
+                        continue
+                    if message[0] == 'done':
+                        break
+
+                    _, task = message
+                    stop = threading.Event()
+                    heartbeats = threading.Thread(target=_send_heartbeats, args=(send, stop),
+                                                  daemon=True)
+                    heartbeats.start()
+                    try:
+                        i, result, error = _process_file_or_error(task)
+                    finally:
+                        stop.set()
+                        heartbeats.join()
+                    send(('result', i, result, error, _take_records(report_path)))
+            except (EOFError, OSError):
+                # (The coordinator has finished, or given up on us.)
+                pass
+
+        set_report(None)
+
+
+def run_workers(address=(COORDINATOR_HOST, PORT), authkey=None, processes=None):
+    """Run `processes` workers (by default, one per available core) on this
+    host, until the coordinator is done."""
+    authkey = get_authkey(authkey)
+    if processes is None:
+        processes = len(os.sched_getaffinity(0))
+
+    workers = [multiprocessing.Process(target=worker, args=(address, authkey))
+               for _ in range(processes)]
+    for process in workers:
+        process.start()
+    for process in workers:
+        process.join()
+
+
+def process_folder_distributed(
+    folder='/net/cms26/cms26r0/anson/noPhotons',
+    address=('', PORT),
+    authkey=None,
+    local_workers=0,
+    save='cut_ScintRHits.csv',
+    chunksize=None,
+    cut_flow=SIGNAL_LIKE,
+    cache=True,
+    retries=1,
+    seed=0,
+    steal=True,
+    task_timeout=None,
+    report='run_report.jsonl'
+):
+    """Like `cuts.process_folder`, but with the files cut by workers on any
+    number of hosts (see above), and the same outputs.
+
+    :param address: (host, port) for the coordinator to listen on.
+    :param authkey: See `get_authkey`. With only local workers, a random one
+    is used by default.
+    :param local_workers: Number of worker processes to start on this host
+    too (e.g. to run everything on one machine).
+    :param steal, task_timeout: See `Coordinator`.
+    :return: The total number of events before any cuts, the
+    `cutflow.CutFlowCounts`, and the plot histograms (but not the cut hits:
+    they are saved in `save`).
+
+    Other parameters: see `cuts.process_folder`.
+    """
+    print(f"Starting at: {datetime.now()}")
+
+    if authkey is None and local_workers and 'CUTS_AUTHKEY' not in os.environ:
+        authkey = os.urandom(32)
+    authkey = get_authkey(authkey)
+
+    filepaths = find_folder_hits_files(folder)
+
+    report_path = os.path.join(folder, report) if report else None
+    if report_path and os.path.exists(report_path):
+        # (See `cuts.process_folder`.)
+        cut_flow = cut_flow.ordered(**load_cut_order(folder, cut_flow, report))
+        os.remove(report_path)
+    set_report(report_path)
+
+    collector = ResultCollector(os.path.join(folder, save) if save else None)
+    need_hits = bool(save)
+
+    todo = list(range(len(filepaths)))
+    result_cache = None
+    if cache:
+        result_cache = ResultCache(os.path.join(folder, '.cut_cache'),
+                                   cut_config_hash(cut_flow, CUT_MODULES, seed, CUT_FILES))
+        todo = []
+        for i, path in enumerate(filepaths):
+            result = result_cache.get(path, hits=need_hits)
+            if result is None:
+                todo.append(i)
+            else:
+                collector.add(i, result)
+        result_cache.report()
+
+    tasks = {i: (i, filepaths[i], chunksize, cut_flow, seed, result_cache, need_hits)
+             for i in todo}
+    coordinator = Coordinator(tasks, collector, address, authkey, retries, steal,
+                              task_timeout)
+    print(f"Coordinator listening on {coordinator.address} for {len(tasks)} file(s)")
+
+    workers = [multiprocessing.Process(target=worker, args=(coordinator.address, authkey))
+               for _ in range(local_workers if tasks else 0)]
+    for process in workers:
+        process.start()
+    coordinator.run(num_workers=len(workers))
+    for process in workers:
+        process.join(HEARTBEAT_TIMEOUT)
+        if process.is_alive():
+            print(f"Stopping local worker {process.pid}")
+            process.terminate()
+            process.join()
+
+    write_folder_outputs(folder, collector, filepaths, coordinator.errors)
+
+    if report_path:
+        set_report(None)
+        finish_report(report_path)
+
+    print(f"Ending at: {datetime.now()}")
+
+    return collector.num_events_before_cuts, collector.counts, collector.histograms
+
+
+if __name__ == '__main__':
+    if sys.argv[1:] == ['worker']:
+        run_workers()
+    else:
+        process_folder_distributed()
@@ -0,0 +1,136 @@
+"""Run the cuts with many seeds of the random NPE threshold (see
+hit_random.py) at once, to see how much the cut flow counts and the plot
+histograms change from one seed to the next.
+
+Each file is read and its slab hits are aggregated once, and then the cuts
+are made for all of the seeds in one go (`cuts.make_cuts_ensemble`). Only the
+counts and histograms (one for each seed) are sent back from the workers.
+
+Created 18 October 2026.
+"""
+from datetime import datetime
+from functools import partial
+import os
+import multiprocessing
+
+import numpy as np
+import pandas as pd
+
+from cutflow import SIGNAL_LIKE
+from cuts import find_folder_hits_files, make_cuts_ensemble
+from features import fill_plot_histograms
+from hit_random import file_key
+from histograms import add_histograms
+from hits import read_hits
+
+# Default seeds.
+SEEDS = tuple(range(20))
+
+
+def process_file_ensemble(path, seeds=SEEDS, cut_flow=SIGNAL_LIKE):
+    """Read and cut a file once for each of the `seeds`.
+    This function is given to `multiprocessing`.
+
+    :return: The number of events before the cuts, and `list`s of the
+    `cutflow.CutFlowCounts` and the plot histograms (see
+    `features.fill_plot_histograms`), one for each seed. For each seed, these
+    are the same as from `cuts.process_file(path, seed=seed)` (neither of
+    them prefilters the raw hits: see `cuts.make_cuts_and_count`). That's
+    checked by golden.py.
+    """
+    print(f"Reading and cutting {path} ({len(seeds)} seeds)")
+
+    file = read_hits(path)
+    num_events_before_cuts = file.eventID.nunique()
+    cut_hits, counts = make_cuts_ensemble(file, seeds, file_key(path), cut_flow)
+
+    return num_events_before_cuts, counts, [fill_plot_histograms(piece) for piece in cut_hits]
+
+
+def process_folder_ensemble(
+    folder='/net/cms26/cms26r0/anson/noPhotons',
+    seeds=SEEDS,
+    cut_flow=SIGNAL_LIKE
+):
+    """Cut all of the files in the `folder` (like `cuts.process_folder`) once
+    for each of the `seeds`, and add up the results of each seed.
+
+    Uses `multiprocessing`.
+
+    :return: The total number of events before any cuts, and `list`s of the
+    `cutflow.CutFlowCounts` and the plot histograms for all of the files, one
+    for each seed.
+    """
+    num_cores = len(os.sched_getaffinity(0))
+    print(f"Starting at: {datetime.now()}")
+
+    filepaths = find_folder_hits_files(folder)
+
+    num_events_before_cuts = 0
+    counts = [0] * len(seeds)
+    plot_histograms = [0] * len(seeds)
+    with multiprocessing.Pool(num_cores) as pool:
+        results = pool.imap_unordered(partial(process_file_ensemble, seeds=seeds, cut_flow=cut_flow),
+                                      filepaths, chunksize=1)
+        for file_num_events, file_counts, file_histograms in results:
+            num_events_before_cuts += file_num_events
+            counts = [total + c for total, c in zip(counts, file_counts)]
+            plot_histograms = [add_histograms(total, h)
+                               for total, h in zip(plot_histograms, file_histograms)]
+
+    print(f"Ending at: {datetime.now()}")
+
+    return num_events_before_cuts, counts, plot_histograms
+
+
+def counts_spread(counts, order=None):
+    """Return a `DataFrame` with the mean, standard deviation, minimum and
+    maximum (over the seeds) of the number of events after each cut, and the
+    mean and standard deviation of the cumulative efficiency.
+
+    :param counts: `list` of `cutflow.CutFlowCounts`, one for each seed.
+    :param order: Passed to `cutflow.CutFlowCounts.table`.
+    """
+    tables = [c.table(order) for c in counts]
+    events = pd.concat([t.events for t in tables], axis=1)
+    efficiency = pd.concat([t['cumulative efficiency'] for t in tables], axis=1)
+
+    return pd.DataFrame({
+        'mean events': events.mean(axis=1),
+        'std events': events.std(axis=1, ddof=1),
+        'min events': events.min(axis=1),
+        'max events': events.max(axis=1),
+        'mean cumulative efficiency': efficiency.mean(axis=1),
+        'std cumulative efficiency': efficiency.std(axis=1, ddof=1),
+    })
+
+
+def histogram_spread(plot_histograms):
+    """Return a `dict` of name to `DataFrame` with the mean and standard
+    deviation (over the seeds) of each bin of each plot histogram, and the
+    mean statistical error of the bin, for comparison.
+
+    :param plot_histograms: `list` of `dict`s of name to
+    `histograms.Histogram`, one for each seed.
+    """
+    spread = {}
+    for name in plot_histograms[0]:
+        counts = np.array([h[name].counts for h in plot_histograms])
+        errors = np.array([h[name].errors for h in plot_histograms])
+        edges = plot_histograms[0][name].edges
+        spread[name] = pd.DataFrame({
+            'low edge': edges[:-1],
+            'mean': counts.mean(axis=0),
+            'std': counts.std(axis=0, ddof=1),
+            'mean statistical error': errors.mean(axis=0),
+        })
+    return spread
+
+
+if __name__ == '__main__':
+    num_events_before_cuts, counts, plot_histograms = process_folder_ensemble()
+    print(f"{num_events_before_cuts} events in total before any cuts.")
+    print(counts_spread(counts))
+    for name, spread in histogram_spread(plot_histograms).items():
+        print(name)
+        print(spread)
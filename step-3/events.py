@@ -0,0 +1,238 @@
+"""Sources of simulated events, read in large batches into NumPy arrays
+(instead of one Python object per hit).
+
+Each source has an `iter_batches` method that yields `dict`s with a
+`DataFrame` for each kind of hit, for many events at a time:
+ - 'ScintRHits': `eventID`, `copyNo`, `EDep_MeV`, `hitTime_ns` (like
+ `hits.COLUMNS`)
+ - 'PMTHits': `eventID`, `PMT_number`
+The hits of each event are next to each other, in order of `eventID`.
+
+`RootEventSource` reads a MilliQan.root file (this needs ROOT and the
+milliQanSim library), and `SyntheticEventSource` makes fake events with the
+same columns (see synthetic.py), for testing and timing without either.
+
+Both sources can also be looped over one event at a time, like the `Events`
+tree in starter_project.py (`for event in source: event.ScintRHits ...`).
+
+Created 18 October 2026.
+"""
+import numpy as np
+import pandas as pd
+
+from synthetic import make_hits, make_PMT_hits
+
+# Number of events per batch.
+EVENTS_PER_BATCH = 100_000
+
+HIT_KINDS = ('ScintRHits', 'PMTHits')
+
+# Collect the hits of each batch of events into one vector per column, in
+# C++. The `hit` templates work whether the events hold hits or pointers to
+# hits. (There is one `columns` per process.)
+_COLUMNS_CODE = """
+namespace events {
+
+template <typename Hit> const Hit &hit(const Hit &h) { return h; }
+template <typename Hit> const Hit &hit(const Hit *h) { return *h; }
+
+struct Columns {
+    bool readScintRHits = true;
+    bool readPMTHits = true;
+
+    std::vector<int> scintEventID;
+    std::vector<short> copyNo;
+    std::vector<double> EDep_MeV;
+    std::vector<double> hitTime_ns;
+
+    std::vector<int> PMTEventID;
+    std::vector<int> PMTNumber;
+
+    void clear() {
+        scintEventID.clear(); copyNo.clear(); EDep_MeV.clear(); hitTime_ns.clear();
+        PMTEventID.clear(); PMTNumber.clear();
+    }
+
+    int fill(ULong64_t entry, const mqROOTEvent &event) {
+        if (readScintRHits) {
+            for (const auto &h : *event.GetScintRHits()) {
+                scintEventID.push_back(entry);
+                copyNo.push_back(hit(h).GetCopyNo());
+                EDep_MeV.push_back(hit(h).GetEDep());
+                hitTime_ns.push_back(hit(h).GetHitTime());
+            }
+        }
+        if (readPMTHits) {
+            for (const auto &h : *event.GetPMTHits()) {
+                PMTEventID.push_back(entry);
+                PMTNumber.push_back(hit(h).GetPMTNumber());
+            }
+        }
+        return 1;
+    }
+};
+
+Columns columns;
+
+}
+"""
+
+_root_loaded = False
+
+
+def load_root():
+    """Import ROOT and load the milliQanSim library (once), and return the
+    `ROOT` module."""
+    global _root_loaded
+    import ROOT
+
+    if not _root_loaded:
+        # Load shared libraries (both are necessary).
+        ROOT.gInterpreter.ProcessLine('#include "/homes/anson/milliQanSim/include/mqROOTEvent.hh"')
+        ROOT.gSystem.Load('/homes/anson/milliQanSim/build/libMilliQanCore.so')
+
+        # These do not work:
+        # ROOT.gInterpreter.ProcessLine('#include "/net/cms17/cms17r0/schmitz/milliQanSim/include/mqROOTEvent.hh"')
+        # ROOT.gInterpreter.AddIncludePath('/net/cms17/cms17r0/schmitz/milliQanSim/include')
+        # ROOT.gInterpreter.AddIncludePath('/homes/anson/milliQanSim/include')
+        #
+        # Only the new version of the headers (e.g. mqROOTEvent.hh), i.e. the ones on GitHub and in
+        # /homes/anson/milliQanSim, work correctly. The old ones in /net/cms17/cms17r0/schmitz/milliQanSim
+        # do not. Also, I'm not able to get `AddIncludePath` to work, but `ProcessLine` works.
+
+        ROOT.gInterpreter.Declare(_COLUMNS_CODE)
+        _root_loaded = True
+
+    return ROOT
+
+
+class RootEventSource:
+    """Events from the `Events` tree of a MilliQan.root file.
+
+    The event ID is the entry number in the tree.
+    """
+
+    def __init__(self, path, kinds=HIT_KINDS, events_per_batch=EVENTS_PER_BATCH):
+        """
+        :param kinds: Which hits to read: any of `HIT_KINDS`. (Reading the
+        PMTHits of the withPhotons samples takes a long time.)
+        """
+        self.path = path
+        self.kinds = kinds
+        self.events_per_batch = events_per_batch
+
+    def iter_batches(self):
+        ROOT = load_root()
+        file = ROOT.TFile(self.path)
+        tree = file.Get('Events')
+        num_events = tree.GetEntries()
+
+        columns = ROOT.events.columns
+        columns.readScintRHits = 'ScintRHits' in self.kinds
+        columns.readPMTHits = 'PMTHits' in self.kinds
+
+        for start in range(0, num_events, self.events_per_batch):
+            columns.clear()
+            stop = min(start + self.events_per_batch, num_events)
+
+            # `rdfentry_` is the global entry number, even with `Range`.
+            # Summing the (lazy) `filled` column is what runs the event loop.
+            (ROOT.RDataFrame(tree)
+                 .Range(start, stop)
+                 .Define('filled', 'events::columns.fill(rdfentry_, ROOTEvent)')
+                 .Sum('filled')
+                 .GetValue())
+
+            batch = {}
+            if 'ScintRHits' in self.kinds:
+                batch['ScintRHits'] = pd.DataFrame({
+                    'eventID': np.array(columns.scintEventID, dtype='int32'),
+                    'copyNo': np.array(columns.copyNo, dtype='int16'),
+                    'EDep_MeV': np.array(columns.EDep_MeV, dtype='float64'),
+                    'hitTime_ns': np.array(columns.hitTime_ns, dtype='float64'),
+                })
+            if 'PMTHits' in self.kinds:
+                batch['PMTHits'] = pd.DataFrame({
+                    'eventID': np.array(columns.PMTEventID, dtype='int32'),
+                    'PMT_number': np.array(columns.PMTNumber, dtype='int32'),
+                })
+            yield batch
+
+    def __iter__(self):
+        """Loop over the events one at a time (slow!)."""
+        ROOT = load_root()
+        file = ROOT.TFile(self.path)
+        yield from file.Get('Events')
+
+
+class SyntheticEventSource:
+    """Fake events (see synthetic.py), made a batch at a time."""
+
+    def __init__(self, num_events, kinds=HIT_KINDS, events_per_batch=EVENTS_PER_BATCH,
+                 seed=0):
+        self.num_events = num_events
+        self.kinds = kinds
+        self.events_per_batch = events_per_batch
+        self.seed = seed
+
+    def iter_batches(self):
+        first_eventID = 0
+        for i, start in enumerate(range(0, self.num_events, self.events_per_batch)):
+            num_events = min(self.events_per_batch, self.num_events - start)
+            scint_hits = make_hits(num_events, seed=self.seed + i)
+            scint_hits['eventID'] += first_eventID
+            first_eventID = scint_hits.eventID.iloc[-1] + 1
+
+            batch = {}
+            if 'ScintRHits' in self.kinds:
+                batch['ScintRHits'] = scint_hits[['eventID', 'copyNo', 'EDep_MeV', 'hitTime_ns']].astype(
+                    {'eventID': 'int32', 'copyNo': 'int16'})
+            if 'PMTHits' in self.kinds:
+                batch['PMTHits'] = make_PMT_hits(scint_hits, seed=self.seed + i).astype(
+                    {'eventID': 'int32', 'PMT_number': 'int32'})
+            yield batch
+
+    def __iter__(self):
+        """Loop over the events one at a time, with objects that act like
+        those from the ROOT file (slow!)."""
+        for batch in SyntheticEventSource(self.num_events, HIT_KINDS,
+                                          self.events_per_batch, self.seed).iter_batches():
+            scint_hits = batch['ScintRHits']
+            PMT_hits = batch['PMTHits']
+            scint_groups = dict(tuple(scint_hits.groupby('eventID')))
+            PMT_groups = dict(tuple(PMT_hits.groupby('eventID')))
+
+            for eventID in scint_hits.eventID.unique():
+                scint = scint_groups[eventID]
+                PMT = PMT_groups.get(eventID, PMT_hits.iloc[:0])
+                yield _FakeEvent(
+                    [_FakeScintRHit(c, e) for c, e in zip(scint.copyNo.tolist(),
+                                                          scint.EDep_MeV.tolist())],
+                    [_FakePMTHit(n) for n in PMT.PMT_number.tolist()],
+                )
+
+
+class _FakeEvent:
+    def __init__(self, ScintRHits, PMTHits):
+        self.ScintRHits = ScintRHits
+        self.PMTHits = PMTHits
+
+
+class _FakeScintRHit:
+    def __init__(self, copyNo, EDep):
+        self._copyNo = copyNo
+        self._EDep = EDep
+
+    def GetCopyNo(self):
+        return self._copyNo
+
+    def GetEDep(self):
+        return self._EDep
+
+
+class _FakePMTHit:
+    def __init__(self, PMT_number):
+        self._PMT_number = PMT_number
+
+    def GetPMTNumber(self):
+        return self._PMT_number
@@ -0,0 +1,186 @@
+"""Sort the hits of a cosmicdir's hit file by `eventID` and then `copyNo`,
+without ever having more than about `run_size` hits in memory, and mark the
+file as sorted (in its Parquet metadata: see `hits.is_sorted_file`), so that
+it can be read an event at a time (`hits.iter_event_chunks`) without checking
+its order, and the slab hits are aggregated without sorting them
+(`cuts.aggregate_slab_hits` only checks that they are sorted).
+
+It's an external merge sort:
+ 1. Runs: the file is read `run_size` hits at a time, and each piece is
+ sorted (`segments.sort_key`, stable) and written to its own temporary
+ Parquet file.
+ 2. Merge: the runs are read back a batch at a time (all together, about
+ `run_size` hits), and the batches are merged (k-way) into the output file:
+ every hit with a key below the smallest last key of the batches can be
+ written out, and the batches that end at that key are topped up.
+The sort is stable (hits with the same `eventID` and `copyNo` stay in the
+order of the input file), so the aggregated energy deposits are exactly the
+same as when the whole file is sorted at once.
+
+Example:
+    sort_hits_file('cosmicdir0/ScintRHits.csv')  # -> cosmicdir0/ScintRHits.parquet
+    python external_sort.py /path/to/folder  # (every cosmicdir)
+
+Created 18 October 2026.
+"""
+from datetime import datetime
+import multiprocessing
+import os
+import sys
+import tempfile
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+from hits import (COLUMNS, CHUNKSIZE, FILENAMES, SORTED_KEY, SORTED_BY, find_cosmicdirs,
+                  find_hits_file, is_sorted_file, write_hit_batches)
+from instrument import stage
+from segments import sort_key
+
+# Smallest number of hits per batch of each run in the merge (so that a file
+# with many runs doesn't get read a few hits at a time).
+MIN_MERGE_BATCH = 10_000
+
+
+def iter_hit_pieces(path, size, columns=COLUMNS):
+    """Read the hits file at `path` (Parquet or CSV) `size` hits at a time,
+    in the order of the file (events can be split between pieces)."""
+    if path.endswith('.parquet'):
+        batches = pq.ParquetFile(path).iter_batches(batch_size=size, columns=list(columns))
+        return (batch.to_pandas().astype(columns, copy=False) for batch in batches)
+    return (chunk[list(columns)] for chunk in
+            pd.read_csv(path, usecols=list(columns), dtype=columns, chunksize=size))
+
+
+def sort_hits(df):
+    """Return the hits `df` sorted by `eventID` and then `copyNo` (stable)."""
+    order = np.argsort(sort_key(df.eventID.to_numpy(), df.copyNo.to_numpy()), kind='stable')
+    return df.iloc[order].reset_index(drop=True)
+
+
+def write_runs(path, run_size, folder):
+    """Write the sorted runs (see the top of this file) of the hits file at
+    `path` to `folder`, and return their paths."""
+    run_paths = []
+    for i, piece in enumerate(iter_hit_pieces(path, run_size)):
+        run_path = os.path.join(folder, f'run{i}.parquet')
+        write_hit_batches([sort_hits(piece)], run_path)
+        run_paths.append(run_path)
+    return run_paths
+
+
+def merge_runs(run_paths, batch_size):
+    """Merge the sorted runs at `run_paths`, reading `batch_size` hits of each
+    run at a time.
+
+    :return: Generator of sorted `DataFrame`s (all of the hits of all of the
+    runs, in order).
+    """
+    runs = [pq.ParquetFile(path).iter_batches(batch_size=batch_size) for path in run_paths]
+    buffers = [None] * len(runs)
+    keys = [None] * len(runs)
+
+    def top_up(i):
+        """Add the next batch of run `i` to its buffer (or finish the run)."""
+        batch = next(runs[i], None)
+        if batch is None:
+            runs[i] = None
+            return
+        batch = batch.to_pandas().astype(COLUMNS, copy=False)
+        batch_keys = sort_key(batch.eventID.to_numpy(), batch.copyNo.to_numpy())
+        if buffers[i] is None:
+            buffers[i], keys[i] = batch, batch_keys
+        else:
+            buffers[i] = pd.concat([buffers[i], batch], ignore_index=True)
+            keys[i] = np.concatenate([keys[i], batch_keys])
+
+    for i in range(len(runs)):
+        top_up(i)
+
+    while any(buffer is not None and len(buffer) for buffer in buffers):
+        # Every hit with a key below `bound` is in the buffers already. (Hits
+        # with key `bound` might still be in the rest of the runs, so they
+        # wait, to keep the merge stable.)
+        bound = min((key[-1] for i, key in enumerate(keys)
+                     if runs[i] is not None and len(key)), default=None)
+
+        pieces = []
+        piece_keys = []
+        for i, buffer in enumerate(buffers):
+            if buffer is None:
+                continue
+            take = len(buffer) if bound is None else np.searchsorted(keys[i], bound)
+            pieces.append(buffer.iloc[:take])
+            piece_keys.append(keys[i][:take])
+            buffers[i] = buffer.iloc[take:].reset_index(drop=True)
+            keys[i] = keys[i][take:]
+
+        merged_keys = np.concatenate(piece_keys)
+        if len(merged_keys):
+            # (Pieces are in order of run, so a stable sort keeps the hits
+            # with the same key in the order of the input file.)
+            order = np.argsort(merged_keys, kind='stable')
+            yield pd.concat(pieces, ignore_index=True).iloc[order].reset_index(drop=True)
+
+        # Top up the runs that ran out of hits below the next bound.
+        for i in range(len(runs)):
+            if runs[i] is not None and (not len(keys[i]) or keys[i][-1] == bound):
+                top_up(i)
+
+
+def sort_hits_file(path, output_path=None, run_size=CHUNKSIZE):
+    """Sort the hits file at `path` (Parquet or CSV) by `eventID` and then
+    `copyNo`, about `run_size` hits at a time (see the top of this file), and
+    write it to `output_path` (by default, the ScintRHits.parquet file in the
+    same folder: `path` itself if it's a Parquet file), marked as sorted.
+    The temporary files are next to `output_path`, and it is only replaced
+    when it's complete.
+
+    :return: The path of the sorted file.
+    """
+    if output_path is None:
+        output_path = os.path.join(os.path.dirname(path), FILENAMES[0])
+
+    with stage('external_sort', file=path) as this_stage, \
+            tempfile.TemporaryDirectory(dir=os.path.dirname(os.path.abspath(output_path)),
+                                        prefix='.sort-') as folder:
+        run_paths = write_runs(path, run_size, folder)
+        batch_size = max(run_size // max(len(run_paths), 1), MIN_MERGE_BATCH)
+
+        num_hits = 0
+
+        def count(batches):
+            nonlocal num_hits
+            for batch in batches:
+                num_hits += len(batch)
+                yield batch
+
+        write_hit_batches(count(merge_runs(run_paths, batch_size)), output_path,
+                          metadata={SORTED_KEY: SORTED_BY})
+        this_stage.rows_in = this_stage.rows_out = num_hits
+        print(f"Sorted {num_hits} hits of {path} in {len(run_paths)} run(s) to {output_path}")
+
+    return output_path
+
+
+def sort_folder(folder, processes=None, run_size=CHUNKSIZE):
+    """Sort the hits file of every cosmicdir in `folder` (that isn't sorted
+    already), in a pool of `processes` processes (by default, one per
+    available core). Each process has about `run_size` hits in memory."""
+    if processes is None:
+        processes = len(os.sched_getaffinity(0))
+
+    paths = [find_hits_file(os.path.join(folder, subfolder))
+             for subfolder in find_cosmicdirs(folder)]
+    paths = [path for path in paths if path is not None and not is_sorted_file(path)]
+    print(f"Sorting {len(paths)} file(s) in {folder}")
+
+    with multiprocessing.Pool(processes) as pool:
+        pool.starmap(sort_hits_file, [(path, None, run_size) for path in paths], chunksize=1)
+
+
+if __name__ == '__main__':
+    print(f"Starting at: {datetime.now()}")
+    sort_folder(sys.argv[1] if len(sys.argv) > 1 else '/net/cms26/cms26r0/anson/noPhotons/')
+    print(f"Ending at: {datetime.now()}")
@@ -0,0 +1,84 @@
+"""Per-event variables for the plots (NPE max/min ratio and delta_t_max), and
+the histograms that analysis.py plots, filled straight from the cut hits.
+
+These used to be calculated in `analysis.make_plot_data` from all of
+cut_ScintRHits_v2.csv at once. Now `cuts.process_file` fills the histograms
+for each file (see `fill_plot_histograms`), and only the histograms are added
+together and saved (plot_histograms.json, next to the cut hits).
+
+Created 18 October 2026.
+"""
+import pandas as pd
+
+from calibration import MEV_PER_PE
+from histograms import Histogram
+from timing import layer_matrix
+
+# Binning of the plots in analysis.py: (min, max, bin_size).
+PLOT_BINS = {
+    'NPE': (0, 50, 1/2),
+    'delta_t_max': (-50, 50, 2),
+    'NPE_ratio': (0, 45, 1/2),
+}
+
+# The binning that the histograms are filled with: the same ranges, but with
+# fine bins, so that any multiple of these bin sizes can be plotted by merging
+# bins (see `histograms.Histogram.rebin_to` and render.py), without filling
+# them again. (E.g. the NPE with 250 bins, or delta_t_max with 25 or 100 bins,
+# as in different-bin-sizes.)
+FILL_BINS = {
+    'NPE': (0, 50, 1/10),
+    'delta_t_max': (-50, 50, 1/2),
+    'NPE_ratio': (0, 45, 1/10),
+}
+
+
+def event_features(s, key='eventID'):
+    """Return a `DataFrame` with the `NPE_ratio` and `delta_t_max` of each
+    event, and the time differences between each pair of layers
+    (`delta_t_01`, ...), indexed by `key` (see timing.py).
+
+    :param s: Cut hits (e.g. from `cuts.make_cuts`, or cut_ScintRHits.csv with
+    `key='uniqueEventID'`). The hits of each event must be next to each other.
+    """
+    matrix = layer_matrix(s, key)
+
+    # (`max / min` of the energy deposits is the same as for the NPE.)
+    # Calculate delta_t_max as described in the TDR.
+    features = pd.DataFrame({
+        'NPE_ratio': matrix.NPE_ratio(),
+        'delta_t_max': matrix.delta_t_max(),
+    }, index=pd.Index(matrix.eventID, name=key))
+
+    return features.join(matrix.pairwise_delta_t().set_axis(features.index))
+
+
+def fill_plot_histograms(s, key='eventID', histograms=None):
+    """Fill the histograms for the plots in analysis.py from the cut hits `s`
+    (see `event_features`), and return them as a `dict` (with the keys of
+    `FILL_BINS`).
+
+     - 'NPE': nonzero NPE of each hit.
+     - 'delta_t_max': of events with NPE max/min < 10.
+     - 'NPE_ratio': of events with -15 ns < delta_t_max < 45 ns.
+
+    The histograms have the fine bins in `FILL_BINS` (merge them into the bins
+    in `PLOT_BINS`, or any other multiple, to plot them).
+
+    :param histograms: Histograms to add to (instead of new ones).
+    """
+    if histograms is None:
+        histograms = {name: Histogram(*bins) for name, bins in FILL_BINS.items()}
+
+    # (See calibration.py.)
+    NPE = s.EDep_MeV.to_numpy() / MEV_PER_PE
+    histograms['NPE'].fill(NPE[NPE > 0])
+
+    if len(s):
+        features = event_features(s, key)
+        NPE_ratio = features.NPE_ratio.to_numpy()
+        delta_t_max = features.delta_t_max.to_numpy()
+        histograms['delta_t_max'].fill(delta_t_max[NPE_ratio < 10])
+        histograms['NPE_ratio'].fill(NPE_ratio[(-15 < delta_t_max) & (delta_t_max < 45)])
+
+    return histograms
@@ -0,0 +1,99 @@
+"""The layout of the slabs: lookup arrays from `copyNo` to layer, module and
+slab number, and per-event hit patterns (bitmasks), so that the topology cuts
+("All 4 layers", "Only one module") are a few integer bit tests instead of
+counting unique values per event.
+
+A module is the slabs in a row, one in each layer, so the module number is
+also the number of the row. For the 48 slab detector (`SLABS_48`), copyNo 18
+to 65 are 12 modules of 4 layers: layer (copyNo - 18) % 4 and module
+(copyNo - 18) // 4.
+
+Each slab has a bit (bit num_layers*module + layer) in the event's hit pattern
+(`Layout.hit_pattern`: one OR reduction over the hits of each event), so e.g.
+the layers that were hit are the hit pattern's `num_layers`-bit groups ORed
+together (`Layout.layer_pattern`).
+
+Example:
+    layerNo = LAYOUT.layer[copyNo]
+    pattern = LAYOUT.hit_pattern(copyNo, starts)
+    all_layers = LAYOUT.layer_pattern(pattern) == LAYOUT.all_layers
+
+Created 18 October 2026.
+"""
+import numpy as np
+
+from segments import segment_reduce
+
+
+class Layout:
+    """The slabs of a detector: `num_modules` modules of `num_layers`
+    layers, with copyNo `first_copyNo` + num_layers*module + layer."""
+
+    def __init__(self, name, first_copyNo, num_layers, num_modules):
+        if num_layers * num_modules > 64:
+            raise ValueError(f"Sorry, but the hit pattern only has 64 bits "
+                             f"(not {num_layers * num_modules}).")
+        self.name = name
+        self.first_copyNo = first_copyNo
+        self.num_layers = num_layers
+        self.num_modules = num_modules
+        self.num_slabs = num_layers * num_modules
+
+        # Lookup arrays, indexed by copyNo (-1, or no bit, for copyNo that
+        # aren't slabs).
+        slab = np.full(first_copyNo + self.num_slabs, -1, dtype=np.int8)
+        slab[first_copyNo:] = np.arange(self.num_slabs)
+        self.slab = slab
+        self.layer = np.where(slab >= 0, slab % num_layers, -1).astype(np.int8)
+        self.module = np.where(slab >= 0, slab // num_layers, -1).astype(np.int8)
+        self.bit = np.where(slab >= 0, np.uint64(1) << slab.astype(np.uint64),
+                            0).astype(np.uint64)
+        # (And the other way, indexed by slab number.)
+        self.copyNo = np.arange(first_copyNo, first_copyNo + self.num_slabs, dtype=np.int16)
+
+        # Hit patterns of one module, and of every layer (see `layer_pattern`).
+        self.all_layers = np.uint64(2**num_layers - 1)
+
+    def __repr__(self):
+        return (f"Layout({self.name!r}, first_copyNo={self.first_copyNo}, "
+                f"num_layers={self.num_layers}, num_modules={self.num_modules})")
+
+    def hit_pattern(self, copyNo, starts):
+        """Return the hit pattern (`uint64`, one bit per slab) of each event.
+
+        :param copyNo: The `copyNo` of each hit.
+        :param starts: The index of the first hit of each event (see
+        `segments.segment_starts`).
+        """
+        return segment_reduce(np.bitwise_or, self.bit[copyNo], starts)
+
+    def layer_pattern(self, hit_pattern):
+        """Return the layers that were hit (bit i for layer i) in each event."""
+        layers = np.zeros_like(hit_pattern)
+        for module in range(self.num_modules):
+            layers |= hit_pattern >> np.uint64(module * self.num_layers)
+        return layers & self.all_layers
+
+    def module_pattern(self, hit_pattern):
+        """Return the modules that were hit (bit i for module i) in each
+        event."""
+        modules = np.zeros_like(hit_pattern)
+        for module in range(self.num_modules):
+            hit = (hit_pattern >> np.uint64(module * self.num_layers)) & self.all_layers
+            modules |= (hit != 0).astype(np.uint64) << np.uint64(module)
+        return modules
+
+    def one_module(self, hit_pattern):
+        """Return whether all of the hits of each event are in one module."""
+        # (A nonzero pattern with all of its bits in the module of its lowest
+        # bit.)
+        lowest_bit = hit_pattern & (~hit_pattern + np.uint64(1))
+        module_shift = np.log2(np.maximum(lowest_bit, 1)).astype(np.uint64)
+        module_shift -= module_shift % np.uint64(self.num_layers)
+        return (hit_pattern != 0) & ((hit_pattern >> module_shift) <= self.all_layers)
+
+
+SLABS_48 = Layout('48slab', first_copyNo=18, num_layers=4, num_modules=12)
+
+# The layout that the cuts use.
+LAYOUT = SLABS_48
@@ -0,0 +1,168 @@
+"""Golden-output checks: run the whole pipeline (`cuts.process_folder`, then
+the plot data of analysis.py) on a small fake dataset (see synthetic.py) and
+compare the outputs with the ones saved in golden/.
+
+The per-event plot data are saved like the files in graphs-and-data-v2
+(`NPE_ratio.csv` and `delta_t_max.csv`: a `Series` indexed by
+`uniqueEventID`, saved with `to_csv`), and the headers are checked against
+those files too. The cut flow table (`cut_flow.csv`) and the plot histograms
+(`plot_histograms.json`) are checked as well, and so is ensemble.py: for a few
+seeds, its cut flow tables and histograms have to be the same as the ones
+from `cuts.process_file` with each seed (see `compare_ensemble`).
+
+Run this file to check. If the outputs change on purpose (e.g. a new cut, or
+a change to synthetic.py), run `write_golden()` and commit the new files.
+
+Created 18 October 2026.
+"""
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from analysis import plot_data_from_file
+from cuts import process_folder, process_file, find_folder_hits_files
+from ensemble import process_file_ensemble
+from histograms import read_histograms, write_histograms
+from synthetic import write_dataset
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+GOLDEN_FOLDER = os.path.join(HERE, 'golden')
+V2_FOLDER = os.path.join(HERE, 'graphs-and-data-v2')
+
+# The fake dataset. (CSV files, like rootaway makes.)
+NUM_FILES = 3
+EVENTS_PER_FILE = 20_000
+SEED = 0
+
+# The seeds to compare ensemble.py with `cuts.process_file` for.
+ENSEMBLE_SEEDS = (0, 3)
+
+# The per-event outputs, like the files in graphs-and-data-v2.
+SERIES_NAMES = ('NPE_ratio', 'delta_t_max')
+
+
+def make_outputs(folder):
+    """Write the fake dataset to `folder`, cut it, and return the outputs:
+    a `dict` of name ('NPE_ratio', 'delta_t_max', 'cut_flow' and
+    'plot_histograms') to `Series` (per event), `DataFrame` (the cut flow
+    table) or `dict` of `histograms.Histogram`."""
+    write_dataset(folder, NUM_FILES, EVENTS_PER_FILE, seed=SEED)
+    _, _, counts, plot_histograms = process_folder(folder, cache=False)
+
+    # (The files are in the order that they finished in.)
+    NPE_ratio, delta_t_max = plot_data_from_file(os.path.join(folder, 'cut_ScintRHits.csv'))
+    outputs = {'NPE_ratio': NPE_ratio.sort_index(), 'delta_t_max': delta_t_max.sort_index()}
+    outputs['cut_flow'] = counts.table()
+    outputs['plot_histograms'] = plot_histograms
+    return outputs
+
+
+def write_outputs(outputs, folder):
+    """Save the `outputs` (from `make_outputs`) in `folder`."""
+    os.makedirs(folder, exist_ok=True)
+    for name in SERIES_NAMES:
+        outputs[name].to_csv(os.path.join(folder, f'{name}.csv'))
+    outputs['cut_flow'].to_csv(os.path.join(folder, 'cut_flow.csv'))
+    write_histograms(outputs['plot_histograms'], os.path.join(folder, 'plot_histograms.json'))
+
+
+def write_golden():
+    """Make the outputs and save them as the new golden outputs."""
+    with tempfile.TemporaryDirectory() as folder:
+        write_outputs(make_outputs(folder), GOLDEN_FOLDER)
+    print(f"Wrote golden outputs to {GOLDEN_FOLDER}")
+
+
+def _header(path):
+    with open(path) as f:
+        return f.readline().strip()
+
+
+def compare_outputs(folder, golden_folder=GOLDEN_FOLDER, rtol=1e-12):
+    """Compare the outputs saved in `folder` with the ones in
+    `golden_folder`.
+
+    :return: `list` of the differences (`str`s), empty if there are none.
+    """
+    differences = []
+
+    for name in SERIES_NAMES:
+        path = os.path.join(folder, f'{name}.csv')
+        # Same style as the files in graphs-and-data-v2.
+        v2_path = os.path.join(V2_FOLDER, f'{name}.csv')
+        if os.path.exists(v2_path) and _header(path) != _header(v2_path):
+            differences.append(f"{name}.csv: header {_header(path)!r} is not like "
+                               f"{_header(v2_path)!r} in graphs-and-data-v2")
+
+        new = pd.read_csv(path, index_col=0).iloc[:, 0]
+        old = pd.read_csv(os.path.join(golden_folder, f'{name}.csv'), index_col=0).iloc[:, 0]
+        if not new.index.equals(old.index):
+            differences.append(f"{name}.csv: different events ({len(new)} vs. {len(old)})")
+        elif not np.allclose(new, old, rtol=rtol, atol=0, equal_nan=True):
+            num_different = (~np.isclose(new, old, rtol=rtol, atol=0, equal_nan=True)).sum()
+            differences.append(f"{name}.csv: {num_different} different values")
+
+    new = pd.read_csv(os.path.join(folder, 'cut_flow.csv'), index_col=0)
+    old = pd.read_csv(os.path.join(golden_folder, 'cut_flow.csv'), index_col=0)
+    if not new[['events', 'hits']].equals(old[['events', 'hits']]):
+        differences.append(f"cut_flow.csv: different counts\n{new}\nvs.\n{old}")
+
+    new = read_histograms(os.path.join(folder, 'plot_histograms.json'))
+    old = read_histograms(os.path.join(golden_folder, 'plot_histograms.json'))
+    for name in old:
+        if name not in new or not np.array_equal(new[name].counts, old[name].counts):
+            differences.append(f"plot_histograms.json: different {name!r} histogram")
+
+    return differences
+
+
+def compare_ensemble(folder, seeds=ENSEMBLE_SEEDS):
+    """Compare the results of `ensemble.process_file_ensemble` for each file
+    of the dataset in `folder` with the ones of `cuts.process_file` with each
+    of the `seeds`.
+
+    :return: `list` of the differences (`str`s), empty if there are none.
+    """
+    differences = []
+    for path in find_folder_hits_files(folder):
+        num_events, counts, plot_histograms = process_file_ensemble(path, seeds)
+        for seed, seed_counts, seed_histograms in zip(seeds, counts, plot_histograms):
+            _, file_num_events, file_counts, file_histograms, _ = process_file(path, seed=seed)
+            name = f"{os.path.basename(os.path.dirname(path))}, seed {seed}"
+            if num_events != file_num_events:
+                differences.append(f"ensemble ({name}): {num_events} events before the cuts "
+                                   f"vs. {file_num_events}")
+            if not seed_counts.table().equals(file_counts.table()):
+                differences.append(f"ensemble ({name}): different counts\n"
+                                   f"{seed_counts.table()}\nvs.\n{file_counts.table()}")
+            for histogram_name, histogram in file_histograms.items():
+                if not np.array_equal(seed_histograms[histogram_name].counts, histogram.counts):
+                    differences.append(f"ensemble ({name}): different {histogram_name!r} "
+                                       f"histogram")
+    return differences
+
+
+def check_golden():
+    """Make the outputs and compare them with the golden outputs, and check
+    ensemble.py on the same dataset.
+
+    :return: `list` of the differences (see `compare_outputs` and
+    `compare_ensemble`).
+    """
+    with tempfile.TemporaryDirectory() as folder:
+        output_folder = os.path.join(folder, 'outputs')
+        dataset_folder = os.path.join(folder, 'dataset')
+        write_outputs(make_outputs(dataset_folder), output_folder)
+        return compare_outputs(output_folder) + compare_ensemble(dataset_folder)
+
+
+if __name__ == '__main__':
+    differences = check_golden()
+    if differences:
+        print(f"{len(differences)} difference(s) from the golden outputs:")
+        for difference in differences:
+            print(f"  {difference}")
+        raise SystemExit(1)
+    print("All outputs are the same as the golden outputs.")
@@ -0,0 +1,191 @@
+"""Histograms with fixed bins that can be filled a piece at a time (e.g. by
+each `multiprocessing` worker, for its own file) and then added together.
+
+Only the bin arrays (counts, sums of squared weights, and the underflow and
+overflow) are kept, so they are small to send between processes and to save
+(see `Histogram.to_dict` and `read_histograms`), no matter how many events
+were filled in.
+
+Example:
+    h = Histogram(min=0, max=50, bin_size=1/2)
+    h.fill(NPE_of_file_1)
+    total = h + other_histogram
+    analysis.histogram_with_error_bars(total)
+
+Created 18 October 2026.
+"""
+import json
+
+import numpy as np
+
+
+class Histogram:
+    """A histogram with bins of size `bin_size` from `min` to `max`.
+
+    Values <= `min` go in the underflow and values >= `max` go in the
+    overflow (the same range that `analysis.histogram_with_error_bars` always
+    plotted). Inside, each bin includes its left edge, like `numpy.histogram`.
+    NaNs are ignored.
+    """
+
+    def __init__(self, min, max, bin_size):
+        self.min = min
+        self.max = max
+        self.bin_size = bin_size
+        # (Same edges as `analysis.histogram_with_error_bars` always used.)
+        self.edges = np.arange(min, max + bin_size, bin_size)
+
+        num_bins = len(self.edges) - 1
+        self.counts = np.zeros(num_bins)
+        self.sumw2 = np.zeros(num_bins)
+        self.underflow = 0.
+        self.overflow = 0.
+
+    def fill(self, x, weights=None):
+        """Add the values `x` (with `weights`, or a weight of 1 each)."""
+        x = np.asarray(x, dtype=float)
+        weights = np.ones(len(x)) if weights is None else np.asarray(weights, dtype=float)
+
+        not_nan = ~np.isnan(x)
+        x, weights = x[not_nan], weights[not_nan]
+
+        below = x <= self.min
+        above = x >= self.max
+        self.underflow += weights[below].sum()
+        self.overflow += weights[above].sum()
+
+        inside = ~(below | above)
+        bin_index = np.searchsorted(self.edges, x[inside], side='right') - 1
+        # Values just below `max` can land past the last edge of `np.arange`.
+        bin_index = np.minimum(bin_index, len(self.counts) - 1)
+        self.counts += np.bincount(bin_index, weights[inside], len(self.counts))
+        self.sumw2 += np.bincount(bin_index, weights[inside]**2, len(self.counts))
+        return self
+
+    @property
+    def midpoints(self):
+        return (self.edges[:-1] + self.edges[1:]) / 2
+
+    @property
+    def errors(self):
+        """Standard deviation of each bin (the square root of the sum of the
+        squared weights; the square root of the counts with no weights)."""
+        return np.sqrt(self.sumw2)
+
+    @property
+    def entries(self):
+        """Total weight inside the bins (not including the under/overflow)."""
+        return self.counts.sum()
+
+    @property
+    def total(self):
+        """Total weight, including the under/overflow."""
+        return self.entries + self.underflow + self.overflow
+
+    def same_bins(self, other):
+        return ((self.min, self.max, self.bin_size) == (other.min, other.max, other.bin_size))
+
+    def copy(self):
+        h = Histogram(self.min, self.max, self.bin_size)
+        h.edges = self.edges.copy()
+        h.counts = self.counts.copy()
+        h.sumw2 = self.sumw2.copy()
+        h.underflow = self.underflow
+        h.overflow = self.overflow
+        return h
+
+    def __add__(self, other):
+        # (So that `sum` works.)
+        if other == 0:
+            return self.copy()
+        if not self.same_bins(other):
+            raise ValueError("Sorry, but histograms can only be added if they have the same bins.")
+
+        total = self.copy()
+        total.counts += other.counts
+        total.sumw2 += other.sumw2
+        total.underflow += other.underflow
+        total.overflow += other.overflow
+        return total
+
+    __radd__ = __add__
+
+    def rebin(self, factor):
+        """Return a new histogram with every `factor` bins merged into one.
+
+        The number of bins must be a multiple of `factor`."""
+        if len(self.counts) % factor:
+            raise ValueError(f"Sorry, but {len(self.counts)} bins can't be merged {factor} at a time.")
+
+        h = Histogram(self.min, self.max, self.bin_size * factor)
+        h.edges = self.edges[::factor]
+        h.counts = self.counts.reshape(-1, factor).sum(axis=1)
+        h.sumw2 = self.sumw2.reshape(-1, factor).sum(axis=1)
+        h.underflow = self.underflow
+        h.overflow = self.overflow
+        return h
+
+    def rebin_to(self, bin_size):
+        """Return a new histogram with bins of size `bin_size`, made by merging
+        the bins of this one (see `rebin`), so that a histogram filled once
+        with fine bins can be plotted with any coarser binning. `bin_size`
+        must be a multiple of this histogram's bin size."""
+        factor = round(bin_size / self.bin_size)
+        if factor < 1 or not np.isclose(factor * self.bin_size, bin_size):
+            raise ValueError(f"Sorry, but bins of size {self.bin_size} can't be merged into "
+                             f"bins of size {bin_size}.")
+        return self.copy() if factor == 1 else self.rebin(factor)
+
+    def __repr__(self):
+        return (f"Histogram(min={self.min}, max={self.max}, bin_size={self.bin_size}) "
+                f"with {self.entries:g} entries")
+
+    def to_dict(self):
+        """Return the histogram as a `dict` of plain `list`s and numbers (e.g.
+        for JSON; see `histogram_from_dict`)."""
+        return {
+            'min': self.min,
+            'max': self.max,
+            'bin_size': self.bin_size,
+            'counts': self.counts.tolist(),
+            'sumw2': self.sumw2.tolist(),
+            'underflow': self.underflow,
+            'overflow': self.overflow,
+        }
+
+
+def histogram_from_dict(saved):
+    """Make a `Histogram` from the output of `Histogram.to_dict`."""
+    h = Histogram(saved['min'], saved['max'], saved['bin_size'])
+    if len(saved['counts']) != len(h.counts):
+        # (From `rebin`.)
+        h.edges = np.linspace(h.min, h.min + h.bin_size * len(saved['counts']),
+                              len(saved['counts']) + 1)
+    h.counts = np.array(saved['counts'], dtype=float)
+    h.sumw2 = np.array(saved['sumw2'], dtype=float)
+    h.underflow = saved['underflow']
+    h.overflow = saved['overflow']
+    return h
+
+
+def write_histograms(histograms, path):
+    """Save a `dict` of name to `Histogram` to a JSON file (see
+    `read_histograms`)."""
+    with open(path, 'w') as f:
+        json.dump({name: h.to_dict() for name, h in histograms.items()}, f, indent=1)
+
+
+def read_histograms(path):
+    """Read a `dict` of name to `Histogram` saved with `write_histograms`."""
+    with open(path) as f:
+        return {name: histogram_from_dict(saved) for name, saved in json.load(f).items()}
+
+
+def add_histograms(a, b):
+    """Add two `dict`s of name to `Histogram` (either can be 0, so that `sum`
+    works)."""
+    if isinstance(a, int) and a == 0:
+        return b
+    if isinstance(b, int) and b == 0:
+        return a
+    return {name: a[name] + b[name] for name in a}
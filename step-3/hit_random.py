@@ -0,0 +1,82 @@
+"""Random numbers for individual hits that only depend on which hit it is (the
+file, `eventID` and `copyNo`) and the seed, not on where the hit is in the
+file.
+
+The random NPE threshold (`cutflow.NPE_above_random_threshold`) used to draw
+one number per hit from `numpy.random.RandomState(0)`, in order, so whether a
+hit passed depended on how many hits came before it. With `HitRandom`, the
+cuts give the same result however the hits are split up (whole files,
+chunks, or any other pieces), in any order.
+
+The numbers are made by hashing the hit's key with SplitMix64 (a
+"counter-based" generator: the n-th number is a function of n, not of the
+numbers before it).
+
+Created 18 October 2026.
+"""
+import hashlib
+import os
+
+import numpy as np
+
+_GOLDEN_GAMMA = np.uint64(0x9E3779B97F4A7C15)
+_MIX_1 = np.uint64(0xBF58476D1CE4E5B9)
+_MIX_2 = np.uint64(0x94D049BB133111EB)
+
+# For an ensemble of seeds (see `cutflow.CutFlow.apply_ensemble`), the
+# `eventID`s are shifted up by this many bits, and the bits above are the
+# index of the seed.
+REPLICA_SHIFT = 32
+
+
+def splitmix64(x):
+    """Scramble the (`numpy.uint64`) integers `x` (SplitMix64)."""
+    with np.errstate(over='ignore'):
+        z = x + _GOLDEN_GAMMA
+        z = (z ^ (z >> np.uint64(30))) * _MIX_1
+        z = (z ^ (z >> np.uint64(27))) * _MIX_2
+    return z ^ (z >> np.uint64(31))
+
+
+def file_key(path):
+    """Return a number that identifies the file at `path` by the name of its
+    cosmicdir (so it is the same wherever the folder is, and whatever other
+    files are processed with it)."""
+    name = os.path.basename(os.path.dirname(os.path.abspath(path)))
+    return int.from_bytes(hashlib.sha256(name.encode()).digest()[:8], 'little')
+
+
+class HitRandom:
+    """Uniform random numbers in [0, 1) for hits, keyed by (file, `eventID`,
+    `copyNo`).
+
+    Pass this as the `random_state` of `cuts.make_cuts` (or
+    `cutflow.CutFlow.apply`)."""
+
+    def __init__(self, seed=0, file_key=0):
+        """
+        :param seed: An `int`, or a sequence of seeds for an ensemble (see
+        `REPLICA_SHIFT`).
+        :param file_key: See `file_key`.
+        """
+        self.seed = seed
+        self.file_key = file_key
+
+    def __repr__(self):
+        return f"HitRandom(seed={self.seed!r}, file_key={self.file_key!r})"
+
+    def uniform(self, eventID, copyNo):
+        """Return a random number in [0, 1) for each hit."""
+        eventID = np.asarray(eventID).astype(np.int64).astype(np.uint64)
+        copyNo = np.asarray(copyNo).astype(np.int64).astype(np.uint64)
+
+        mask = np.uint64(2**REPLICA_SHIFT - 1)
+        replica = eventID >> np.uint64(REPLICA_SHIFT)
+        seeds = np.atleast_1d(np.asarray(self.seed, dtype=np.int64)).astype(np.uint64)
+
+        stream = splitmix64(splitmix64(seeds[replica]) ^ np.uint64(self.file_key))
+        key = ((eventID & mask) << np.uint64(16)) | (copyNo & np.uint64(0xFFFF))
+        z = splitmix64(key ^ stream)
+
+        # The top 53 bits, as a float in [0, 1).
+        return (z >> np.uint64(11)) * 2.0**-53
@@ -0,0 +1,213 @@
+"""Read and write ScintRHits hit tables.
+
+There are two formats for the hits of one cosmicdir:
+ - ScintRHits.csv: written by rootaway (step-2/use_rootaway.py). Every
+ column of every hit, as text.
+ - ScintRHits.parquet: written by convert.py, straight from the ROOT file.
+ Only the columns in `COLUMNS`, with the dtypes in `COLUMNS`, compressed.
+
+Both are read into the same `DataFrame` by `read_hits`, so cuts.py does not
+care which one it gets.
+
+Hit tables are kept in compact dtypes all the way from `read_hits` to
+analysis.py (see `COLUMNS` and `CUT_COLUMNS`): small integers for `copyNo`
+and the layer and module numbers, `float32` for the NPE, and one 64-bit
+integer key per event (`unique_eventID`). The energy deposits and hit times
+stay `float64` (see `COLUMNS`).
+
+Created 18 October 2026.
+"""
+import os
+import re
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# The columns (and their dtypes) that the cuts need from a ScintRHits file.
+# `eventID` goes up to ~10^6 per cosmicdir, and `copyNo` goes up to 65 for the
+# 48 slab detector. The energy deposits are summed per slab (including
+# negative ones) and cut on near thresholds (NPE < 50, NPE max/min < 10), and
+# the hit times go up to ~10^13 ns (where `float32` can't even tell
+# microseconds apart), so both stay `float64`.
+COLUMNS = {
+    'eventID': 'int32',
+    'copyNo': 'int16',
+    'EDep_MeV': 'float64',
+    'hitTime_ns': 'float64',
+}
+
+# The columns (and their dtypes) of the cut hits (the output of
+# `cuts.make_cuts`, and cut_ScintRHits.csv, with `uniqueEventID` instead of
+# `eventID`). The NPE is only kept for looking at (the cuts and the plots use
+# `EDep_MeV`), so 7 digits are plenty.
+CUT_COLUMNS = {
+    'uniqueEventID': 'int64',
+    'copyNo': 'int16',
+    'EDep_MeV': 'float64',
+    'hitTime_ns': 'float64',
+    'equivalentNPE': 'float32',
+    'layerNo': 'int8',
+}
+
+# `uniqueEventID` = `EVENTS_PER_FILE` * (index of the file) + `eventID`.
+EVENTS_PER_FILE = 10**9
+
+# The names of the cosmicdirs (exactly: not e.g. the cosmicdir0.tmp of an
+# older step-2/use_rootaway.py that was stopped).
+COSMICDIR = re.compile(r'cosmicdir\d+')
+
+# File names to look for in a cosmicdir, in order of preference.
+FILENAMES = ('ScintRHits.parquet', 'ScintRHits.csv')
+
+PARQUET_COMPRESSION = 'zstd'
+# Rows per Parquet row group. (A row group is the smallest piece of a Parquet
+# file that can be read, so this also limits how small chunks can be.)
+ROW_GROUP_SIZE = 250_000
+
+# Default number of rows (hits) per chunk for `iter_event_chunks`.
+CHUNKSIZE = 1_000_000
+
+# Parquet metadata key for the order of the hits in the file: b'eventID,copyNo'
+# if they are sorted by `eventID` and then `copyNo` (see external_sort.py).
+SORTED_KEY = b'sorted'
+SORTED_BY = b'eventID,copyNo'
+
+
+def read_hits(path, columns=COLUMNS):
+    """Read the `columns` of a ScintRHits.parquet or ScintRHits.csv file into
+    a `DataFrame` with the dtypes given in `columns`.
+
+    :param columns: `dict` of column names to dtypes.
+    """
+    if path.endswith('.parquet'):
+        df = pd.read_parquet(path, columns=list(columns))
+        return df.astype(columns, copy=False)
+
+    return pd.read_csv(path, usecols=list(columns), dtype=columns)[list(columns)]
+
+
+def read_cut_hits(path):
+    """Read cut hits (e.g. cut_ScintRHits.csv from `cuts.process_folder`) into
+    a `DataFrame` with the dtypes in `CUT_COLUMNS`."""
+    if path.endswith('.parquet'):
+        return pd.read_parquet(path).astype(CUT_COLUMNS, copy=False)
+
+    return pd.read_csv(path, dtype=CUT_COLUMNS)
+
+
+def unique_eventID(file_index, eventID):
+    """Return the 64-bit key of each event, to differentiate between equal
+    `eventID`s from different files (see `EVENTS_PER_FILE`)."""
+    return EVENTS_PER_FILE * np.int64(file_index) + np.asarray(eventID, dtype=np.int64)
+
+
+def iter_event_chunks(path, chunksize=CHUNKSIZE, columns=COLUMNS):
+    """Read a ScintRHits file (like `read_hits`) about `chunksize` hits at a
+    time, without ever splitting an event between two chunks.
+
+    This only works if the hits of each event are next to each other in the
+    file, in order of `eventID` (which is how rootaway and convert.py write
+    them, and how `external_sort.sort_hits_file` rewrites any other file).
+    Otherwise, a `ValueError` is raised. (Files marked as sorted (see
+    `is_sorted_file`) aren't checked.)
+
+    :return: Generator of `DataFrame`s.
+    """
+    check_order = not is_sorted_file(path)
+    if path.endswith('.parquet'):
+        batches = pq.ParquetFile(path).iter_batches(batch_size=chunksize,
+                                                    columns=list(columns))
+        chunks = (batch.to_pandas().astype(columns, copy=False) for batch in batches)
+    else:
+        chunks = pd.read_csv(path, usecols=list(columns), dtype=columns,
+                             chunksize=chunksize)
+
+    # The hits of the last event in each chunk might continue in the next
+    # chunk, so hold them back until the next chunk is read.
+    leftover = None
+    for chunk in chunks:
+        chunk = chunk[list(columns)]
+        if leftover is not None:
+            chunk = pd.concat([leftover, chunk], ignore_index=True)
+
+        eventID = chunk.eventID.to_numpy()
+        if check_order and (np.diff(eventID) < 0).any():
+            raise ValueError(f"The hits in {path} are not in order of eventID, "
+                             f"so they can't be read in chunks. (Sort them with "
+                             f"`external_sort.sort_hits_file` first.)")
+
+        last_event_start = np.searchsorted(eventID, eventID[-1])
+        leftover = chunk.iloc[last_event_start:]
+        if last_event_start:
+            yield chunk.iloc[:last_event_start]
+
+    if leftover is not None:
+        yield leftover
+
+
+def write_hits(df, path):
+    """Write the hits in `df` to a compressed Parquet file.
+
+    Only the columns in `COLUMNS` are written. The file is written next to
+    `path` first and then renamed, so a run that is killed part way through
+    never leaves a half-written file behind at `path`.
+    """
+    df = df[list(COLUMNS)].astype(COLUMNS, copy=False)
+
+    temp_path = path + '.tmp'
+    df.to_parquet(temp_path, index=False, compression=PARQUET_COMPRESSION,
+                  row_group_size=ROW_GROUP_SIZE)
+    os.replace(temp_path, path)
+
+
+def write_hit_batches(batches, path, metadata=None):
+    """Like `write_hits`, but for an iterable of `DataFrame`s (e.g. events
+    read from a ROOT file a batch at a time), so only one batch is in memory
+    at a time.
+
+    :param metadata: `dict` to add to the Parquet metadata (e.g.
+    `{SORTED_KEY: SORTED_BY}`).
+    """
+    schema = pa.Schema.from_pandas(
+        pd.DataFrame({name: pd.Series(dtype=dtype) for name, dtype in COLUMNS.items()}),
+        preserve_index=False)
+    if metadata:
+        schema = schema.with_metadata({**schema.metadata, **metadata})
+
+    temp_path = path + '.tmp'
+    with pq.ParquetWriter(temp_path, schema, compression=PARQUET_COMPRESSION) as writer:
+        for df in batches:
+            df = df[list(COLUMNS)].astype(COLUMNS, copy=False)
+            writer.write_table(pa.Table.from_pandas(df, schema=schema, preserve_index=False),
+                               row_group_size=ROW_GROUP_SIZE)
+    os.replace(temp_path, path)
+
+
+def is_sorted_file(path):
+    """Return whether the hits file at `path` is marked as sorted by `eventID`
+    and then `copyNo` (in its Parquet metadata: see `SORTED_KEY`). CSV files
+    never are."""
+    if not path.endswith('.parquet'):
+        return False
+    metadata = pq.read_schema(path).metadata or {}
+    return metadata.get(SORTED_KEY) == SORTED_BY
+
+
+def find_cosmicdirs(folder):
+    """Return the sorted names of the cosmicdirs (see `COSMICDIR`) in
+    `folder`."""
+    return sorted(subfolder for subfolder in next(os.walk(folder))[1]
+                  if COSMICDIR.fullmatch(subfolder))
+
+
+def find_hits_file(folder):
+    """Return the path of the ScintRHits file in the cosmicdir `folder`
+    (preferring Parquet over CSV), or `None` if there isn't one."""
+    for filename in FILENAMES:
+        path = os.path.join(folder, filename)
+        if os.path.exists(path):
+            return path
+
+    return None
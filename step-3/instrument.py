@@ -0,0 +1,258 @@
+"""Per-stage instrumentation: wall and CPU time, rows in and out, bytes read
+and peak RSS of every stage of the pipeline (reading, aggregating, each cut,
+filling histograms, ...), in every worker, saved as a run report with one
+JSON object per line.
+
+Example:
+    set_report('run_report.jsonl')
+    with stage('read', file=path) as this_stage:
+        hits = read_hits(path)
+        this_stage.rows_out = len(hits)
+    print(report_summary(read_report('run_report.jsonl')))
+
+Stages can be nested. Nested stages inherit the information of the stages
+around them (e.g. the `file`), so every record of a cut says which file it was
+for. `cuts.process_folder` writes run_report.jsonl next to the cut hits (and
+prints a summary at the end), and convert.py writes conversion_report.jsonl.
+
+Each record has:
+ - `stage`, and the information given to `stage` (e.g. `file`, `cut`),
+ - `depth`: how many stages it is inside of,
+ - `pid` of the worker, and `start` (Unix time),
+ - `wall_s` and `cpu_s` (CPU time of the worker),
+ - `rows_in` and `rows_out` (if the stage sets them),
+ - `bytes_read`: bytes read by the worker during the stage (from
+ /proc/self/io, so it includes reads from the page cache),
+ - `peak_rss_MB`: peak RSS of the worker since the start of the outermost
+ stage that it's in (Linux only),
+ - `error`: the type of the exception, if the stage failed.
+
+Without a report (`set_report(None)`, the default), stages are still timed,
+but nothing is written.
+
+Created 18 October 2026.
+"""
+import json
+import os
+import time
+
+import pandas as pd
+
+# Where records are written (see `set_report`). Each process has its own.
+_report_path = None
+# Information of the stages that are running, outermost first.
+_stack = []
+
+
+def set_report(path):
+    """Append the records of all stages (in this process) to the JSON lines
+    file at `path` (or don't save them, if `None`).
+
+    Also give this to `multiprocessing.Pool` as the `initializer` (with
+    `initargs=(path,)`), so that the workers write to the same file."""
+    global _report_path
+    _report_path = path
+
+
+def reset_peak_rss():
+    """Reset the peak RSS of this process (Linux only).
+
+    `resource.getrusage` can't be used for this: a forked (or spawned)
+    process starts off with the peak RSS of its parent."""
+    with open('/proc/self/clear_refs', 'w') as f:
+        f.write('5')
+
+
+def peak_rss_MB():
+    """Return the peak RSS of this process (since the last `reset_peak_rss`)
+    in MB (Linux only)."""
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('VmHWM:'):
+                return int(line.split()[1]) / 1e3
+
+
+def bytes_read():
+    """Return the number of bytes that this process has read so far (Linux
+    only), or `None`."""
+    try:
+        with open('/proc/self/io') as f:
+            for line in f:
+                if line.startswith('rchar:'):
+                    return int(line.split()[1])
+    except OSError:
+        return None
+
+
+class Stage:
+    """One timed stage (see `stage`)."""
+
+    def __init__(self, name, **info):
+        self.name = name
+        self.info = info
+        # Set these inside the `with` block.
+        self.rows_in = None
+        self.rows_out = None
+        self.record = None
+
+    def __enter__(self):
+        if not _stack:
+            try:
+                reset_peak_rss()
+            except OSError:
+                pass
+        self._inherited = _stack[-1] if _stack else {}
+        _stack.append({**self._inherited, **self.info})
+
+        self._start = time.time()
+        self._bytes = bytes_read()
+        self._cpu = time.process_time()
+        self._wall = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        wall_s = time.perf_counter() - self._wall
+        cpu_s = time.process_time() - self._cpu
+        end_bytes = bytes_read()
+        info = _stack.pop()
+
+        try:
+            peak_MB = peak_rss_MB()
+        except OSError:
+            peak_MB = None
+
+        self.record = {
+            'stage': self.name,
+            **info,
+            'depth': len(_stack),
+            'pid': os.getpid(),
+            'start': self._start,
+            'wall_s': wall_s,
+            'cpu_s': cpu_s,
+            'rows_in': self.rows_in,
+            'rows_out': self.rows_out,
+            'bytes_read': (end_bytes - self._bytes
+                           if end_bytes is not None and self._bytes is not None else None),
+            'peak_rss_MB': peak_MB,
+        }
+        if exc_type is not None:
+            self.record['error'] = exc_type.__name__
+
+        write_record(self.record)
+        # (Don't hide any exception.)
+        return False
+
+
+def stage(name, **info):
+    """Time the stage `name` in a `with` block: `with stage('read', file=path)
+    as this_stage: ...`. Set `this_stage.rows_in` and `this_stage.rows_out`
+    inside the block.
+
+    :param info: Extra information to save in the record (and in the records
+    of the stages inside this one), e.g. `file` or `cut`. Must be JSON
+    serializable.
+    """
+    return Stage(name, **info)
+
+
+_END = object()
+
+
+def timed_iter(name, iterable, count=len, **info):
+    """Yield the items of `iterable`, timing how long it takes to get each
+    one as a stage `name` (with `rows_out` = `count(item)`, by default the
+    length of the item), e.g. for reading a file in chunks.
+
+    :param info: See `stage`.
+    """
+    iterator = iter(iterable)
+    while True:
+        with stage(name, **info) as this_stage:
+            item = next(iterator, _END)
+            if item is not _END:
+                this_stage.rows_out = count(item)
+        if item is _END:
+            return
+        yield item
+
+
+def write_record(record):
+    """Append the `record` (a `dict`) to the report, if there is one.
+
+    (Each record is written with one `write` to a file opened for appending,
+    so records from different workers don't get mixed up.)"""
+    if _report_path is None:
+        return
+    with open(_report_path, 'a') as f:
+        f.write(json.dumps(record, default=str) + '\n')
+
+
+def read_report(path):
+    """Read a run report into a `DataFrame` (one row per record)."""
+    with open(path) as f:
+        return pd.DataFrame([json.loads(line) for line in f if line.strip()])
+
+
+def report_summary(report, by='stage'):
+    """Return a `DataFrame` with the number of records, the total wall and
+    CPU time, rows in and out and bytes read, and the largest peak RSS, for
+    each stage (or each value of the columns `by`, e.g. `['stage', 'cut']`)
+    in the `report` (from `read_report`), slowest first."""
+    if len(report) == 0:
+        return pd.DataFrame()
+    summary = report.groupby(by, dropna=False).agg(
+        records=('wall_s', 'size'),
+        wall_s=('wall_s', 'sum'),
+        cpu_s=('cpu_s', 'sum'),
+        rows_in=('rows_in', 'sum'),
+        rows_out=('rows_out', 'sum'),
+        bytes_read=('bytes_read', 'sum'),
+        peak_rss_MB=('peak_rss_MB', 'max'),
+    )
+    return summary.sort_values('wall_s', ascending=False)
+
+
+def slowest(report, name, n=5, by='file'):
+    """Return the `n` slowest of the stage `name` in the `report` (e.g.
+    `slowest(report, 'process_file')` for the slowest files), with the total
+    wall time for each value of `by`."""
+    records = report[report.stage == name]
+    if len(records) == 0:
+        return pd.DataFrame()
+    return report_summary(records, by).head(n)
+
+
+def summary_records(report):
+    """Return the aggregate summary of the `report` (see `report_summary`) as
+    records for the end of a run report: one per stage (with
+    `'stage': 'summary'` and the summarized stage as `of`), and one per cut."""
+    records = []
+    for of, row in report_summary(report[report.stage != 'cut']).iterrows():
+        records.append({'stage': 'summary', 'of': of, **row.to_dict()})
+    cuts = report[report.stage == 'cut']
+    if len(cuts):
+        for cut, row in report_summary(cuts, by='cut').iterrows():
+            records.append({'stage': 'summary', 'of': 'cut', 'cut': cut, **row.to_dict()})
+    return records
+
+
+def finish_report(path, file_stage='process_file'):
+    """Append the aggregate summary (see `summary_records`) to the run report
+    at `path`, print it, and print the slowest files (the slowest records of
+    the stage `file_stage`) and cuts."""
+    report = read_report(path)
+    if len(report) == 0:
+        return
+
+    for record in summary_records(report):
+        with open(path, 'a') as f:
+            f.write(json.dumps(record, default=str) + '\n')
+
+    print(f"Run report (saved in {path}):")
+    print(report_summary(report[report.stage != 'cut']).to_string())
+    if 'cut' in report:
+        print(report_summary(report[report.stage == 'cut'], by='cut').to_string())
+    if 'file' in report and (report.stage == file_stage).any():
+        print("Slowest files:")
+        print(slowest(report, file_stage)[['wall_s', 'rows_in', 'rows_out',
+                                           'peak_rss_MB']].to_string())
@@ -0,0 +1,107 @@
+"""Memoized analysis steps, so that rerunning analysis.py after changing the
+style of a plot doesn't read and parse cut_ScintRHits_v2.csv (or redo the
+per-event calculations) again.
+
+`AnalysisCache.call(function, path, **params)` returns `function(path,
+**params)`, saved in `folder` the first time and loaded from there after
+that. Each result is keyed by:
+ - the input file at `path` (its path, size and modification time, like in
+ cache.py),
+ - the `params`, and
+ - the source code of `function` and of the `modules` that it uses (not of
+ the whole script, so changing a plot doesn't throw the results away), and
+ - the contents of any other `files` that it uses (e.g. calibration.json).
+
+Results are pickled (a fast binary format for `DataFrame`s, `Series` and
+histograms: loading one takes about as long as copying it into memory). When
+the cache gets bigger than `max_MB`, the least recently used results are
+deleted.
+
+Example:
+    memo = AnalysisCache('.analysis_cache')
+    NPE_ratio, delta_t_max = memo.call(plot_data_from_file, 'cut_ScintRHits_v2.csv',
+                                       modules=(features, timing))
+
+Created 18 October 2026.
+"""
+import hashlib
+import inspect
+import os
+import pickle
+
+from cache import file_identity
+
+# Default maximum size of the cache.
+MAX_MB = 2000
+
+
+class AnalysisCache:
+    """Results of analysis steps, saved in `folder`."""
+
+    def __init__(self, folder='.analysis_cache', max_MB=MAX_MB):
+        self.folder = folder
+        self.max_MB = max_MB
+        os.makedirs(folder, exist_ok=True)
+
+    def _entry_path(self, function, path, modules, files, params):
+        h = hashlib.sha256(f"{function.__module__}.{function.__qualname__}".encode())
+        h.update(inspect.getsource(function).encode())
+        for module in modules:
+            h.update(inspect.getsource(module).encode())
+        for file in files:
+            with open(file, 'rb') as f:
+                h.update(f.read())
+        h.update(f"{file_identity(path)}|{sorted(params.items())!r}".encode())
+        return os.path.join(self.folder, h.hexdigest() + '.pickle')
+
+    def call(self, function, path, modules=(), files=(), **params):
+        """Return `function(path, **params)`, from the cache if it's there
+        (and otherwise, save it there).
+
+        :param path: The input file.
+        :param modules: The modules whose code `function` uses (e.g.
+        `features`), so that the result is made again if they change.
+        :param files: Other files that `function` uses (e.g. calibration.json),
+        so that the result is made again if they change.
+        """
+        entry = self._entry_path(function, path, modules, files, params)
+
+        if os.path.exists(entry):
+            with open(entry, 'rb') as f:
+                result = pickle.load(f)
+            # (For least recently used eviction.)
+            os.utime(entry)
+            print(f"Loaded {function.__name__}({path!r}) from {self.folder}.")
+            return result
+
+        result = function(path, **params)
+
+        with open(entry + '.tmp', 'wb') as f:
+            pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(entry + '.tmp', entry)
+        self.evict()
+
+        return result
+
+    def evict(self):
+        """Delete the least recently used results until the cache is no
+        bigger than `max_MB`."""
+        entries = []
+        for name in os.listdir(self.folder):
+            if name.endswith('.pickle'):
+                stat = os.stat(os.path.join(self.folder, name))
+                entries.append((stat.st_mtime, stat.st_size, name))
+
+        total = sum(size for _, size, _ in entries)
+        # Oldest first.
+        for _, size, name in sorted(entries):
+            if total <= self.max_MB * 1e6:
+                break
+            os.remove(os.path.join(self.folder, name))
+            total -= size
+
+    def clear(self):
+        """Delete all of the results."""
+        for name in os.listdir(self.folder):
+            if name.endswith('.pickle'):
+                os.remove(os.path.join(self.folder, name))
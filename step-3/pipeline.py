@@ -0,0 +1,284 @@
+"""Pipelined conversion and cuts: each cosmicdir goes through convert → cut
+(with the plot histograms and event summary: see `cuts.process_file`) →
+collect on its own, so one file is cut while the next one is converted,
+instead of converting every file (convert.py or step-2/use_rootaway.py) before
+`cuts.process_folder` even starts.
+
+Each stage has its own pool of processes (`convert_processes` and
+`cut_processes`), and there is a bounded queue between convert and cut: at
+most `queue_size` files are converted (or being converted) ahead of the cut
+stage, so the converted files don't pile up (e.g. if the cuts are slower than
+the conversion) and the cut workers always have a file ready. The cut results
+are collected here, as soon as each file is done, like in
+`cuts.process_folder`.
+
+The state of every file (see `STATES`) is printed whenever it changes, and
+saved in progress.json in the output folder, so the run can be watched from
+another terminal (e.g. `watch cat progress.json`).
+
+The outputs (in the output folder) are the same as the ones of
+`cuts.process_folder`, and so is the run report (with the 'convert' stages
+too: see instrument.py). Each file's `uniqueEventID`s only depend on its
+place in the sorted list of cosmicdirs in the input folder (the same as in
+`cuts.process_folder`, once all of them are converted).
+
+Example:
+    # ROOT files to cut hits, 2 files converting and 6 being cut at a time.
+    run_pipeline(input_folder, output_folder, convert_processes=2, cut_processes=6)
+
+    # Or from the ScintRHits.csv files that rootaway made.
+    run_pipeline(input_folder, output_folder, convert=convert_csv_file)
+
+Created 18 October 2026.
+"""
+from collections import Counter, deque
+from datetime import datetime
+import json
+import os
+import multiprocessing
+import queue
+import time
+import traceback
+
+from convert import convert_file, input_folder, output_folder
+from cache import ResultCache, cut_config_hash
+from cutflow import SIGNAL_LIKE
+from cuts import (CUT_MODULES, CUT_FILES, ResultCollector, write_folder_outputs,
+                  load_cut_order, _process_file_or_error)
+from hits import find_cosmicdirs
+from instrument import stage, set_report, finish_report
+
+# The states of a file in the pipeline, in order.
+STATES = ('waiting', 'converting', 'queued', 'cutting', 'done', 'failed')
+
+
+class Progress:
+    """The state (see `STATES`) of every file in the pipeline, printed (and
+    saved in a JSON file) whenever it changes."""
+
+    def __init__(self, names, path=None):
+        """
+        :param names: The names of the files (e.g. the cosmicdirs).
+        :param path: Where to save the progress, or `None` to only print it.
+        """
+        self.states = dict.fromkeys(names, 'waiting')
+        self.path = path
+        self._start = time.perf_counter()
+
+    def set(self, name, state):
+        """Set the state of the file `name`, and show the progress."""
+        self.states[name] = state
+        self.show()
+
+    def counts(self):
+        """Return the number of files in each state."""
+        counts = dict.fromkeys(STATES, 0)
+        counts.update(Counter(self.states.values()))
+        return counts
+
+    def show(self):
+        counts = self.counts()
+        elapsed_s = time.perf_counter() - self._start
+        print(f"[{elapsed_s:8.1f} s] " + ", ".join(f"{number} {state}"
+                                                  for state, number in counts.items()))
+
+        if self.path:
+            with open(self.path + '.tmp', 'w') as f:
+                json.dump({'elapsed_s': elapsed_s, 'counts': counts, 'files': self.states},
+                          f, indent=1)
+            os.replace(self.path + '.tmp', self.path)
+
+
+def _convert_or_error(task):
+    """Run the `convert` function for one (subfolder, convert, input_folder,
+    output_folder) `task`, and return the subfolder, the path of the hits file
+    and the error (a traceback `str`, if the conversion failed).
+    This function is given to `multiprocessing`."""
+    subfolder, convert, input_folder, output_folder = task
+    try:
+        path = convert(subfolder, input_folder, output_folder)
+    except Exception:
+        return subfolder, None, traceback.format_exc()
+    return subfolder, path, None
+
+
+def _submit(pool, function, task, kind, subfolder, events):
+    """Run `function(task)` in the `pool`, and put (`kind`, `subfolder`, the
+    result) in `events` when it's done (with the error as the result, if it
+    couldn't even be run)."""
+    pool.apply_async(function, (task,),
+                     callback=lambda result: events.put((kind, subfolder, result)),
+                     error_callback=lambda error: events.put((kind, subfolder, error)))
+
+
+def run_pipeline(
+    input_folder=input_folder,
+    output_folder=output_folder,
+    convert=convert_file,
+    convert_processes=None,
+    cut_processes=None,
+    queue_size=None,
+    save='cut_ScintRHits.csv',
+    chunksize=None,
+    cut_flow=SIGNAL_LIKE,
+    cache=True,
+    retries=1,
+    seed=0,
+    report='run_report.jsonl'
+):
+    """Convert and cut every cosmicdir in `input_folder`, with the stages
+    overlapping (see above), and save the outputs of `cuts.process_folder` in
+    `output_folder`.
+
+    Files that are already converted are not converted again (see
+    convert.py), and files whose cut results are in the cache (see cache.py)
+    are not cut again. Files that fail to be cut are tried again (`retries`
+    times); files that fail to be converted are not. Either way, they are
+    left out, printed, and listed in failed_files.txt.
+
+    :param convert: The function that converts one cosmicdir:
+    `convert(subfolder, input_folder, output_folder)` returns the path of the
+    hits file (e.g. `convert.convert_file` or `convert.convert_csv_file`).
+    :param convert_processes: Number of files converted at a time (by
+    default, one per available core).
+    :param cut_processes: Number of files cut at a time (by default, one per
+    available core).
+    :param queue_size: The most files that can be converted (or converting)
+    ahead of the cut stage. By default, `convert_processes` +
+    `cut_processes`.
+    :param report: See `cuts.process_folder`.
+    :return: The total number of events before any cuts, the
+    `cutflow.CutFlowCounts`, and the plot histograms, like
+    `cuts.process_folder` (but not the cut hits: they are saved in `save`).
+
+    Other parameters: see `cuts.process_folder`.
+    """
+    if not os.path.exists(output_folder):
+        raise ValueError(f"Sorry, but the output folder has to exist. The output folder given was: {output_folder}")
+
+    print(f"Starting at: {datetime.now()}")
+
+    num_cores = len(os.sched_getaffinity(0))
+    convert_processes = convert_processes or num_cores
+    cut_processes = cut_processes or num_cores
+    queue_size = queue_size or convert_processes + cut_processes
+    print(f"{convert_processes} convert process(es), {cut_processes} cut process(es), "
+          f"and up to {queue_size} file(s) converted ahead")
+
+    # (Sorted, so that each file gets the same `uniqueEventID`s every time.)
+    subfolders = find_cosmicdirs(input_folder)
+    file_index = {subfolder: i for i, subfolder in enumerate(subfolders)}
+    paths = {}
+
+    report_path = os.path.join(output_folder, report) if report else None
+    if report_path and os.path.exists(report_path):
+        # (See `cuts.process_folder`.)
+        cut_flow = cut_flow.ordered(**load_cut_order(output_folder, cut_flow, report))
+        os.remove(report_path)
+    set_report(report_path)
+
+    collector = ResultCollector(os.path.join(output_folder, save) if save else None)
+    need_hits = bool(save)
+    result_cache = None
+    if cache:
+        result_cache = ResultCache(os.path.join(output_folder, '.cut_cache'),
+                                   cut_config_hash(cut_flow, CUT_MODULES, seed, CUT_FILES))
+
+    progress = Progress(subfolders, os.path.join(output_folder, 'progress.json'))
+    errors = {}
+    failed_attempts = Counter()
+
+    # The bounded queue between the stages is `queued` (and the number of
+    # files `converting`): nothing more is converted while it's full.
+    waiting = deque(subfolders)
+    queued = deque()
+    converting = 0
+    cutting = 0
+    # The results of both pools, as they finish.
+    events = queue.Queue()
+
+    with multiprocessing.Pool(convert_processes, initializer=set_report,
+                              initargs=(report_path,)) as convert_pool, \
+            multiprocessing.Pool(cut_processes, initializer=set_report,
+                                 initargs=(report_path,)) as cut_pool:
+        while waiting or queued or converting or cutting:
+            while (waiting and converting < convert_processes
+                   and converting + len(queued) < queue_size):
+                subfolder = waiting.popleft()
+                _submit(convert_pool, _convert_or_error,
+                        (subfolder, convert, input_folder, output_folder),
+                        'convert', subfolder, events)
+                converting += 1
+                progress.set(subfolder, 'converting')
+
+            while queued and cutting < cut_processes:
+                subfolder = queued.popleft()
+                _submit(cut_pool, _process_file_or_error,
+                        (file_index[subfolder], paths[subfolder], chunksize, cut_flow, seed,
+                         result_cache, need_hits),
+                        'cut', subfolder, events)
+                cutting += 1
+                progress.set(subfolder, 'cutting')
+
+            kind, subfolder, result = events.get()
+            if isinstance(result, BaseException):
+                result = (None, None, ''.join(traceback.format_exception(result)))
+
+            if kind == 'convert':
+                converting -= 1
+                _, path, error = result
+                if error is not None:
+                    print(f"Failed to convert {subfolder}:\n{error}")
+                    errors[os.path.join(input_folder, subfolder)] = error
+                    progress.set(subfolder, 'failed')
+                    continue
+
+                paths[subfolder] = path
+                cached = None
+                if result_cache is not None:
+                    with stage('cache_get', file=path):
+                        cached = result_cache.get(path, hits=need_hits)
+                if cached is not None:
+                    collector.add(file_index[subfolder], cached)
+                    progress.set(subfolder, 'done')
+                else:
+                    queued.append(subfolder)
+                    progress.set(subfolder, 'queued')
+
+            else:
+                cutting -= 1
+                _, cut_result, error = result
+                if error is None:
+                    collector.add(file_index[subfolder], cut_result)
+                    progress.set(subfolder, 'done')
+                elif failed_attempts[subfolder] < retries:
+                    failed_attempts[subfolder] += 1
+                    print(f"Failed to process {paths[subfolder]}, trying again "
+                          f"(retry {failed_attempts[subfolder]} of {retries}):\n{error}")
+                    queued.append(subfolder)
+                    progress.set(subfolder, 'queued')
+                else:
+                    print(f"Failed to process {paths[subfolder]}:\n{error}")
+                    errors[paths[subfolder]] = error
+                    progress.set(subfolder, 'failed')
+
+    if result_cache is not None:
+        result_cache.report()
+
+    # (Files that were never converted keep their place in the list, so that
+    # the `file` numbers in the event summary still match.)
+    filepaths = [paths.get(subfolder, os.path.join(output_folder, subfolder))
+                 for subfolder in subfolders]
+    write_folder_outputs(output_folder, collector, filepaths, errors)
+
+    if report_path:
+        set_report(None)
+        finish_report(report_path)
+
+    print(f"Ending at: {datetime.now()}")
+
+    return collector.num_events_before_cuts, collector.counts, collector.histograms
+
+
+if __name__ == '__main__':
+    run_pipeline()
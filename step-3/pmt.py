@@ -0,0 +1,166 @@
+"""The measured NPE of each slab hit, from the PMT hits of the withPhotons
+samples (one PMTHits row per photoelectron), to cut on instead of the
+energy-based `EDep_MeV / MEV_PER_PE`.
+
+ - `count_PMT_hits`: the number of hits of each (event, PMT), from one sort
+ of a packed 64-bit key and the lengths of its runs (no `groupby`).
+ - `pair_PMTs`: the two PMTs of each slab (PMT_number 2*slab and 2*slab + 1:
+ see geometry.py) added up, in order of `eventID` and then `copyNo` (like
+ `cuts.aggregate_slab_hits`).
+ - `join_slab_NPE`: the NPE joined onto the aggregated slab hits, with a
+ binary search of one sorted key in the other (`segments.sort_key`). Slab
+ hits without any PMT hits get 0.
+
+convert.py (`convert_file(..., PMT_NPE=True)`) saves the NPE of each slab in
+each event in PMTNPE.parquet (next to ScintRHits.parquet), one batch of events
+at a time, so the (huge) PMT hits are never all in memory, and never written.
+`cuts.process_file` joins them on (for each chunk, reading only the events of
+that chunk) when the cuts use the `NPE` column (e.g. `cutflow.SIGNAL_LIKE_PMT`).
+
+Example:
+    slab_NPE = pair_PMTs(count_PMT_hits(batch['PMTHits']))
+    slab_hits = join_slab_NPE(aggregate_slab_hits(batch['ScintRHits']), slab_NPE)
+
+Created 18 October 2026.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from geometry import LAYOUT
+from hits import PARQUET_COMPRESSION, ROW_GROUP_SIZE
+from segments import sort_key, segment_starts, segment_sizes, segment_reduce
+
+# The file that convert.py writes the NPE of each slab to.
+FILENAME = 'PMTNPE.parquet'
+
+# The columns (and dtypes) of the NPE of each slab.
+SLAB_NPE_COLUMNS = {'eventID': 'int32', 'copyNo': 'int16', 'NPE': 'int32'}
+
+# Events per batch when reading the PMT hits (about 1600 per slab hit, so many
+# fewer events than `events.EVENTS_PER_BATCH` fit in memory).
+EVENTS_PER_BATCH = 2_000
+
+# `PMT_number` is in the lower bits of the (event, PMT) key.
+PMT_BITS = 16
+
+
+def count_PMT_hits(PMT_hits):
+    """Return the number of hits (`num_hits`) of each (`eventID`,
+    `PMT_number`) in the `PMT_hits` (`DataFrame`, like from
+    `events.RootEventSource.iter_batches`), in order of `eventID` and then
+    `PMT_number`."""
+    key = np.sort((PMT_hits.eventID.to_numpy().astype(np.int64) << PMT_BITS)
+                  | PMT_hits.PMT_number.to_numpy().astype(np.int64))
+    starts = segment_starts(key)
+    num_hits = segment_sizes(starts, len(key))
+    key = key[starts]
+
+    return pd.DataFrame({
+        'eventID': (key >> PMT_BITS).astype(np.int32),
+        'PMT_number': (key & (2**PMT_BITS - 1)).astype(np.int32),
+        'num_hits': num_hits,
+    })
+
+
+def pair_PMTs(PMT_counts):
+    """Add up the hits of the two PMTs of each slab, from the `PMT_counts`
+    (from `count_PMT_hits`).
+
+    :return: `DataFrame` with the `SLAB_NPE_COLUMNS`, in order of `eventID`
+    and then `copyNo`.
+    """
+    eventID = PMT_counts.eventID.to_numpy()
+    slab = PMT_counts.PMT_number.to_numpy() // 2
+    # (Still sorted: pairs of PMTs are next to each other.)
+    starts = segment_starts(eventID, slab)
+
+    return pd.DataFrame({
+        'eventID': eventID[starts],
+        'copyNo': LAYOUT.copyNo[slab[starts]],
+        'NPE': segment_reduce(np.add, PMT_counts.num_hits.to_numpy(), starts),
+    }).astype(SLAB_NPE_COLUMNS)
+
+
+def slab_NPE(PMT_hits):
+    """Return the NPE of each slab in each event (see `pair_PMTs`) from the
+    `PMT_hits`."""
+    return pair_PMTs(count_PMT_hits(PMT_hits))
+
+
+def join_slab_NPE(s, slab_NPE):
+    """Add the `NPE` column (from `slab_NPE`) to the aggregated slab hits `s`
+    (in order of `eventID` and then `copyNo`, like from
+    `cuts.aggregate_slab_hits`). Slab hits without any PMT hits get 0."""
+    hit_key = sort_key(s.eventID.to_numpy(), s.copyNo.to_numpy())
+    NPE_key = sort_key(slab_NPE.eventID.to_numpy(), slab_NPE.copyNo.to_numpy())
+
+    # (Both keys are sorted, so this is a merge.)
+    position = np.searchsorted(NPE_key, hit_key)
+    found = position < len(NPE_key)
+    found[found] = NPE_key[position[found]] == hit_key[found]
+
+    NPE = np.zeros(len(s), dtype=SLAB_NPE_COLUMNS['NPE'])
+    NPE[found] = slab_NPE.NPE.to_numpy()[position[found]]
+    s['NPE'] = NPE
+    return s
+
+
+def find_slab_NPE_file(hits_path):
+    """Return the path of the PMTNPE.parquet file next to the hits file at
+    `hits_path`."""
+    return os.path.join(os.path.dirname(hits_path), FILENAME)
+
+
+def read_slab_NPE(path, first_eventID=None, last_eventID=None):
+    """Read the NPE of each slab (saved by `SlabNPEWriter`), only for the
+    events from `first_eventID` to `last_eventID` (if given). (The file is in
+    order of `eventID`, so only the row groups with those events are read.)"""
+    filters = []
+    if first_eventID is not None:
+        filters.append(('eventID', '>=', first_eventID))
+    if last_eventID is not None:
+        filters.append(('eventID', '<=', last_eventID))
+    slab_NPE = pd.read_parquet(path, filters=filters or None)
+    return slab_NPE.astype(SLAB_NPE_COLUMNS, copy=False)
+
+
+class SlabNPEWriter:
+    """Write the NPE of each slab (from `slab_NPE`) to a Parquet file, a batch
+    of events at a time, in order of `eventID`. Like `hits.write_hit_batches`,
+    the file is written next to `path` and only renamed into place when it's
+    complete.
+
+    Example:
+        with SlabNPEWriter(path) as writer:
+            for batch in source.iter_batches():
+                writer.write(slab_NPE(batch['PMTHits']))
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._schema = pa.Schema.from_pandas(
+            pd.DataFrame({name: pd.Series(dtype=dtype)
+                          for name, dtype in SLAB_NPE_COLUMNS.items()}),
+            preserve_index=False)
+
+    def __enter__(self):
+        self._writer = pq.ParquetWriter(self.path + '.tmp', self._schema,
+                                        compression=PARQUET_COMPRESSION)
+        return self
+
+    def write(self, slab_NPE):
+        self._writer.write_table(pa.Table.from_pandas(slab_NPE, schema=self._schema,
+                                                      preserve_index=False),
+                                 row_group_size=ROW_GROUP_SIZE)
+
+    def __exit__(self, exc_type, exc, traceback):
+        self._writer.close()
+        if exc_type is None:
+            os.replace(self.path + '.tmp', self.path)
+        else:
+            os.remove(self.path + '.tmp')
+        return False
@@ -0,0 +1,130 @@
+"""Render many variants of the plots in analysis.py (bin sizes, error bar
+styles and colors) at once, in a pool of processes.
+
+Each variable is only filled once, with fine bins (see `features.FILL_BINS`,
+and plot_histograms.json from `cuts.process_folder`), and each variant's
+binning is made by merging those bins (see `histograms.Histogram.rebin_to`),
+so the cut hits are never read again, whatever the bin size. (This replaces
+running analysis.py again for each of the plots in different-bin-sizes and
+CRC-error-bars.)
+
+Only the (small) histograms are sent to the workers, and matplotlib is only
+imported in the workers.
+
+Created 18 October 2026.
+"""
+from datetime import datetime
+import os
+import multiprocessing
+
+from features import PLOT_BINS
+from histograms import read_histograms
+
+# The function in analysis.py that plots each variable, and its default
+# color (see `Variant`).
+PLOTS = {
+    'NPE': ('plot_NPE', 'tab:red'),
+    'delta_t_max': ('plot_delta_t_max', 'tab:orange'),
+    'NPE_ratio': ('plot_NPE_ratio', 'tab:green'),
+}
+
+
+class Variant:
+    """One plot of one variable (see `PLOTS`), with a bin size, an error bar
+    style (see `analysis.histogram_with_error_bars`) and a color."""
+
+    def __init__(self, name, bin_size=None, error_bar_type='notCRC', color=None):
+        """
+        :param bin_size: By default, the one in `features.PLOT_BINS`.
+        :param color: By default, the one in `PLOTS`.
+        """
+        if name not in PLOTS:
+            raise ValueError(f"Sorry, but there is no plot for {name!r} (only {list(PLOTS)}).")
+        self.name = name
+        self.bin_size = PLOT_BINS[name][2] if bin_size is None else bin_size
+        self.error_bar_type = error_bar_type
+        self.color = PLOTS[name][1] if color is None else color
+
+    def __repr__(self):
+        return (f"Variant({self.name!r}, bin_size={self.bin_size!r}, "
+                f"error_bar_type={self.error_bar_type!r}, color={self.color!r})")
+
+    def filename(self):
+        return (f"{self.name}-bin-size-{self.bin_size:g}-{self.error_bar_type}-"
+                f"{self.color.replace(':', '-')}.png")
+
+
+# The variants that used to be made one analysis.py run at a time.
+VARIANTS = (
+    # The plots (graphs-and-data-v2).
+    Variant('NPE'),
+    Variant('delta_t_max'),
+    Variant('NPE_ratio'),
+    # different-bin-sizes: 250 NPE bins, and 25 or 100 delta_t_max bins.
+    Variant('NPE', bin_size=1/5),
+    Variant('delta_t_max', bin_size=4),
+    Variant('delta_t_max', bin_size=1),
+    # CRC-error-bars.
+    Variant('delta_t_max', error_bar_type='CRC'),
+    Variant('NPE_ratio', error_bar_type='CRC'),
+)
+
+
+def render_variant(task):
+    """Render one (`Variant`, histogram, output folder) `task` and return the
+    path of the plot.
+    This function is given to `multiprocessing`."""
+    variant, histogram, folder = task
+
+    # (Only imported here, in the workers. No display is needed to save the
+    # plots.)
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    import analysis
+
+    path = os.path.join(folder, variant.filename())
+    plot = getattr(analysis, PLOTS[variant.name][0])
+    fig = plot(histogram, bin_size=variant.bin_size, color=variant.color,
+               error_bar_type=variant.error_bar_type, path=path)
+    plt.close(fig)
+
+    if not os.path.exists(path):
+        raise ValueError(f"Sorry, but {variant!r} wasn't saved to {path}.")
+    return path
+
+
+def render_all(histograms, variants=VARIANTS, folder='renders', processes=None):
+    """Render all of the `variants` from the (fine binned) `histograms` (a
+    `dict` of name to `histograms.Histogram`, e.g. from plot_histograms.json)
+    into `folder`, in a pool of `processes` processes (by default, one per
+    available core).
+
+    Every bin size is checked before anything is rendered (see
+    `histograms.Histogram.rebin_to`).
+
+    :return: `list` of the paths of the plots (empty if there are no
+    `variants`).
+    """
+    for variant in variants:
+        histograms[variant.name].rebin_to(variant.bin_size)
+
+    os.makedirs(folder, exist_ok=True)
+    if processes is None:
+        processes = len(os.sched_getaffinity(0))
+
+    tasks = [(variant, histograms[variant.name], folder) for variant in variants]
+    if not tasks:
+        return []
+    with multiprocessing.Pool(min(processes, len(tasks))) as pool:
+        return pool.map(render_variant, tasks, chunksize=1)
+
+
+if __name__ == '__main__':
+    print(f"Starting at: {datetime.now()}")
+
+    paths = render_all(read_histograms('plot_histograms.json'))
+    for path in paths:
+        print(f"Saved {path}")
+
+    print(f"Ending at: {datetime.now()}")
@@ -0,0 +1,178 @@
+"""Scan cut thresholds: count the events that pass a cut for every threshold
+in a grid (1D curves), or every combination of thresholds for two cuts (2D
+maps), e.g. NPE max/min < r for every r, or -15 < delta_t_max < 45 for every
+window, with and without NPE max/min < r.
+
+Each scan sorts (or bins) the per-event values once and then adds up
+cumulative counts, so a grid of thousands of thresholds costs about the same
+as one pass over the events. The per-event values come from the event summary
+(see summary.py), so the hits are not needed at all. (The summary has the
+events that failed the cuts too: select the ones that passed the applied cuts
+first, with `summary.passing`.)
+
+All cuts are strict, like the cuts in cutflow.py: `below` means value <
+threshold, `above` means value > threshold, and a window means low < value <
+high. The thresholds must be in increasing order. NaNs never pass.
+
+Example:
+    summary = read_event_summary('event_summary.parquet')
+    cuts, applied_cuts = read_event_cuts('event_summary.parquet')
+    summary = passing(summary, applied_cuts, cuts)
+    ratio_curve = scan_1d(summary.NPE_ratio, np.arange(1, 30, 0.5))
+    window_map = scan_window(summary.delta_t_max, np.arange(-30, 0), np.arange(20, 60))
+
+Created 18 October 2026.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+from summary import read_event_summary, read_event_cuts, passing
+
+SIDES = ('below', 'above')
+
+
+def _check_thresholds(thresholds):
+    thresholds = np.asarray(thresholds, dtype=float)
+    if (np.diff(thresholds) < 0).any():
+        raise ValueError("Sorry, but the thresholds must be in increasing order.")
+    return thresholds
+
+
+def _check_side(side):
+    if side not in SIDES:
+        raise ValueError(f"Sorry, but `side` must be one of {SIDES}, not {side!r}.")
+
+
+def scan_1d(values, thresholds, side='below'):
+    """Return a `Series` with the number of events with value < threshold
+    (`side='below'`) or value > threshold (`side='above'`), indexed by
+    threshold."""
+    _check_side(side)
+    thresholds = _check_thresholds(thresholds)
+    values = np.sort(np.asarray(values, dtype=float))
+    # (`np.sort` puts NaNs at the end.)
+    values = values[:len(values) - np.isnan(values).sum()]
+
+    if side == 'below':
+        counts = np.searchsorted(values, thresholds, side='left')
+    else:
+        counts = len(values) - np.searchsorted(values, thresholds, side='right')
+
+    return pd.Series(counts, index=pd.Index(thresholds, name='threshold'), name='events')
+
+
+def _bin_index(values, thresholds, side):
+    """Return, for each value, the number of thresholds that it is "past"
+    (so value < thresholds[k] if the index is <= k, for `side='below'`, and
+    value > thresholds[k] if the index is > k, for `side='above'`).
+
+    NaNs get an index that never passes."""
+    values = np.asarray(values, dtype=float)
+    if side == 'below':
+        index = np.searchsorted(thresholds, values, side='right')
+        return np.where(np.isnan(values), len(thresholds), index)
+    index = np.searchsorted(thresholds, values, side='left')
+    return np.where(np.isnan(values), 0, index)
+
+
+def _cumulative_2d(x_index, x_side, num_x, y_index, y_side, num_y):
+    """Return the (num_x x num_y) array of the number of events that pass both
+    cuts, for every pair of thresholds (see `_bin_index`)."""
+    # Number of events in each cell of the grid, with one extra cell on
+    # each side for values past all of the thresholds.
+    grid = np.bincount(x_index * (num_y + 1) + y_index,
+                       minlength=(num_x + 1) * (num_y + 1)).reshape(num_x + 1, num_y + 1)
+
+    if x_side == 'below':
+        grid = np.cumsum(grid, axis=0)[:num_x]
+    else:
+        grid = np.cumsum(grid[::-1], axis=0)[::-1][1:]
+    if y_side == 'below':
+        grid = np.cumsum(grid, axis=1)[:, :num_y]
+    else:
+        grid = np.cumsum(grid[:, ::-1], axis=1)[:, ::-1][:, 1:]
+    return grid
+
+
+def scan_2d(x, x_thresholds, y, y_thresholds, x_side='below', y_side='below'):
+    """Return a `DataFrame` with the number of events that pass both the cut
+    on `x` and the cut on `y`, for every pair of thresholds (indexed by the
+    `x_thresholds`, with a column for each of the `y_thresholds`).
+
+    :param x_side: 'below' (x < threshold) or 'above' (x > threshold).
+    :param y_side: Same for `y`.
+    """
+    _check_side(x_side)
+    _check_side(y_side)
+    x_thresholds = _check_thresholds(x_thresholds)
+    y_thresholds = _check_thresholds(y_thresholds)
+
+    counts = _cumulative_2d(_bin_index(x, x_thresholds, x_side), x_side, len(x_thresholds),
+                            _bin_index(y, y_thresholds, y_side), y_side, len(y_thresholds))
+
+    return pd.DataFrame(counts, index=pd.Index(x_thresholds, name=getattr(x, 'name', 'x')),
+                        columns=pd.Index(y_thresholds, name=getattr(y, 'name', 'y')))
+
+
+def scan_window(values, lows, highs, x=None, x_thresholds=None, x_side='below'):
+    """Return the number of events with low < value < high, for every pair of
+    `lows` and `highs` (a `DataFrame` indexed by `lows`, with a column for
+    each of the `highs`).
+
+    If `x` and `x_thresholds` are given, the events must also pass the cut on
+    `x` (see `scan_2d`), and the result is an array with shape
+    (len(`x_thresholds`), len(`lows`), len(`highs`)) instead.
+    """
+    lows = _check_thresholds(lows)
+    highs = _check_thresholds(highs)
+    values = np.asarray(values, dtype=float)
+
+    if x is None:
+        x_index = np.zeros(len(values), dtype=np.intp)
+        num_x = 1
+    else:
+        _check_side(x_side)
+        x_thresholds = _check_thresholds(x_thresholds)
+        x_index = _bin_index(x, x_thresholds, x_side)
+        num_x = len(x_thresholds)
+
+    # low < value < high is (value < high) minus (value <= low), i.e. minus
+    # not (value > low).
+    below_high = _cumulative_2d(x_index, x_side, num_x,
+                                _bin_index(values, highs, 'below'), 'below', len(highs))
+    above_low = _cumulative_2d(x_index, x_side, num_x,
+                               _bin_index(values, lows, 'above'), 'above', len(lows))
+    total = _cumulative_2d(x_index, x_side, num_x,
+                           np.where(np.isnan(values), 1, 0), 'below', 1)
+    at_most_low = total - above_low
+
+    counts = np.maximum(below_high[:, None, :] - at_most_low[:, :, None], 0)
+
+    if x is None:
+        return pd.DataFrame(counts[0], index=pd.Index(lows, name='low'),
+                            columns=pd.Index(highs, name='high'))
+    return counts
+
+
+if __name__ == '__main__':
+    folder = '/net/cms26/cms26r0/anson/noPhotons'
+    summary_path = os.path.join(folder, 'event_summary.parquet')
+    cuts, applied_cuts = read_event_cuts(summary_path)
+    summary = passing(read_event_summary(summary_path), applied_cuts, cuts)
+    print(f"{len(summary)} events in the event summary passed the applied cuts.")
+
+    ratio_thresholds = np.arange(1, 30.5, 0.5)
+    print(scan_1d(summary.NPE_ratio, ratio_thresholds))
+
+    lows = np.arange(-30, 1, 1.)
+    highs = np.arange(20, 61, 1.)
+    window = scan_window(summary.delta_t_max, lows, highs)
+    print(window.loc[-15, 45], "events with -15 ns < delta_t_max < 45 ns")
+
+    both = scan_window(summary.delta_t_max, lows, highs, summary.NPE_ratio, ratio_thresholds)
+    print(both[list(ratio_thresholds).index(10), list(lows).index(-15), list(highs).index(45)],
+          "events with -15 ns < delta_t_max < 45 ns and NPE max/min < 10")
+
+    print(scan_2d(summary.max_NPE, np.arange(5, 51, 5), summary.NPE_ratio, ratio_thresholds))
@@ -0,0 +1,188 @@
+"""Per-event summary table: one row per event that the event cuts were made
+on, with the per-event variables that the plots and the extra cuts use, and
+which of the cuts it passed, so that they can be looked at (and cut on)
+without reading and aggregating the hits again.
+
+`cuts.process_folder` makes the summary for each file in the workers, and
+saves all of them (in order of `uniqueEventID`) in event_summary.parquet,
+next to the cut hits. (The paths of the input files and the names of the
+cuts are saved in the Parquet metadata: see `read_event_files` and
+`read_event_cuts`.)
+
+Every event that is left after the hit cuts is in the summary, whether it
+passed the event cuts or not:
+the `passed` column has a bit for each cut (see `passing`). So any of the
+event cuts can be left out (e.g. to see what the timing cut does on its own),
+cuts can be made tighter (e.g. `max_NPE < 30`) or added (e.g.
+`num_modules == 1`), and the extra cuts (which aren't applied) can be made
+looser.
+
+Example:
+    summary = read_event_summary('event_summary.parquet')
+    cuts, applied_cuts = read_event_cuts('event_summary.parquet')
+    signal_like = query(passing(summary, applied_cuts, cuts),
+                        NPE_ratio=(None, 10), delta_t_max=(-15, 45))
+
+Created 18 October 2026.
+"""
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from calibration import MEV_PER_PE
+from cutflow import Events
+from geometry import LAYOUT
+from hits import PARQUET_COMPRESSION
+from segments import count_bits
+
+# The columns (and their dtypes) of the summary.
+COLUMNS = {
+    'uniqueEventID': 'int64',
+    # Index of the input file (in the sorted list of files).
+    'file': 'int32',
+    'num_hits': 'int16',
+    'max_NPE': 'float64',
+    'min_NPE': 'float64',
+    # Bit i is set if layer (or module) i was hit.
+    'layer_pattern': 'uint8',
+    'module_pattern': 'uint16',
+    'num_layers': 'int8',
+    'num_modules': 'int8',
+    'delta_t_max': 'float64',
+    'NPE_ratio': 'float64',
+    # Bit i is set if the event passed event cut i (see `read_event_cuts`).
+    'passed': 'int64',
+}
+
+
+def summarize_events(s, passed=None, key='eventID'):
+    """Return the summary (see `COLUMNS`, but with `key` instead of
+    `uniqueEventID`, and no `file`) of the events in the hits `s`.
+
+    :param s: Aggregated slab hits (e.g. from `cutflow.CutFlow.apply(...,
+    passed=True)`, or the cut hits from `cuts.make_cuts`). The hits of each
+    event must be next to each other.
+    :param passed: Which of the event cuts each event passed (bits, from
+    `cutflow.CutFlow.apply(..., passed=True)`). If not given, there is no
+    `passed` column.
+    """
+    if key != 'eventID':
+        s = s.rename(columns={key: 'eventID'})
+    events = Events(s)
+
+    # (From the energy deposits, not the `float32` `equivalentNPE` column of
+    # the cut hits.)
+    max_NPE = events.max('EDep_MeV') / MEV_PER_PE
+    min_NPE = events.min('EDep_MeV') / MEV_PER_PE
+    hit_pattern = events.hit_pattern()
+    layer_pattern = LAYOUT.layer_pattern(hit_pattern).astype(np.uint8)
+    module_pattern = LAYOUT.module_pattern(hit_pattern).astype(np.uint16)
+
+    # (`max / min` of the energy deposits is the same as for the NPE.)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        NPE_ratio = events.max('EDep_MeV') / events.min('EDep_MeV')
+
+    summary = pd.DataFrame({
+        key: events['eventID'][events.starts],
+        'num_hits': events.num_hits(),
+        'max_NPE': max_NPE,
+        'min_NPE': min_NPE,
+        'layer_pattern': layer_pattern,
+        'module_pattern': module_pattern,
+        'num_layers': count_bits(layer_pattern),
+        'num_modules': count_bits(module_pattern),
+        'delta_t_max': events.delta_t_max() if len(s) else np.zeros(0),
+        'NPE_ratio': NPE_ratio,
+    })
+    if passed is not None:
+        summary['passed'] = passed
+    return summary.astype({name: dtype for name, dtype in COLUMNS.items() if name in summary})
+
+
+def write_event_summary(summary, path, files=(), cuts=(), applied_cuts=()):
+    """Write the `summary` (with the `COLUMNS`) to a Parquet file, sorted by
+    `uniqueEventID`, with the paths of the input `files` and the names of the
+    event `cuts` (in the order of the bits of `passed`) and of the
+    `applied_cuts` in its metadata."""
+    summary = summary[list(COLUMNS)].astype(COLUMNS, copy=False)
+    summary = summary.sort_values('uniqueEventID', kind='stable')
+
+    table = pa.Table.from_pandas(summary, preserve_index=False)
+    table = table.replace_schema_metadata({
+        **(table.schema.metadata or {}),
+        b'files': json.dumps(list(files)).encode(),
+        b'cuts': json.dumps(list(cuts)).encode(),
+        b'applied_cuts': json.dumps(list(applied_cuts)).encode(),
+    })
+
+    temp_path = path + '.tmp'
+    pq.write_table(table, temp_path, compression=PARQUET_COMPRESSION)
+    os.replace(temp_path, path)
+
+
+def read_event_summary(path, columns=None, filters=None):
+    """Read the summary saved by `write_event_summary`, indexed by
+    `uniqueEventID`.
+
+    :param columns: Only read these columns (faster).
+    :param filters: Passed to `pandas.read_parquet`, e.g.
+    `[('num_modules', '==', 1)]`.
+    """
+    if columns is not None:
+        columns = ['uniqueEventID'] + [c for c in columns if c != 'uniqueEventID']
+    summary = pd.read_parquet(path, columns=columns, filters=filters)
+    return summary.set_index('uniqueEventID')
+
+
+def read_event_files(path):
+    """Return the list of input file paths saved with the summary at `path`
+    (`summary.file` is the index into this list)."""
+    metadata = pq.read_schema(path).metadata
+    return json.loads(metadata[b'files'])
+
+
+def read_event_cuts(path):
+    """Return the names of the event cuts (in the order of the bits of
+    `summary.passed`) and of the cuts that were applied, saved with the
+    summary at `path`."""
+    metadata = pq.read_schema(path).metadata
+    return json.loads(metadata[b'cuts']), json.loads(metadata[b'applied_cuts'])
+
+
+def passing(summary, names, cuts):
+    """Return the events in the `summary` that passed all of the event cuts
+    `names`.
+
+    :param cuts: The names of all of the event cuts, in the order of the bits
+    of `summary.passed` (see `read_event_cuts`).
+    """
+    required = sum(2**cuts.index(name) for name in names)
+    return summary[(summary.passed.to_numpy() & required) == required]
+
+
+def query(summary, **conditions):
+    """Return the events in the `summary` that pass all of the `conditions`.
+
+    Each condition is `column=value` (equal to `value`) or
+    `column=(low, high)` (`low` < value < `high`, like the cuts; use `None`
+    for no limit).
+
+    Example:
+        query(summary, num_modules=1, NPE_ratio=(None, 10), delta_t_max=(-15, 45))
+    """
+    mask = np.ones(len(summary), dtype=bool)
+    for column, condition in conditions.items():
+        values = summary[column].to_numpy()
+        if isinstance(condition, tuple):
+            low, high = condition
+            if low is not None:
+                mask &= low < values
+            if high is not None:
+                mask &= values < high
+        else:
+            mask &= values == condition
+    return summary[mask]
@@ -0,0 +1,199 @@
+"""Make fake ScintRHits data, for timing and checking the code without the
+simulation files on the server.
+
+The hits have the same columns as the ScintRHits.csv files from rootaway
+(step-2/use_rootaway.py), with the 48 slab geometry (copyNo 18 to 65: 12
+modules of 4 layers). Most events are muon-like (large energy deposits in all
+four layers of one module), and a few are signal-like (small energy deposits).
+
+Files of any size can be written a batch of events at a time (see
+`write_hits_file` and `write_dataset`).
+
+Created 18 October 2026.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+from hits import write_hit_batches
+
+# Default number of events per batch for `write_hits_file`.
+EVENTS_PER_BATCH = 250_000
+
+# The columns of a ScintRHits.csv file, in order.
+ROOTAWAY_COLUMNS = ['eventID', 'trackID', 'parentID', 'EDep_MeV',
+                    'trackLength_cm', 'copyNo', 'hitTime_ns', 'exitTime_Ns']
+
+
+def make_hits(num_events, seed=0, extra_slabs=0.3, extra_tracks=0.7, signal_fraction=0.05,
+              first_eventID=0):
+    """Make a `DataFrame` of fake hits in the format of a ScintRHits.csv file.
+
+    With the defaults, there are about 3.7 slabs hit and 6.4 hits (tracks)
+    per event.
+
+    :param num_events: Number of events (not hits!) to make.
+    :param seed: Seed for `numpy.random.default_rng`.
+    :param extra_slabs: Mean number of extra slabs hit per event (Poisson),
+    on top of the ones that the muon goes through.
+    :param extra_tracks: Mean number of tracks per slab hit, after the first
+    one (Poisson).
+    :param signal_fraction: Fraction of signal-like events.
+    :param first_eventID: The `eventID`s start after this one.
+    """
+    rng = np.random.default_rng(seed)
+
+    # Every event has a module that a muon goes through. Usually it goes
+    # through all four layers, and otherwise through some of them.
+    module = rng.integers(0, 12, num_events)
+    through_going = rng.random(num_events) < 0.7
+    layers_hit = np.where(through_going, 0b1111, rng.integers(1, 16, num_events))
+    event, layer = np.nonzero((layers_hit[:, None] >> np.arange(4)) & 1)
+    copyNo = 18 + 4*module[event] + layer
+
+    # Some extra slabs hit anywhere in the detector.
+    num_extra = rng.poisson(extra_slabs, num_events)
+    extra_event = np.repeat(np.arange(num_events), num_extra)
+    extra_copyNo = rng.integers(18, 66, len(extra_event))
+
+    event = np.concatenate([event, extra_event])
+    copyNo = np.concatenate([copyNo, extra_copyNo])
+    layer = (copyNo - 18) % 4
+
+    # Several tracks per slab (the first one is the "primary" track).
+    num_tracks = 1 + rng.poisson(extra_tracks, len(event))
+    first_track = np.zeros(num_tracks.sum(), dtype=bool)
+    first_track[np.cumsum(num_tracks) - num_tracks] = True
+    event = np.repeat(event, num_tracks)
+    copyNo = np.repeat(copyNo, num_tracks)
+    layer = np.repeat(layer, num_tracks)
+
+    order = np.argsort(event, kind='stable')
+    event, copyNo, layer, first_track = (
+        event[order], copyNo[order], layer[order], first_track[order])
+    num_hits = len(event)
+
+    # Energy deposits: a few MeV for muon-like primary tracks, mostly zero for
+    # secondary tracks, and small for every track in signal-like events.
+    signal_like = rng.random(num_events) < signal_fraction
+    EDep_MeV = np.where(
+        first_track,
+        rng.lognormal(np.log(2), 0.5, num_hits),
+        np.where(rng.random(num_hits) < 0.7, 0, rng.exponential(0.05, num_hits)),
+    )
+    EDep_MeV = np.where(signal_like[event],
+                        rng.exponential(0.01, num_hits) * (rng.random(num_hits) < 0.8),
+                        EDep_MeV)
+
+    # Hit times: the muon crosses the layers at about the speed of light, with
+    # the occasional very late hit (e.g. from a decay).
+    event_time = rng.uniform(0, 100, num_events)
+    hitTime_ns = event_time[event] + layer*(11.3/3) + rng.normal(0, 1, num_hits)
+    late = rng.random(num_hits) < 1e-3
+    hitTime_ns[late] = 10**rng.uniform(4, 13, late.sum())
+
+    trackLength_cm = rng.exponential(5, num_hits)
+    eventID = first_eventID + np.cumsum(rng.integers(1, 3, num_events))
+
+    return pd.DataFrame({
+        'eventID': eventID[event],
+        'trackID': rng.integers(1, 3000, num_hits),
+        'parentID': np.where(first_track, 0, rng.integers(1, 3000, num_hits)),
+        'EDep_MeV': EDep_MeV,
+        'trackLength_cm': trackLength_cm,
+        'copyNo': copyNo,
+        'hitTime_ns': hitTime_ns,
+        'exitTime_Ns': hitTime_ns + trackLength_cm / 30,
+    }, columns=ROOTAWAY_COLUMNS)
+
+
+def make_PMT_hits(hits, MeV_per_PE=1.24e-3, seed=0):
+    """Make a `DataFrame` of fake PMT hits (one row per photoelectron) to go
+    with the fake slab hits `hits` (from `make_hits`).
+
+    Each slab has two PMTs, numbered 2*(copyNo - 18) and 2*(copyNo - 18) + 1.
+    The number of photoelectrons in a slab is Poisson distributed, with a mean
+    of the total energy deposit in the slab over `MeV_per_PE`, and each one
+    goes to either PMT.
+
+    :return: `DataFrame` with columns `eventID` and `PMT_number`.
+    """
+    rng = np.random.default_rng(seed)
+
+    slabs = hits.groupby(['eventID', 'copyNo'], sort=True).EDep_MeV.sum().clip(lower=0)
+    num_PE = rng.poisson(slabs.to_numpy() / MeV_per_PE)
+
+    eventID = np.repeat(slabs.index.get_level_values('eventID').to_numpy(), num_PE)
+    copyNo = np.repeat(slabs.index.get_level_values('copyNo').to_numpy(), num_PE)
+    PMT_number = 2*(copyNo - 18) + rng.integers(0, 2, len(copyNo))
+
+    return pd.DataFrame({'eventID': eventID, 'PMT_number': PMT_number})
+
+
+def iter_hit_batches(num_events, events_per_batch=EVENTS_PER_BATCH, seed=0, **kwargs):
+    """Make fake hits (see `make_hits`) for `num_events` events, a batch of
+    `events_per_batch` events at a time, in order of `eventID`.
+
+    :param kwargs: Passed to `make_hits`.
+    :return: Generator of `DataFrame`s.
+    """
+    last_eventID = 0
+    for i, start in enumerate(range(0, num_events, events_per_batch)):
+        batch = make_hits(min(events_per_batch, num_events - start), seed=(seed, i),
+                          first_eventID=last_eventID, **kwargs)
+        if len(batch):
+            last_eventID = batch.eventID.iloc[-1]
+        yield batch
+
+
+def write_hits_file(path, num_events, events_per_batch=EVENTS_PER_BATCH, seed=0, **kwargs):
+    """Write a fake ScintRHits.csv (every column, like rootaway) or
+    ScintRHits.parquet (like convert.py) file with `num_events` events, a
+    batch at a time (see `iter_hit_batches`), so that files of any size can be
+    made without having all of the hits in memory.
+
+    :param kwargs: Passed to `make_hits`.
+    :return: The number of hits written.
+    """
+    num_hits = 0
+
+    def batches():
+        nonlocal num_hits
+        for batch in iter_hit_batches(num_events, events_per_batch, seed, **kwargs):
+            num_hits += len(batch)
+            yield batch
+
+    if path.endswith('.parquet'):
+        write_hit_batches(batches(), path)
+    else:
+        header = True
+        for batch in batches():
+            batch.to_csv(path, mode='w' if header else 'a', header=header, index=False)
+            header = False
+
+    return num_hits
+
+
+def write_dataset(folder, num_files, events_per_file, seed=0, formats=('csv',), **kwargs):
+    """Write a fake dataset, laid out like the output of use_rootaway.py (one
+    cosmicdir<i>/ScintRHits.csv per file), to `folder`.
+
+    :param formats: Any of 'csv' (all columns, like rootaway) and 'parquet'
+    (like convert.py).
+    :param kwargs: Passed to `write_hits_file` (e.g. `events_per_batch`, or
+    the event multiplicities of `make_hits`).
+    :return: `list` of the cosmicdir paths.
+    """
+    cosmicdirs = []
+    for i in range(num_files):
+        cosmicdir = os.path.join(folder, f'cosmicdir{i}')
+        os.makedirs(cosmicdir, exist_ok=True)
+
+        for extension in formats:
+            write_hits_file(os.path.join(cosmicdir, f'ScintRHits.{extension}'),
+                            events_per_file, seed=seed + i, **kwargs)
+
+        cosmicdirs.append(cosmicdir)
+
+    return cosmicdirs
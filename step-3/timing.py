@@ -0,0 +1,120 @@
+"""Per-event, per-layer hit times and energy deposits as dense (events x 4
+layers) matrices, and the timing variables made from them: delta_t_max, the
+time differences between every pair of layers, and the NPE max/min ratio.
+
+This is the "alternative method" (`t0, t1, t2, t3`) that was commented out in
+`analysis.make_plot_data`. It takes one pass over the hits (no sorting, no
+`groupby`, and no `idxmax` + `iloc`), so the time it takes grows linearly
+with the number of hits (see `benchmarks.compare_timing`).
+
+Each entry of the matrices is the earliest (calibrated) hit time, or the
+total energy deposit, of one layer in one event (NaN if the layer wasn't
+hit). For events with one hit per layer (like all of the events after the
+cuts), delta_t_max is the same as `cutflow.Events.delta_t_max`.
+
+Created 18 October 2026.
+"""
+from functools import reduce
+from itertools import combinations
+
+import numpy as np
+import pandas as pd
+
+from cutflow import NS_PER_LAYER
+from geometry import LAYOUT
+from segments import segment_starts, segment_sizes
+
+NUM_LAYERS = LAYOUT.num_layers
+
+# Pairs of layers (i, j), with i < j.
+LAYER_PAIRS = tuple(combinations(range(NUM_LAYERS), 2))
+
+
+class LayerMatrix:
+    """Hit times and energy deposits of each layer of each event."""
+
+    def __init__(self, eventID, time, EDep_MeV):
+        """
+        :param eventID: The ID of each event (row).
+        :param time: (events x layers) array of the earliest relative hit time
+        of each layer, in ns (NaN for no hit).
+        :param EDep_MeV: (events x layers) array of the total energy deposit
+        of each layer (NaN for no hit).
+
+        (The arrays from `layer_matrix` are in column-major order, so that
+        each layer is a contiguous array: the loops over the 4 layers below
+        are faster than reducing along `axis=1`.)
+        """
+        self.eventID = eventID
+        self.time = time
+        self.EDep_MeV = EDep_MeV
+
+    def __len__(self):
+        return len(self.eventID)
+
+    def delta_t_max(self):
+        """Time between the latest and earliest layers, positive if the latest
+        is a higher layer, as in the TDR (like `cutflow.Events.delta_t_max`).
+
+        (Ties are broken by the lowest layer.)"""
+        layers = [self.time[:, i] for i in range(NUM_LAYERS)]
+        # (`fmax` and `fmin` ignore NaNs, i.e. layers without hits.)
+        latest_time = reduce(np.fmax, layers)
+        earliest_time = reduce(np.fmin, layers)
+
+        latest = np.zeros(len(self), dtype=np.int8)
+        earliest = np.zeros(len(self), dtype=np.int8)
+        for i in reversed(range(NUM_LAYERS)):
+            latest[layers[i] == latest_time] = i
+            earliest[layers[i] == earliest_time] = i
+
+        return (latest_time - earliest_time) * np.sign(latest - earliest)
+
+    def pairwise_delta_t(self):
+        """Return a `DataFrame` with the time differences t_j - t_i between
+        every pair of layers i < j (columns 'delta_t_01', 'delta_t_02', ...),
+        indexed by `eventID`."""
+        return pd.DataFrame({
+            f'delta_t_{i}{j}': self.time[:, j] - self.time[:, i] for i, j in LAYER_PAIRS
+        }, index=pd.Index(self.eventID, name='eventID'))
+
+    def NPE_ratio(self):
+        """Maximum over minimum energy deposit (or NPE) of the layers that
+        were hit."""
+        layers = [self.EDep_MeV[:, i] for i in range(NUM_LAYERS)]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return reduce(np.fmax, layers) / reduce(np.fmin, layers)
+
+
+def layer_matrix(s, key='eventID'):
+    """Make a `LayerMatrix` from the (cut) hits `s`.
+
+    :param s: Hits with `key`, `copyNo`, `EDep_MeV` and `hitTime_ns`. The hits
+    of each event must be next to each other (as in the output of
+    `cuts.make_cuts` and cut_ScintRHits.csv).
+    """
+    eventID = s[key].to_numpy()
+    layerNo = LAYOUT.layer[s.copyNo.to_numpy()].astype(np.intp)
+
+    # Calibrate the hit times
+    # (relative to a particle at light speed coming from the IP).
+    relative_time = s.hitTime_ns.to_numpy() - layerNo * NS_PER_LAYER
+
+    starts = segment_starts(eventID)
+    num_events = len(starts)
+    event_index = np.repeat(np.arange(num_events), segment_sizes(starts, len(eventID)))
+    # Layer by layer (see `LayerMatrix`).
+    cell = layerNo * num_events + event_index
+
+    time = np.full(num_events * NUM_LAYERS, np.inf)
+    np.minimum.at(time, cell, relative_time)
+    EDep_MeV = np.bincount(cell, weights=s.EDep_MeV.to_numpy(),
+                           minlength=num_events * NUM_LAYERS).astype(float, copy=False)
+
+    hit = np.bincount(cell, minlength=num_events * NUM_LAYERS) > 0
+    time[~hit] = np.nan
+    EDep_MeV[~hit] = np.nan
+
+    return LayerMatrix(eventID[starts],
+                       time.reshape(NUM_LAYERS, num_events).T,
+                       EDep_MeV.reshape(NUM_LAYERS, num_events).T)